@@ -3,11 +3,36 @@
 Entry point of the client application.
 """
 import sys
+import argparse
+
+# Timeline is imported first, so its start is the start of the launcher
+from NCryptoClient.utils.client_startup import startup_timeline, STARTUP_IMPORTS
 
 from PyQt5.QtWidgets import QApplication
 
-from NCryptoClient.main_window import MainWindow
-from NCryptoClient.client_instance_holder import client_holder
+from NCryptoClient.net.client_backends import NET_BACKENDS, NET_BACKEND_THREADS
+from NCryptoClient.net.client_codec import CODECS, DEFAULT_CODEC, is_codec_available
+
+
+def parse_args(argv):
+    """
+    Parses command line arguments of the client. Unknown arguments are left for Qt.
+    @param argv: list of command line arguments.
+    @return: parsed arguments.
+    """
+    parser = argparse.ArgumentParser(prog='NCryptoClient')
+    parser.add_argument('--net-backend', choices=NET_BACKENDS, default=NET_BACKEND_THREADS,
+                        help='network backend: one thread per socket direction or asyncio event loop')
+    parser.add_argument('--codec', choices=CODECS, default=DEFAULT_CODEC,
+                        help='codec of messages: json and orjson work with any JIM server, '
+                             'binary codecs (msgpack, cbor) need a server which uses the same codec')
+    parser.add_argument('--startup-timeline', action='store_true',
+                        help='prints times of startup stages (imports, first paint, connected, '
+                             'authenticated) to stderr')
+    args, _ = parser.parse_known_args(argv[1:])
+    if not is_codec_available(args.codec):
+        parser.error('codec {} needs a module which is not installed'.format(args.codec))
+    return args
 
 
 def main():
@@ -15,22 +40,25 @@ def main():
     Initializes main window.
     @return: application return code.
     """
+    args = parse_args(sys.argv)
+    if args.startup_timeline:
+        startup_timeline.set_output(sys.stderr)
     app = QApplication(sys.argv)
 
-    main_window = MainWindow()
+    # Main window is imported after QApplication is created; modules of the chat
+    # window and the network backend are imported only when they are needed
+    from NCryptoClient.main_window import MainWindow
+    from NCryptoClient.client_instance_holder import client_holder
+    startup_timeline.mark(STARTUP_IMPORTS)
+
+    main_window = MainWindow(args.net_backend, args.codec)
     client_holder.add_instance('MainWindow', main_window)
 
-    # Opens authentication window
+    # Opens authentication window. Connection is started after its first paint
     main_window.open_authentication_window()
     main_window.show()
 
-    if main_window.get_auth_state() is True:
-        pass
-        # Loads list of contacts
-        # main_window.request_contacts_list()
-
     sys.exit(app.exec_())
 
-
 if __name__ == '__main__':
     main()
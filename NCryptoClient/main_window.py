@@ -2,49 +2,69 @@
 """
 Module of the main window (GUI + Backend).
 """
+import os
 import re
-import time
 import datetime
 
-from PyQt5.QtCore import pyqtSlot
+from PyQt5.QtCore import pyqtSlot, QTimer
 from PyQt5.QtWidgets import *
 
 from NCryptoTools.jim.jim_constants import JIMMsgType
 from NCryptoTools.jim.jim_core import JIMMessage
 
-from NCryptoClient.ui.ui_chat_tab import UiChat
-from NCryptoClient.ui.ui_server_settings_window import UiServerSettingsWindow
+# Chat tabs, the server settings window, the local history and the network
+# backend are imported when they are needed, so the authentication window
+# is shown without loading them.
 from NCryptoClient.ui.ui_main_window import UiMainWindow
-from NCryptoClient.net.client_handler import MsgHandler
+from NCryptoClient.ui.ui_update_aggregator import UiUpdateAggregator
+from NCryptoClient.net.client_backends import NET_BACKEND_THREADS, create_msg_handler
+from NCryptoClient.utils.client_config import client_config, SERVER_SECTION, SERVER_IP_KEY, SERVER_PORT_KEY
+from NCryptoClient.utils.client_rich_text import PLAIN_RUNS
+from NCryptoClient.utils.client_startup import startup_timeline, STARTUP_FIRST_PAINT, STARTUP_CONNECTED, \
+    STARTUP_AUTHENTICATED
+from NCryptoClient.utils.constants import USER_DATA_DIR
 
 
 class MainWindow(UiMainWindow):
     """
     Class, needed for functioning of the main window.
     """
-    def __init__(self):
+    def __init__(self, net_backend=NET_BACKEND_THREADS, codec=None):
         """
         Constructor.
+        @param net_backend: network backend (one of NET_BACKEND_* constants).
+        @param codec: codec of messages (one of CODEC_* constants), None - the default one.
         """
         super().__init__()
 
+        self._net_backend = net_backend
+        self._codec = codec
+
         # user is not authenticated by default
         self._authenticated = False
 
         # User login, needed in some child classes
         self._login = 'Anonymous'
 
-        # Gets data from the autoexec.ini
-        # self._ip = self._file_manager.instance.get_item(self._file_manager.autoexec_copy_path,
-        #                                                 '[Server_information]', 'ip')
-        # self._port = self._file_manager.instance.get_item(self._file_manager.autoexec_copy_path,
-        #                                                   '[Server_information]', 'port')
-        self._ip = '127.0.0.1'
-        self._port = '7777'
+        # Server address is read from the settings when the connection is started
+        self._ip = None
+        self._port = None
 
         self.server_settings_window = None
         self.chat_tab_widget = None
+
+        # Updates from the message handler are applied once per frame
+        self.updates = UiUpdateAggregator(parent=self)
+        self.updates.add_channel('contacts', self.add_contacts)
+        self.updates.add_channel('messages', self.add_batch_data_in_tabs)
+        self.updates.add_channel('logs', self.add_logs_data)
+
+        # Source of older messages for chat tabs (HistorySource), None - no history.
+        # Local store is opened after authentication, because it is separate for every user
+        self.history_source = None
+        self.message_store = None
         self.msg_handler = None
+        self._painted = False
 
     def closeEvent(self, *args, **kwargs):
         """
@@ -53,15 +73,30 @@ class MainWindow(UiMainWindow):
         @param kwargs: additional arguments (dictionary).
         @return: -
         """
-        # self._file_manager.save_changes()
-
-        quit_msg = JIMMessage(JIMMsgType.CTS_QUIT, action='quit')
-        self.msg_handler.write_output_bytes(quit_msg.serialize())
-        time.sleep(1)
+        # Quit message and everything queued before it are written, then the connection
+        # is closed; received messages are stored before the store is closed
+        if self.msg_handler is not None:
+            quit_msg = JIMMessage(JIMMsgType.CTS_QUIT, action='quit')
+            self.msg_handler.shutdown(quit_msg.to_dict())
 
+        if self.message_store is not None:
+            self.message_store.close(timeout=1)
         # args returns object of closing event
         args[0].accept()
 
+    def paintEvent(self, event):
+        """
+        Paints the window. After the first paint starts connecting to the server,
+        so the connection does not delay showing of the window.
+        @param event: paint event.
+        @return: -
+        """
+        super().paintEvent(event)
+        if not self._painted:
+            self._painted = True
+            startup_timeline.mark(STARTUP_FIRST_PAINT)
+            QTimer.singleShot(0, self.connect_to_server)
+
     # ========================================================================
     # Getters & Setters
     # ========================================================================
@@ -95,6 +130,13 @@ class MainWindow(UiMainWindow):
         """
         self._login = new_login
 
+    def get_update_stats(self):
+        """
+        Getter. Returns statistics of coalescing of GUI updates.
+        @return: dictionary with amount of posts, items, flushes and coalesced updates.
+        """
+        return self.updates.get_stats()
+
     # ========================================================================
     # Methods, related to the chat widget (QTabWidget and its components).
     # ========================================================================
@@ -104,8 +146,9 @@ class MainWindow(UiMainWindow):
         @return: -
         """
         if self.chat_tab_widget is None:
+            from NCryptoClient.ui.ui_chat_tab import UiChat
             self.select_chat_st.hide()
-            self.chat_tab_widget = UiChat(self)
+            self.chat_tab_widget = UiChat(self, self.history_source)
 
     def open_tab(self, chat_name):
         """
@@ -116,9 +159,6 @@ class MainWindow(UiMainWindow):
         self.open_chat_widget()
         self.chat_tab_widget.add_chat_tab(chat_name)
 
-        # TODO: Load last messages to the tab
-        # self.request_msg_history(chat_name)
-
     def close_tab(self, chat_name):
         """
         Closes tab, searching it by name.
@@ -128,60 +168,67 @@ class MainWindow(UiMainWindow):
         if self.chat_tab_widget:
             self.chat_tab_widget.close_chat_tab_by_name(chat_name)
 
-    @pyqtSlot(str, str, name='add_log_data')
-    def add_log_data(self, time_str, message):
+    @pyqtSlot(list, name='add_logs_data')
+    def add_logs_data(self, logs):
         """
-        Adds log message. if log tab is closed, it will be opened automatically.
-        @param time_str: time/sender string.
-        @param message: data to be added in the Log tab.
+        Adds a batch of log messages. Log tab is opened (if needed) only once per batch.
+        @param logs: list of (sender, message, timestamp) tuples.
         @return: -
         """
+        # There is no Log tab in the authentication window
+        if not self._authenticated:
+            return
+
+        # Logs have no style tags
+        log_rows = [(sender, message, PLAIN_RUNS, timestamp) for sender, message, timestamp in logs]
         self.open_chat_widget()
-        index = self.chat_tab_widget.find_tab('Log')
-        if index is None:
+        if not self.chat_tab_widget.append_rows_to_tab('Log', log_rows):
             self.open_tab('Log')
-            index = self.chat_tab_widget.find_tab('Log')
-        self.chat_tab_widget.add_tab_data(index, time_str, message)
+            self.chat_tab_widget.append_rows_to_tab('Log', log_rows)
 
-    @pyqtSlot(str, str, str, name='add_data_in_tab')
-    def add_data_in_tab(self, tab_name, time_str, message):
+    @pyqtSlot(str, str, str, object, name='add_data_in_tab')
+    def add_data_in_tab(self, tab_name, sender, message, timestamp=None):
         """
         Adds message in the needed tab.
         @param tab_name: tab name (chat name).
-        @param time_str: time/sender string.
+        @param sender: sender part of the header.
         @param message: message to be added in the tab.
+        @param timestamp: time of the message.
         @return: -
         """
         if self.chat_tab_widget:
-            index = self.chat_tab_widget.find_tab(tab_name)
-            if index is not None:
-                self.chat_tab_widget.add_tab_data(index, time_str, message)
+            self.chat_tab_widget.append_to_tab(tab_name, sender, message, timestamp)
+
+    @pyqtSlot(list, name='add_batch_data_in_tabs')
+    def add_batch_data_in_tabs(self, messages):
+        """
+        Adds a batch of decoded messages in the needed tabs. Every tab gets all
+        its messages with a single insert.
+        @param messages: list of (tab name, sender, plain text, style runs, timestamp) tuples.
+        @return: -
+        """
+        if not self.chat_tab_widget:
+            return
 
-    @pyqtSlot(str, name='self_add_data_in_tab')
-    def self_add_data_in_tab(self, tab_name):
+        tabs_rows = {}
+        for tab_name, sender, text, runs, timestamp in messages:
+            tabs_rows.setdefault(tab_name, []).append((sender, text, runs, timestamp))
+
+        for tab_name, tab_rows in tabs_rows.items():
+            self.chat_tab_widget.append_rows_to_tab(tab_name, tab_rows)
+
+    @pyqtSlot(str, str, str, float, name='show_failed_message')
+    def show_failed_message(self, tab_name, sender, message, timestamp):
         """
-        Does pretty much the same as add_data_in_tab(), but being used
-        only in case of sending messages.
+        Shows message of the current user which has not been delivered.
         @param tab_name: tab name (chat name).
+        @param sender: sender part of the header.
+        @param message: message which has not been delivered.
+        @param timestamp: time of the message.
         @return: -
         """
-        if self.chat_tab_widget:
-            index = self.chat_tab_widget.find_tab(tab_name)
-            if index is not None:
-                self.chat_tab_widget.add_tab_data_from_buffer(index)
-
-    # def request_msg_history(self, chat_name):
-    #     """
-    #     Requests a list of messages from the server for the needed chat.
-    #     After returning the list, client_handler.py will renew GUI by adding
-    #     new messages.
-    #     @param chat_name: tab name (chat name).
-    #     @return: -
-    #     """
-    #     jim_msg = JIMManager.create_jim_object(JSONObjectType.TO_SERVER_GET_MSGS,
-    #                                            datetime.datetime.now().timestamp(),
-    #                                            self._login, chat_name)
-    #     self._client_transmitter.write_to_output_buffer(jim_msg.to_dict())
+        self.updates.flush()
+        self.add_data_in_tab(tab_name, '{} (not delivered)'.format(sender), message, timestamp)
 
     # ========================================================================
     # Methods, related to the list of contacts.
@@ -194,7 +241,15 @@ class MainWindow(UiMainWindow):
         @return: -
         """
         self.contacts_widget.add_contact(contact_name)
-        self.search_le.clear()
+
+    @pyqtSlot(list, name='add_contacts')
+    def add_contacts(self, contact_names):
+        """
+        Adds a batch of contacts in the list of contacts.
+        @param contact_names: list of chat names (contact names).
+        @return: -
+        """
+        self.contacts_widget.add_contacts(contact_names)
 
     @pyqtSlot(str, name='remove_contact')
     def remove_contact(self, contact_name):
@@ -203,8 +258,9 @@ class MainWindow(UiMainWindow):
         @param contact_name: chat name (contact name) to be removed from the list.
         @return: -
         """
+        # Contact could be added by the update which is still buffered
+        self.updates.flush()
         self.contacts_widget.delete_contact(contact_name)
-        self.search_le.clear()
 
     def request_contacts_list(self):
         """
@@ -216,7 +272,7 @@ class MainWindow(UiMainWindow):
         jim_msg = JIMMessage(JIMMsgType.CTS_GET_CONTACTS,
                              action='get_contacts',
                              time=datetime.datetime.now().timestamp())
-        self.msg_handler.write_output_bytes(jim_msg.serialize())
+        self.msg_handler.write_output_msg(jim_msg.to_dict())
 
     # ========================================================================
     # Methods, related to the server settings window.
@@ -226,6 +282,7 @@ class MainWindow(UiMainWindow):
         Opens server settings window.
         @return: -
         """
+        from NCryptoClient.ui.ui_server_settings_window import UiServerSettingsWindow
         self.server_settings_window = UiServerSettingsWindow(self)
         self.server_settings_window.show()
 
@@ -234,8 +291,9 @@ class MainWindow(UiMainWindow):
     # ========================================================================
     def open_authentication_window(self):
         """
-        Opens authentication window.
-        @return:
+        Opens authentication window. Connection to the server is started after
+        the window is painted (see connect_to_server()).
+        @return: -
         """
         self.init_auth_widgets()
 
@@ -244,17 +302,31 @@ class MainWindow(UiMainWindow):
         self.ok_pb.clicked.connect(self.send_auth_data)
         self.clear_pb.clicked.connect(self.clear_data)
 
-        self.msg_handler = MsgHandler(self._ip, self._port)
+    def connect_to_server(self):
+        """
+        Creates message handler, which connects to the server in its own thread.
+        Does nothing if the handler has already been created.
+        @return: -
+        """
+        if self.msg_handler is not None:
+            return
+
+        from NCryptoClient.net.client_codec import DEFAULT_CODEC
+        self._ip = client_config.get(SERVER_SECTION, SERVER_IP_KEY)
+        self._port = client_config.get_int(SERVER_SECTION, SERVER_PORT_KEY)
+        self.msg_handler = create_msg_handler(self._net_backend, self._ip, self._port,
+                                              codec=self._codec if self._codec is not None else DEFAULT_CODEC)
 
-        # Links QThread signals to the methods of the GUI thread. MsgHandler will
+        # Links QThread signals to the methods of the GUI thread. Message handler will
         # emit signals to control the state of GUI objects.
         self.msg_handler.open_chat_signal.connect(self.open_chat_window)
-        self.msg_handler.add_contact_signal.connect(self.add_contact)
+        self.msg_handler.add_contacts_signal.connect(self.updates.slot('contacts'))
         self.msg_handler.remove_contact_signal.connect(self.remove_contact)
-        self.msg_handler.add_log_signal.connect(self.add_log_data)
-        self.msg_handler.add_message_signal.connect(self.add_data_in_tab)
-        self.msg_handler.self_add_message_signal.connect(self.self_add_data_in_tab)
+        self.msg_handler.add_logs_signal.connect(self.updates.slot('logs'))
+        self.msg_handler.add_messages_signal.connect(self.updates.slot('messages'))
+        self.msg_handler.message_failed_signal.connect(self.show_failed_message)
         self.msg_handler.show_message_box_signal.connect(self.show_message_box)
+        self.msg_handler.connection_state_signal.connect(self.show_connection_state)
 
         self.msg_handler.start()
 
@@ -279,9 +351,26 @@ class MainWindow(UiMainWindow):
         auth_msg = JIMMessage(JIMMsgType.CTS_AUTHENTICATE,
                               action='authenticate',
                               time=datetime.datetime.now().timestamp(),
-                              login=self.login_le.text(),
-                              password=self.password_le.text())
-        self.msg_handler.write_output_bytes(auth_msg.serialize())
+                              login=login,
+                              password=password)
+        self.connect_to_server()
+        self.msg_handler.authenticate(login, auth_msg.to_dict())
+
+    @pyqtSlot(str, name='show_connection_state')
+    def show_connection_state(self, state):
+        """
+        Shows state of the connection with the server in the window title.
+        @param state: connection state (one of CONNECTION_STATE_* constants).
+        @return: -
+        """
+        # Module is already loaded by the message handler which sends the state
+        from NCryptoClient.net.client_connection import CONNECTION_STATE_CONNECTED
+
+        if state == CONNECTION_STATE_CONNECTED:
+            startup_timeline.mark(STARTUP_CONNECTED)
+            self.setWindowTitle('NCryptoChat')
+        else:
+            self.setWindowTitle('NCryptoChat ({}...)'.format(state))
 
     def clear_data(self):
         """
@@ -326,15 +415,37 @@ class MainWindow(UiMainWindow):
         self.clear_pb = None
         self.ok_pb = None
 
+        self.open_message_store()
         self.init_chat_widgets()
         self.request_contacts_list()
+        startup_timeline.mark(STARTUP_AUTHENTICATED)
 
         # Signals
         self.add_contact_pb.clicked.connect(self.find_and_add_contact)  # "Add" button
         self.remove_contact_pb.clicked.connect(self.find_and_remove_contact)  # "Delete" button
+        self.search_le.textChanged.connect(self.contacts_widget.set_filter_text)  # Filters contacts
         self.server_item.triggered.connect(self.open_server_settings_window)  # Server settings item
         self.exit_item.triggered.connect(self.close)  # "Exit" button
 
+    def open_message_store(self):
+        """
+        Opens local history of the current user. Chat works without history
+        if the database can not be opened.
+        @return: -
+        """
+        import sqlite3
+        from NCryptoClient.utils.client_message_store import MessageStore
+
+        db_path = os.path.join(USER_DATA_DIR, self._login, 'messages.db')
+        try:
+            self.message_store = MessageStore(db_path)
+        except (OSError, sqlite3.Error) as e:
+            self.show_message_box('Warning: history is unavailable',
+                                  'Could not open the local history: {}'.format(e))
+            return
+        self.history_source = self.message_store
+        self.msg_handler.set_message_store(self.message_store)
+
     def find_and_add_contact(self):
         """
         Searches for contacts and in case of a success adds them in the list.
@@ -351,7 +462,7 @@ class MainWindow(UiMainWindow):
             return
 
         # Contact should not exist in the list to be able to add it
-        if self.contacts_widget.find_contact_widget(contact) is not None:
+        if self.contacts_widget.find_contact(contact) is not None:
             self.show_message_box('Contact have not been found!',
                                   'You already have \'{}\' in your list of contacts!'.format(contact))
             return
@@ -378,7 +489,10 @@ class MainWindow(UiMainWindow):
                              action='add_contact',
                              time=datetime.datetime.now().timestamp(),
                              login=contact)
-        self.msg_handler.write_output_bytes(msg.serialize())
+        self.msg_handler.write_output_msg(msg.to_dict())
+
+        # Filter is cleared only after the user's own request, not on updates from the server
+        self.search_le.clear()
 
     def find_and_remove_contact(self):
         """
@@ -402,7 +516,7 @@ class MainWindow(UiMainWindow):
             return
 
         # Contact should be in our list to be deleted
-        if self.contacts_widget.find_contact_widget(contact) is None:
+        if self.contacts_widget.find_contact(contact) is None:
             self.show_message_box('Contact have not been found!',
                                   'You do not have \'{}\' in your list of contacts!'.format(contact))
             return
@@ -429,7 +543,8 @@ class MainWindow(UiMainWindow):
                              action='del_contact',
                              time=datetime.datetime.now().timestamp(),
                              login=contact)
-        self.msg_handler.write_output_bytes(msg.serialize())
+        self.msg_handler.write_output_msg(msg.to_dict())
+        self.search_le.clear()
 
     @pyqtSlot(str, str, name='show_message_box')
     def show_message_box(self, window_title, msg_text):
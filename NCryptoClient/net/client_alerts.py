@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Module which parses texts of alerts (responses with codes 1xx/2xx) sent by
+the server. All known alert templates are combined into one regular
+expression which is compiled once, so an alert is parsed with a single match.
+"""
+import re
+
+# Kinds of alerts
+ALERT_MESSAGE_DELIVERED = 'message_delivered'
+ALERT_ROOM_JOINED = 'room_joined'
+ALERT_ROOM_LEFT = 'room_left'
+ALERT_CONTACT_ADDED = 'contact_added'
+ALERT_CONTACT_REMOVED = 'contact_removed'
+
+_ROOM_NAME = r'#[A-Za-z_\d]{3,31}'
+_CONTACT_NAME = r'#[A-Za-z_\d]{3,31}|[A-Za-z_\d]{3,32}'
+
+# Alert kind -> template. {} is replaced with the pattern of the target name
+_ALERT_TEMPLATES = (
+    (ALERT_MESSAGE_DELIVERED, r"Message to '({})' has been delivered!", _CONTACT_NAME),
+    (ALERT_ROOM_JOINED, r"You have joined '({})' chatroom!", _ROOM_NAME),
+    (ALERT_ROOM_LEFT, r"You have left '({})' chatroom!", _ROOM_NAME),
+    (ALERT_CONTACT_ADDED, r"Contact '({})' has been successfully added!", _CONTACT_NAME),
+    (ALERT_CONTACT_REMOVED, r"Contact '({})' has been successfully removed!", _CONTACT_NAME)
+)
+
+
+def _compile_alert_matcher():
+    """
+    Combines all templates into one regular expression. Every template is a
+    named group (name is the alert kind), the target name is the group after it.
+    @return: compiled regular expression.
+    """
+    alternatives = []
+    for kind, template, name_pattern in _ALERT_TEMPLATES:
+        alternatives.append('(?P<{}>{})'.format(kind, template.format(name_pattern)))
+    return re.compile('|'.join(alternatives))
+
+
+_re_alert = _compile_alert_matcher()
+
+
+def parse_alert(message_text):
+    """
+    Defines kind of the alert and the name it refers to.
+    @param message_text: text of the alert.
+    @return: tuple (kind, target name) or None if the text has unknown format.
+    """
+    match = _re_alert.fullmatch(message_text)
+    if match is None:
+        return None
+    # Group of the template is closed last, the target name is the next group
+    return match.lastgroup, match.group(match.lastindex + 1)
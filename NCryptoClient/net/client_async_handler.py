@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+Module which defines asyncio-based network backend. The whole connection is
+served by one thread: it runs asyncio event loop where reading, writing and
+handling of messages are separate coroutines. GUI is updated with the same Qt
+signals as in the thread-based backend, so one signal/slot hop is needed.
+"""
+import asyncio
+import threading
+import concurrent.futures
+from collections import deque
+
+from NCryptoClient.client_instance_holder import client_holder
+from NCryptoClient.net.client_handler import BaseMsgHandler
+from NCryptoClient.net.client_codec import DEFAULT_CODEC
+from NCryptoClient.net.client_framing import DEFAULT_MAX_FRAME_SIZE, FramingError, create_framer
+from NCryptoClient.net.client_connection import ConnectionManager, CONNECTION_STATE_CONNECTED, \
+    CONNECTION_STATE_DISCONNECTED
+
+
+class AsyncMsgHandler(BaseMsgHandler):
+    """
+    Thread-class which owns the connection with the server through asyncio
+    streams and handles the input, coming from the server. Connection is
+    restored automatically after drops.
+    """
+    def __init__(self, ipv4_address, port_number,
+                 codec=DEFAULT_CODEC,
+                 framing=None,
+                 max_frame_size=DEFAULT_MAX_FRAME_SIZE,
+                 batch_size=500,
+                 recv_size=4096,
+                 connect_timeout=5.0,
+                 ack_timeout=10.0):
+        """
+        Constructor.
+        @param ipv4_address: IPv4 address of server.
+        @param port_number: port number.
+        @param codec: codec of messages (one of CODEC_* constants), the server must use the same one.
+        @param framing: framing mode of the byte stream (one of FRAMING_* constants),
+        None - the one needed by the codec.
+        @param max_frame_size: maximum size of a single message in bytes.
+        @param batch_size: maximum amount of messages handled in one batch.
+        @param recv_size: maximum amount of bytes to be read at once.
+        @param connect_timeout: maximum time in seconds to establish the connection.
+        @param ack_timeout: time in seconds to wait for delivery confirmation of a sent message.
+        """
+        super().__init__(ConnectionManager(ipv4_address, port_number, connect_timeout),
+                         batch_size, ack_timeout, codec)
+        self._framer = create_framer(framing if framing is not None else self._codec.framing, max_frame_size)
+        self._recv_size = recv_size
+
+        # Event loop objects are created in the thread itself
+        self._loop = None
+        self._input_queue = None
+        self._output_queue = None
+        self._stop_future = None
+
+        # Messages which restore the session and messages which have failed to be sent
+        self._preamble = deque()
+        self._unsent = []
+
+        # Statistics of the sent data
+        self._sent_bytes = 0
+        self._sent_frames = 0
+        self._writes = 0
+
+        # Messages accepted to the output queue and written to the socket
+        self._accepted_count = 0
+        self._written_count = 0
+        self._written_event = None
+
+        # Messages which are written before the loop has been started
+        self._lock = threading.Lock()
+        self._pending_output = []
+        self._stop_requested = False
+
+    def run(self):
+        """
+        Runs thread routine.
+        @return: None.
+        """
+        self._main_window = client_holder.get_instance('MainWindow')
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self._serve())
+        finally:
+            with self._lock:
+                self._loop = None
+            loop.close()
+
+    def stop(self):
+        """
+        Asks thread to finish. Can be called from any thread.
+        @return: None.
+        """
+        with self._lock:
+            self._stop_requested = True
+            loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._set_stopped)
+
+    def write_output_bytes(self, msg_bytes):
+        """
+        Writes bytes to the output queue of the event loop. Can be called from any thread.
+        @param msg_bytes: serialized JSON-object. (bytes).
+        @return: None.
+        """
+        with self._lock:
+            if self._loop is None:
+                self._pending_output.append(msg_bytes)
+                return
+            loop = self._loop
+        loop.call_soon_threadsafe(self._queue_output, msg_bytes)
+
+    def get_sender_stats(self):
+        """
+        Returns statistics of the sent data.
+        @return: dictionary with amount of sent bytes, frames and write calls.
+        """
+        return {'bytes': self._sent_bytes,
+                'frames': self._sent_frames,
+                'writes': self._writes}
+
+    def _wait_for_drain(self, timeout):
+        """
+        Waits until the event loop has written all queued messages to the socket.
+        @param timeout: maximum wait time in seconds.
+        @return: True if there are no unwritten messages.
+        """
+        with self._lock:
+            loop = self._loop
+            if loop is None:
+                return not self._pending_output
+            future = asyncio.run_coroutine_threadsafe(self._drain_output(), loop)
+        try:
+            future.result(timeout)
+            return True
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            return False
+
+    def _queue_output(self, msg_bytes):
+        """
+        Puts message to the output queue. Is called inside of the event loop.
+        @param msg_bytes: serialized JSON-object. (bytes).
+        @return: None.
+        """
+        self._accepted_count += 1
+        self._output_queue.put_nowait(msg_bytes)
+
+    async def _drain_output(self):
+        """
+        Waits until all queued messages have been written.
+        @return: None.
+        """
+        while self._written_count < self._accepted_count:
+            self._written_event.clear()
+            await self._written_event.wait()
+
+    def _set_stopped(self):
+        """
+        Resolves the stop future. Is called inside of the event loop.
+        @return: None.
+        """
+        if not self._stop_future.done():
+            self._stop_future.set_result(None)
+
+    async def _serve(self):
+        """
+        Connects to the server and runs reading and writing coroutines until
+        the connection drops; then reconnects. Handling coroutine works all the time.
+        @return: None.
+        """
+        loop = asyncio.get_event_loop()
+        self._input_queue = asyncio.Queue()
+        self._output_queue = asyncio.Queue()
+        self._written_event = asyncio.Event()
+        self._stop_future = loop.create_future()
+
+        with self._lock:
+            self._loop = loop
+            for msg_bytes in self._pending_output:
+                self._queue_output(msg_bytes)
+            self._pending_output = []
+            if self._stop_requested:
+                self._set_stopped()
+
+        dispatch_task = loop.create_task(self._dispatch())
+        deliveries_task = loop.create_task(self._watch_deliveries())
+        while not self._stop_future.done():
+            streams = await self._connect()
+            if streams is None:
+                break
+            reader, writer = streams
+
+            self._framer.reset()
+            self._preamble = deque(self._connection.restore_messages(self._codec))
+            self._set_state(CONNECTION_STATE_CONNECTED)
+
+            tasks = [loop.create_task(self._read(reader)),
+                     loop.create_task(self._write(writer))]
+            done, _ = await asyncio.wait(tasks + [self._stop_future], return_when=asyncio.FIRST_COMPLETED)
+
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+            try:
+                # Data which is still in the transport buffer is written before closing
+                await writer.wait_closed()
+            except OSError:
+                pass
+            if not self._stop_future.done():
+                reasons = [task.result() for task in tasks if task in done]
+                self._log(reasons[0])
+                self._set_state(CONNECTION_STATE_DISCONNECTED)
+        dispatch_task.cancel()
+        deliveries_task.cancel()
+        # Cancelled tasks are finished before the loop is closed
+        await asyncio.gather(dispatch_task, deliveries_task, return_exceptions=True)
+
+        # Messages which have been received before stopping are handled (and stored) too
+        while not self._input_queue.empty():
+            self._handle_frame(self._input_queue.get_nowait())
+        self._flush_batch()
+
+    async def _connect(self):
+        """
+        Connects to the server. Failed attempts are repeated with growing delays.
+        @return: tuple (reader, writer) or None if thread has been stopped.
+        """
+        self._set_state(self._connection_attempt_state())
+        while not self._stop_future.done():
+            try:
+                streams = await asyncio.wait_for(asyncio.open_connection(*self._connection.address),
+                                                 self._connection.connect_timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                delay = self._connection.next_delay()
+                self._log('Could not connect to the server: {}. Next attempt in {:.1f} s.'
+                          .format(str(e) or 'timed out', delay))
+                await asyncio.wait([self._stop_future], timeout=delay)
+            else:
+                self._connection.connection_established()
+                return streams
+        return None
+
+    async def _read(self, reader):
+        """
+        Reads data from the socket and splits it into messages.
+        @param reader: asyncio stream reader.
+        @return: description of the connection drop.
+        """
+        while True:
+            try:
+                data = await reader.read(self._recv_size)
+            except OSError as e:
+                return str(e)
+
+            # Empty result means that the server has closed the connection
+            if not data:
+                return 'Connection has been closed by the server.'
+
+            try:
+                frames = self._framer.feed(data)
+            except FramingError as e:
+                # Stream can not be resynchronized, so the connection is dropped
+                return str(e)
+
+            for msg_bytes in frames:
+                self._input_queue.put_nowait(msg_bytes)
+
+    async def _write(self, writer):
+        """
+        Writes queued messages to the socket.
+        @param writer: asyncio stream writer.
+        @return: description of the connection drop.
+        """
+        while True:
+            # Session is restored first, then messages which have failed to be sent
+            if self._preamble:
+                batch = list(self._preamble)
+                self._preamble.clear()
+                restoring = True
+            else:
+                if not self._unsent:
+                    self._unsent.append(await self._output_queue.get())
+
+                # Everything which has been queued meanwhile goes with the same drain
+                while not self._output_queue.empty():
+                    self._unsent.append(self._output_queue.get_nowait())
+                batch = self._unsent
+                restoring = False
+
+            # Frames are passed as a list of buffers, so the transport can write them at once
+            buffers = []
+            for msg_bytes in batch:
+                buffers.extend(self._framer.encode_parts(msg_bytes))
+            writer.writelines(buffers)
+            try:
+                await writer.drain()
+            except OSError as e:
+                return str(e)
+
+            self._writes += 1
+            self._sent_frames += len(batch)
+            self._sent_bytes += sum(len(buffer) for buffer in buffers)
+            if not restoring:
+                self._written_count += len(batch)
+                self._written_event.set()
+                self._unsent = []
+
+    async def _dispatch(self):
+        """
+        Handles received messages in batches.
+        @return: None.
+        """
+        while True:
+            msg_bytes = await self._input_queue.get()
+            handled = 0
+            while msg_bytes is not None:
+                self._handle_frame(msg_bytes)
+                handled += 1
+                if handled >= self._batch_size or self._input_queue.empty():
+                    break
+                msg_bytes = self._input_queue.get_nowait()
+            self._flush_batch()
+
+            # Lets reading coroutine work between batches
+            await asyncio.sleep(0)
+
+    async def _watch_deliveries(self):
+        """
+        Periodically checks sent messages which wait for delivery confirmation.
+        @return: None.
+        """
+        while True:
+            await asyncio.sleep(1.0)
+            self._check_deliveries()
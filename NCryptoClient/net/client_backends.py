@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Module which selects network backend of the client. Both backends provide
+the same write_output_msg() method and the same set of Qt signals.
+"""
+# Supported network backends
+NET_BACKEND_THREADS = 'threads'
+NET_BACKEND_ASYNCIO = 'asyncio'
+
+NET_BACKENDS = (NET_BACKEND_THREADS, NET_BACKEND_ASYNCIO)
+
+
+def create_msg_handler(backend, ipv4_address, port_number, **kwargs):
+    """
+    Creates message handler which uses the needed network backend.
+    @param backend: network backend (one of NET_BACKEND_* constants).
+    @param ipv4_address: IPv4 address of server.
+    @param port_number: port number.
+    @param kwargs: additional arguments of the message handler.
+    @return: message handler (QThread).
+    """
+    if backend == NET_BACKEND_THREADS:
+        from NCryptoClient.net.client_handler import MsgHandler
+        return MsgHandler(ipv4_address, port_number, **kwargs)
+
+    if backend == NET_BACKEND_ASYNCIO:
+        from NCryptoClient.net.client_async_handler import AsyncMsgHandler
+        return AsyncMsgHandler(ipv4_address, port_number, **kwargs)
+
+    raise ValueError('Unknown network backend: {}'.format(backend))
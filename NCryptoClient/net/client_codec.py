@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Module which defines codecs of JIM messages: conversion of message
+dictionaries to bytes sent over the network and back. JSON through the
+standard library is used by default and is the format of NCryptoServer.
+A faster JSON library (orjson) and compact binary encodings (MessagePack,
+CBOR) can be used if the needed module is installed. Every codec defines
+the framing of the byte stream it needs: JSON objects are self-delimiting,
+binary messages are sent with a length prefix. Codec is chosen once per
+connection, both sides must use the same one.
+"""
+import json
+import importlib
+import importlib.util
+
+from NCryptoClient.net.client_framing import FRAMING_JSON_STREAM, FRAMING_LENGTH_PREFIX
+from NCryptoClient.net.client_queue import PRIORITY_HIGH, default_priority, message_priority
+
+# Supported codecs
+CODEC_JSON = 'json'
+CODEC_ORJSON = 'orjson'
+CODEC_MSGPACK = 'msgpack'
+CODEC_CBOR = 'cbor'
+
+CODECS = (CODEC_JSON, CODEC_ORJSON, CODEC_MSGPACK, CODEC_CBOR)
+
+DEFAULT_CODEC = CODEC_JSON
+
+
+class CodecError(ValueError):
+    """
+    Class for exceptions related to messages which can not be decoded.
+    """
+    def __init__(self, reason):
+        super().__init__(reason)
+        self._reason = reason
+
+    def __str__(self):
+        return 'Codec error: %s' % self._reason
+
+
+class MsgCodec:
+    """
+    Base class for all codecs.
+    """
+    # Name of the codec (one of CODEC_* constants)
+    name = None
+    # Framing of the byte stream (one of FRAMING_* constants)
+    framing = FRAMING_LENGTH_PREFIX
+
+    def encode(self, msg_dict):
+        """
+        Converts message to bytes.
+        @param msg_dict: JIM message (dictionary).
+        @return: serialized message (bytes).
+        """
+        raise NotImplementedError
+
+    def decode(self, msg_bytes):
+        """
+        Converts bytes to message.
+        @param msg_bytes: serialized message (bytes).
+        @return: JIM message (dictionary).
+        @raise CodecError: if the bytes are not a valid message.
+        """
+        raise NotImplementedError
+
+    def priority_of(self, msg_bytes):
+        """
+        Defines priority of the serialized message for the overflow policy of
+        the queues. Message is decoded, so markers in its text are not matched.
+        @param msg_bytes: serialized message (bytes).
+        @return: message priority (one of PRIORITY_* constants).
+        """
+        try:
+            return message_priority(self.decode(msg_bytes))
+        except CodecError:
+            return PRIORITY_HIGH
+
+    @staticmethod
+    def _check_message(msg_dict):
+        """
+        Checks that decoded data is a message.
+        @param msg_dict: decoded data.
+        @return: msg_dict.
+        @raise CodecError: if it is not a dictionary.
+        """
+        if not isinstance(msg_dict, dict):
+            raise CodecError('expected object, received {}'.format(type(msg_dict).__name__))
+        return msg_dict
+
+
+class JSONCodec(MsgCodec):
+    """
+    Codec which uses json module of the standard library. Output is the same
+    as the one of NCryptoTools (JIMMessage.serialize()).
+    """
+    name = CODEC_JSON
+    framing = FRAMING_JSON_STREAM
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+        self._encoder = json.JSONEncoder()
+        self._decoder = json.JSONDecoder()
+
+    def priority_of(self, msg_bytes):
+        """
+        Defines priority of the serialized message without its parsing.
+        @param msg_bytes: serialized message (bytes).
+        @return: message priority (one of PRIORITY_* constants).
+        """
+        return default_priority(msg_bytes)
+
+    def encode(self, msg_dict):
+        """
+        Converts message to bytes.
+        @param msg_dict: JIM message (dictionary).
+        @return: serialized message (bytes).
+        """
+        return self._encoder.encode(msg_dict).encode('utf-8')
+
+    def decode(self, msg_bytes):
+        """
+        Converts bytes to message.
+        @param msg_bytes: serialized message (bytes).
+        @return: JIM message (dictionary).
+        @raise CodecError: if the bytes are not a valid message.
+        """
+        try:
+            return self._check_message(self._decoder.decode(msg_bytes.decode('utf-8')))
+        except ValueError as e:
+            raise CodecError(str(e))
+
+
+class ORJSONCodec(MsgCodec):
+    """
+    Codec which uses orjson library. Produces JSON without spaces, which is
+    understood by any JSON parser, so it can be used with NCryptoServer.
+    """
+    name = CODEC_ORJSON
+    framing = FRAMING_JSON_STREAM
+
+    def __init__(self):
+        """
+        Constructor. Imports the library.
+        """
+        self._orjson = importlib.import_module('orjson')
+
+    def priority_of(self, msg_bytes):
+        """
+        Defines priority of the serialized message without its parsing.
+        @param msg_bytes: serialized message (bytes).
+        @return: message priority (one of PRIORITY_* constants).
+        """
+        return default_priority(msg_bytes)
+
+    def encode(self, msg_dict):
+        """
+        Converts message to bytes.
+        @param msg_dict: JIM message (dictionary).
+        @return: serialized message (bytes).
+        """
+        return self._orjson.dumps(msg_dict)
+
+    def decode(self, msg_bytes):
+        """
+        Converts bytes to message.
+        @param msg_bytes: serialized message (bytes).
+        @return: JIM message (dictionary).
+        @raise CodecError: if the bytes are not a valid message.
+        """
+        try:
+            return self._check_message(self._orjson.loads(msg_bytes))
+        except self._orjson.JSONDecodeError as e:
+            raise CodecError(str(e))
+
+
+class MsgPackCodec(MsgCodec):
+    """
+    Codec which uses MessagePack binary format (msgpack library).
+    """
+    name = CODEC_MSGPACK
+
+    def __init__(self):
+        """
+        Constructor. Imports the library.
+        """
+        self._msgpack = importlib.import_module('msgpack')
+
+    def encode(self, msg_dict):
+        """
+        Converts message to bytes.
+        @param msg_dict: JIM message (dictionary).
+        @return: serialized message (bytes).
+        """
+        return self._msgpack.packb(msg_dict, use_bin_type=True)
+
+    def decode(self, msg_bytes):
+        """
+        Converts bytes to message.
+        @param msg_bytes: serialized message (bytes).
+        @return: JIM message (dictionary).
+        @raise CodecError: if the bytes are not a valid message.
+        """
+        try:
+            return self._check_message(self._msgpack.unpackb(msg_bytes, raw=False))
+        except (ValueError, TypeError, self._msgpack.UnpackException) as e:
+            raise CodecError(str(e))
+
+
+class CBORCodec(MsgCodec):
+    """
+    Codec which uses CBOR binary format (cbor2 library).
+    """
+    name = CODEC_CBOR
+
+    def __init__(self):
+        """
+        Constructor. Imports the library.
+        """
+        self._cbor2 = importlib.import_module('cbor2')
+
+    def encode(self, msg_dict):
+        """
+        Converts message to bytes.
+        @param msg_dict: JIM message (dictionary).
+        @return: serialized message (bytes).
+        """
+        return self._cbor2.dumps(msg_dict)
+
+    def decode(self, msg_bytes):
+        """
+        Converts bytes to message.
+        @param msg_bytes: serialized message (bytes).
+        @return: JIM message (dictionary).
+        @raise CodecError: if the bytes are not a valid message.
+        """
+        try:
+            return self._check_message(self._cbor2.loads(msg_bytes))
+        except (ValueError, TypeError, self._cbor2.CBORDecodeError) as e:
+            raise CodecError(str(e))
+
+
+# Codec name -> (class, module which should be installed)
+_CODECS = {
+    CODEC_JSON: (JSONCodec, None),
+    CODEC_ORJSON: (ORJSONCodec, 'orjson'),
+    CODEC_MSGPACK: (MsgPackCodec, 'msgpack'),
+    CODEC_CBOR: (CBORCodec, 'cbor2')
+}
+
+
+def is_codec_available(codec):
+    """
+    Checks whether the module needed by the codec is installed. Module is not imported.
+    @param codec: codec name (one of CODEC_* constants).
+    @return: True if the codec can be created.
+    """
+    if codec not in _CODECS:
+        return False
+    module_name = _CODECS[codec][1]
+    return module_name is None or importlib.util.find_spec(module_name) is not None
+
+
+def get_available_codecs():
+    """
+    Returns codecs which can be used with the installed modules.
+    @return: list of codec names.
+    """
+    return [codec for codec in CODECS if is_codec_available(codec)]
+
+
+def create_codec(codec=DEFAULT_CODEC):
+    """
+    Creates codec of the needed type.
+    @param codec: codec name (one of CODEC_* constants).
+    @return: codec instance.
+    """
+    if codec not in _CODECS:
+        raise ValueError('Unknown codec: {}'.format(codec))
+    codec_class, module_name = _CODECS[codec]
+    if not is_codec_available(codec):
+        raise ValueError('Codec {} needs module {}, which is not installed'.format(codec, module_name))
+    return codec_class()
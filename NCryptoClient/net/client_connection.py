@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Module which controls connection with the server: opens sockets with timeout,
+calculates delays between reconnection attempts and remembers session data
+(authentication and joined chatrooms) which should be restored after reconnect.
+"""
+import random
+import socket
+import datetime
+import threading
+
+from NCryptoTools.jim.jim_constants import JIMMsgType
+from NCryptoTools.jim.jim_core import JIMMessage
+
+# States of the connection, reported to GUI
+CONNECTION_STATE_CONNECTING = 'connecting'
+CONNECTION_STATE_CONNECTED = 'connected'
+CONNECTION_STATE_DISCONNECTED = 'disconnected'
+CONNECTION_STATE_RECONNECTING = 'reconnecting'
+
+
+class ExponentialBackoff:
+    """
+    Class which calculates delays between reconnection attempts. Every next delay
+    is bigger than the previous one, random jitter prevents all clients from
+    reconnecting at the same moment after the server restart.
+    """
+    def __init__(self, initial_delay=0.5, max_delay=30.0, factor=2.0, jitter=0.5):
+        """
+        Constructor.
+        @param initial_delay: delay before the first attempt in seconds.
+        @param max_delay: maximum delay in seconds.
+        @param factor: multiplier of the delay after every failed attempt.
+        @param jitter: part of the delay (0..1) which is randomized.
+        """
+        self._initial_delay = initial_delay
+        self._max_delay = max_delay
+        self._factor = factor
+        self._jitter = jitter
+        self._attempt = 0
+
+    def next_delay(self):
+        """
+        Calculates delay before the next attempt.
+        @return: delay in seconds.
+        """
+        delay = min(self._max_delay, self._initial_delay * (self._factor ** self._attempt))
+        self._attempt += 1
+        return delay * (1 - self._jitter * random.random())
+
+    def reset(self):
+        """
+        Resets delays after the successful attempt.
+        @return: -
+        """
+        self._attempt = 0
+
+
+class ConnectionManager:
+    """
+    Class which opens connections with the server and stores data needed
+    to restore the session after reconnection. Can be used from any thread.
+    """
+    def __init__(self, ipv4_address, port_number,
+                 connect_timeout=5.0,
+                 backoff=None,
+                 socket_family=socket.AF_INET,
+                 socket_type=socket.SOCK_STREAM):
+        """
+        Constructor.
+        @param ipv4_address: IPv4 address of server.
+        @param port_number: port number.
+        @param connect_timeout: maximum time in seconds to establish the connection.
+        @param backoff: calculator of delays between reconnection attempts.
+        @param socket_family: socket family.
+        @param socket_type: socket type.
+        """
+        self._address = (ipv4_address, int(port_number))
+        self._connect_timeout = connect_timeout
+        self._backoff = backoff if backoff is not None else ExponentialBackoff()
+        self._socket_family = socket_family
+        self._socket_type = socket_type
+
+        self._lock = threading.Lock()
+        self._connected_before = False
+        self._reconnected = False
+        self._login = None
+        self._auth_msg_bytes = None
+        self._rooms = set()
+        # True if authentication has been sent again after reconnect and its reply is awaited
+        self._auth_restoring = False
+
+    @property
+    def address(self):
+        """
+        Getter. Returns address of the server.
+        @return: tuple (IPv4 address, port number).
+        """
+        return self._address
+
+    @property
+    def connect_timeout(self):
+        """
+        Getter. Returns maximum time to establish the connection.
+        @return: timeout in seconds.
+        """
+        return self._connect_timeout
+
+    @property
+    def reconnected(self):
+        """
+        Getter. Tells whether the current connection is not the first one.
+        @return: True if connection has been restored after a drop.
+        """
+        return self._reconnected
+
+    def open_socket(self):
+        """
+        Opens new connection with the server. Blocks no longer than connect_timeout.
+        @return: connected socket in blocking mode.
+        """
+        sock = socket.socket(self._socket_family, self._socket_type)
+        sock.settimeout(self._connect_timeout)
+        try:
+            sock.connect(self._address)
+        except OSError:
+            sock.close()
+            raise
+        sock.settimeout(None)
+        return sock
+
+    def next_delay(self):
+        """
+        Calculates delay before the next connection attempt.
+        @return: delay in seconds.
+        """
+        return self._backoff.next_delay()
+
+    def connection_established(self):
+        """
+        Registers successful connection.
+        @return: -
+        """
+        self._backoff.reset()
+        self._reconnected = self._connected_before
+        self._connected_before = True
+
+    def remember_auth(self, login, auth_msg_bytes):
+        """
+        Stores authentication data to authenticate again after reconnect.
+        @param login: user login.
+        @param auth_msg_bytes: serialized authentication message.
+        @return: -
+        """
+        with self._lock:
+            self._login = login
+            self._auth_msg_bytes = auth_msg_bytes
+
+    def forget_auth(self):
+        """
+        Deletes authentication data (e.g. if the server has rejected it).
+        @return: -
+        """
+        with self._lock:
+            self._login = None
+            self._auth_msg_bytes = None
+
+    def room_joined(self, room):
+        """
+        Registers chatroom which should be joined again after reconnect.
+        @param room: chatroom name.
+        @return: -
+        """
+        with self._lock:
+            self._rooms.add(room)
+
+    def room_left(self, room):
+        """
+        Unregisters chatroom.
+        @param room: chatroom name.
+        @return: -
+        """
+        with self._lock:
+            self._rooms.discard(room)
+
+    def restore_messages(self, codec):
+        """
+        Creates messages which restore the session: authentication and joining of
+        chatrooms. They should be sent before any other message after reconnect.
+        @param codec: codec of the connection (MsgCodec).
+        @return: list of serialized messages.
+        """
+        with self._lock:
+            if not self._reconnected or self._auth_msg_bytes is None:
+                self._auth_restoring = False
+                return []
+
+            self._auth_restoring = True
+            messages = [self._auth_msg_bytes]
+            for room in sorted(self._rooms):
+                join_msg = JIMMessage(JIMMsgType.CTS_JOIN_CHAT,
+                                      action='join',
+                                      time=datetime.datetime.now().timestamp(),
+                                      login=self._login,
+                                      room=room)
+                messages.append(codec.encode(join_msg.to_dict()))
+            return messages
+
+    def auth_restored(self):
+        """
+        Registers reply to the authentication which has been sent by restore_messages().
+        @return: True if such a reply has been awaited (it is not a reply to the user's request).
+        """
+        with self._lock:
+            restoring = self._auth_restoring
+            self._auth_restoring = False
+            return restoring
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Module which tracks delivery of the messages sent by the current user. Every
+outgoing message gets an ID generated by the client and stays in the
+in-flight table until the server confirms its delivery, so many messages can
+wait for confirmation at once. Messages without confirmation are sent again
+after the timeout and reported as failed when all attempts are used. A
+confirmation without ID is matched with the oldest message to the recipient,
+so a duplicate would take the confirmation of another message: messages are
+sent again only after the server has returned an ID in a confirmation.
+"""
+import os
+import time
+import itertools
+import threading
+from collections import OrderedDict, deque
+
+# Key of the message ID in JIM messages
+MSG_ID_KEY = 'id'
+
+
+class InFlightMsg:
+    """
+    Class which stores a message waiting for delivery confirmation.
+    """
+    __slots__ = ('msg_id', 'recipient', 'msg_bytes', 'sender', 'text', 'timestamp', 'sent_at', 'attempts')
+
+    def __init__(self, msg_id, recipient, msg_bytes, sender, text, timestamp, sent_at):
+        """
+        Constructor.
+        @param msg_id: message ID.
+        @param recipient: login of the recipient or chatroom name.
+        @param msg_bytes: serialized JSON-object (bytes), sent again on retry.
+        @param sender: sender part of the header to be shown in the tab.
+        @param text: message text to be shown in the tab.
+        @param timestamp: time of the message (from the message itself).
+        @param sent_at: time of the last sending (time.monotonic()).
+        """
+        self.msg_id = msg_id
+        self.recipient = recipient
+        self.msg_bytes = msg_bytes
+        self.sender = sender
+        self.text = text
+        self.timestamp = timestamp
+        self.sent_at = sent_at
+        self.attempts = 1
+
+
+class DeliveryTracker:
+    """
+    Class which holds the in-flight table of sent messages. Can be used from any thread.
+    """
+    def __init__(self, ack_timeout=10.0, max_attempts=2):
+        """
+        Constructor.
+        @param ack_timeout: time in seconds to wait for delivery confirmation.
+        @param max_attempts: how many times a message is sent before it is reported as failed.
+        """
+        self._ack_timeout = ack_timeout
+        self._max_attempts = max_attempts
+
+        # IDs are unique within the session: random prefix + counter
+        self._id_prefix = os.urandom(4).hex()
+        self._id_counter = itertools.count(1)
+
+        self._lock = threading.Lock()
+        # msg_id -> InFlightMsg, in order of sending
+        self._in_flight = OrderedDict()
+        # recipient -> deque of msg_id, used when confirmation has no ID
+        self._by_recipient = {}
+        # True if the server returns message IDs in confirmations (messages can be sent again)
+        self._ids_confirmed = False
+
+    def new_msg_id(self):
+        """
+        Generates ID of the next outgoing message.
+        @return: message ID (str).
+        """
+        return '{}-{}'.format(self._id_prefix, next(self._id_counter))
+
+    def track(self, msg_id, recipient, msg_bytes, sender, text, timestamp=None):
+        """
+        Adds sent message to the in-flight table.
+        @param msg_id: message ID.
+        @param recipient: login of the recipient or chatroom name.
+        @param msg_bytes: serialized JSON-object (bytes).
+        @param sender: sender part of the header to be shown in the tab.
+        @param text: message text to be shown in the tab.
+        @param timestamp: time of the message.
+        @return: -
+        """
+        in_flight_msg = InFlightMsg(msg_id, recipient, msg_bytes, sender, text, timestamp, time.monotonic())
+        with self._lock:
+            self._in_flight[msg_id] = in_flight_msg
+            self._by_recipient.setdefault(recipient, deque()).append(msg_id)
+
+    def acknowledge(self, recipient, msg_id=None):
+        """
+        Removes confirmed message from the in-flight table. If the server does
+        not return message ID, the oldest message to the recipient is confirmed.
+        @param recipient: login of the recipient or chatroom name.
+        @param msg_id: message ID from the confirmation (if any).
+        @return: confirmed message (InFlightMsg) or None if it is unknown.
+        """
+        with self._lock:
+            if msg_id is not None:
+                self._ids_confirmed = True
+            else:
+                recipient_ids = self._by_recipient.get(recipient)
+                if not recipient_ids:
+                    return None
+                msg_id = recipient_ids[0]
+            return self._remove(msg_id)
+
+    def collect_expired(self):
+        """
+        Finds messages which have not been confirmed in time. Until the server
+        has returned a message ID, they are reported as failed at once.
+        @return: tuple (messages to be sent again, messages which have failed).
+        """
+        now = time.monotonic()
+        to_retry = []
+        failed = []
+        with self._lock:
+            for in_flight_msg in list(self._in_flight.values()):
+                if now - in_flight_msg.sent_at < self._ack_timeout:
+                    continue
+                if self._ids_confirmed and in_flight_msg.attempts < self._max_attempts:
+                    in_flight_msg.attempts += 1
+                    in_flight_msg.sent_at = now
+                    to_retry.append(in_flight_msg)
+                else:
+                    failed.append(self._remove(in_flight_msg.msg_id))
+        return to_retry, failed
+
+    def in_flight_count(self):
+        """
+        Returns amount of messages waiting for confirmation.
+        @return: amount of messages.
+        """
+        with self._lock:
+            return len(self._in_flight)
+
+    def _remove(self, msg_id):
+        """
+        Removes message from both tables. Is called under the lock.
+        @param msg_id: message ID.
+        @return: removed message (InFlightMsg) or None if it is unknown.
+        """
+        in_flight_msg = self._in_flight.pop(msg_id, None)
+        if in_flight_msg is None:
+            return None
+        recipient_ids = self._by_recipient[in_flight_msg.recipient]
+        recipient_ids.remove(msg_id)
+        if not recipient_ids:
+            del self._by_recipient[in_flight_msg.recipient]
+        return in_flight_msg
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Module which defines table-driven dispatching of JIM messages. Message type is
+defined and validated in a single pass over the dictionary, then the handler is
+taken from the table, so the amount of supported types does not affect the cost
+of handling of a single message.
+"""
+import time
+
+from NCryptoTools.jim.jim_constants import JIMMsgKey, JIMMsgType
+
+# Message types defined by the value of the "action" key
+_ACTION_TYPES = {
+    'authenticate': JIMMsgType.CTS_AUTHENTICATE,
+    'quit': JIMMsgType.CTS_QUIT,
+    'presence': JIMMsgType.CTS_PRESENCE,
+    'probe': JIMMsgType.STC_PROBE,
+    'join': JIMMsgType.CTS_JOIN_CHAT,
+    'leave': JIMMsgType.CTS_LEAVE_CHAT,
+    'get_contacts': JIMMsgType.CTS_GET_CONTACTS,
+    'add_contact': JIMMsgType.CTS_ADD_CONTACT,
+    'del_contact': JIMMsgType.CTS_DEL_CONTACT,
+    'contacts_list': JIMMsgType.STC_CONTACTS_LIST,
+    'client_quit': JIMMsgType.STC_QUIT
+}
+
+# Message types of responses, defined by the presence of the key
+_RESPONSE_TYPES = (
+    (JIMMsgKey.ALERT, JIMMsgType.STC_ALERT),
+    (JIMMsgKey.ERROR, JIMMsgType.STC_ERROR),
+    (JIMMsgKey.QUANTITY, JIMMsgType.STC_QUANTITY)
+)
+
+# Keys which should be present in the message of every type
+_REQUIRED_KEYS = {
+    JIMMsgType.CTS_AUTHENTICATE: frozenset({JIMMsgKey.ACTION, JIMMsgKey.TIME, JIMMsgKey.USER}),
+    JIMMsgType.CTS_QUIT: frozenset({JIMMsgKey.ACTION}),
+    JIMMsgType.CTS_PRESENCE: frozenset({JIMMsgKey.ACTION, JIMMsgKey.TIME, JIMMsgKey.TYPE, JIMMsgKey.USER}),
+    JIMMsgType.STC_PROBE: frozenset({JIMMsgKey.ACTION, JIMMsgKey.TIME}),
+    JIMMsgType.CTS_PERSONAL_MSG: frozenset({JIMMsgKey.ACTION, JIMMsgKey.TIME, JIMMsgKey.TO, JIMMsgKey.FROM,
+                                            JIMMsgKey.ENCODING, JIMMsgKey.MESSAGE}),
+    JIMMsgType.CTS_CHAT_MSG: frozenset({JIMMsgKey.ACTION, JIMMsgKey.TIME, JIMMsgKey.TO, JIMMsgKey.FROM,
+                                        JIMMsgKey.MESSAGE}),
+    JIMMsgType.CTS_JOIN_CHAT: frozenset({JIMMsgKey.ACTION, JIMMsgKey.TIME, JIMMsgKey.LOGIN, JIMMsgKey.ROOM}),
+    JIMMsgType.CTS_LEAVE_CHAT: frozenset({JIMMsgKey.ACTION, JIMMsgKey.TIME, JIMMsgKey.LOGIN, JIMMsgKey.ROOM}),
+    JIMMsgType.STC_ALERT: frozenset({JIMMsgKey.RESPONSE, JIMMsgKey.ALERT}),
+    JIMMsgType.STC_ERROR: frozenset({JIMMsgKey.RESPONSE, JIMMsgKey.ERROR}),
+    JIMMsgType.CTS_GET_CONTACTS: frozenset({JIMMsgKey.ACTION, JIMMsgKey.TIME}),
+    JIMMsgType.STC_QUANTITY: frozenset({JIMMsgKey.RESPONSE, JIMMsgKey.QUANTITY}),
+    JIMMsgType.STC_CONTACTS_LIST: frozenset({JIMMsgKey.ACTION, JIMMsgKey.LOGIN}),
+    JIMMsgType.CTS_ADD_CONTACT: frozenset({JIMMsgKey.ACTION, JIMMsgKey.LOGIN, JIMMsgKey.TIME}),
+    JIMMsgType.CTS_DEL_CONTACT: frozenset({JIMMsgKey.ACTION, JIMMsgKey.LOGIN, JIMMsgKey.TIME}),
+    JIMMsgType.STC_QUIT: frozenset({JIMMsgKey.ACTION, JIMMsgKey.LOGIN, JIMMsgKey.TYPE})
+}
+
+# Keys which should be present in the nested "user" dictionary
+_REQUIRED_USER_KEYS = {
+    JIMMsgType.CTS_AUTHENTICATE: frozenset({JIMMsgKey.LOGIN, JIMMsgKey.PASSWORD}),
+    JIMMsgType.CTS_PRESENCE: frozenset({JIMMsgKey.LOGIN, JIMMsgKey.STATUS})
+}
+
+
+def classify(msg_dict):
+    """
+    Defines type of JIM message and validates it in a single pass.
+    Unlike type_of() + is_valid_msg(), never raises on unknown messages.
+    @param msg_dict: JSON-object. (message).
+    @return: type of JIM message; UNDEFINED_TYPE if message is unknown or invalid.
+    """
+    action = msg_dict.get(JIMMsgKey.ACTION)
+    if action is not None:
+        # Value of the key from the network can be of any type, including unhashable ones
+        if not isinstance(action, str):
+            return JIMMsgType.UNDEFINED_TYPE
+        if action == 'msg':
+            msg_type = JIMMsgType.CTS_PERSONAL_MSG if JIMMsgKey.ENCODING in msg_dict else JIMMsgType.CTS_CHAT_MSG
+        else:
+            msg_type = _ACTION_TYPES.get(action, JIMMsgType.UNDEFINED_TYPE)
+    elif JIMMsgKey.RESPONSE in msg_dict:
+        msg_type = JIMMsgType.UNDEFINED_TYPE
+        for key, response_type in _RESPONSE_TYPES:
+            if key in msg_dict:
+                msg_type = response_type
+                break
+    else:
+        return JIMMsgType.UNDEFINED_TYPE
+
+    required_keys = _REQUIRED_KEYS.get(msg_type)
+    if required_keys is None or not required_keys <= msg_dict.keys():
+        return JIMMsgType.UNDEFINED_TYPE
+
+    required_user_keys = _REQUIRED_USER_KEYS.get(msg_type)
+    if required_user_keys is not None:
+        user = msg_dict[JIMMsgKey.USER]
+        if not isinstance(user, dict) or not required_user_keys <= user.keys():
+            return JIMMsgType.UNDEFINED_TYPE
+    return msg_type
+
+
+def handles(msg_type):
+    """
+    Decorator which marks method as a handler of messages of the needed type.
+    @param msg_type: type of JIM message.
+    @return: decorator.
+    """
+    def decorator(method):
+        method.jim_msg_type = msg_type
+        return method
+    return decorator
+
+
+class MsgDispatcher:
+    """
+    Class which calls handlers of messages depending on their type and
+    collects per-type statistics (amount of messages and handling time).
+    """
+    def __init__(self, owner=None):
+        """
+        Constructor. Handlers are collected from methods of the owner which
+        are marked with @handles decorator (methods of subclasses win).
+        @param owner: object whose methods handle messages.
+        """
+        self._handlers = {}
+        self._counts = {}
+        self._timings = {}
+        self._undefined_count = 0
+        self._unhandled_count = 0
+
+        if owner is not None:
+            for cls in reversed(type(owner).__mro__):
+                for name, attr in vars(cls).items():
+                    msg_type = getattr(attr, 'jim_msg_type', None)
+                    if msg_type is not None:
+                        self._handlers[msg_type] = getattr(owner, name)
+
+    def register(self, msg_type, handler):
+        """
+        Registers (or replaces) handler of messages of the needed type.
+        @param msg_type: type of JIM message.
+        @param handler: callable(msg_dict).
+        @return: -
+        """
+        self._handlers[msg_type] = handler
+
+    def dispatch(self, msg_dict):
+        """
+        Defines type of the message and calls its handler.
+        @param msg_dict: JSON-object. (message).
+        @return: True if message has been handled.
+        """
+        msg_type = classify(msg_dict)
+        if msg_type == JIMMsgType.UNDEFINED_TYPE:
+            self._undefined_count += 1
+            return False
+
+        handler = self._handlers.get(msg_type)
+        if handler is None:
+            self._unhandled_count += 1
+            return False
+
+        start_time = time.perf_counter()
+        handler(msg_dict)
+        elapsed_time = time.perf_counter() - start_time
+
+        self._counts[msg_type] = self._counts.get(msg_type, 0) + 1
+        self._timings[msg_type] = self._timings.get(msg_type, 0.0) + elapsed_time
+        return True
+
+    def count_undefined(self):
+        """
+        Registers message which could not be even decoded.
+        @return: -
+        """
+        self._undefined_count += 1
+
+    def get_stats(self):
+        """
+        Returns statistics of the handled messages.
+        @return: dictionary {type name: {'count', 'total_time', 'avg_time'}}; 'undefined' -
+        amount of unknown or invalid messages, 'unhandled' - amount of messages without handler.
+        """
+        stats = {}
+        for msg_type, count in self._counts.items():
+            total_time = self._timings[msg_type]
+            stats[msg_type.name] = {'count': count,
+                                    'total_time': total_time,
+                                    'avg_time': total_time / count}
+        stats['undefined'] = self._undefined_count
+        stats['unhandled'] = self._unhandled_count
+        return stats
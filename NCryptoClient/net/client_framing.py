@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+Module which defines framing of the byte stream. TCP does not preserve message
+boundaries: one recv() can return several messages or only a part of one. Framers
+collect incoming bytes in an internal buffer and give away only complete frames.
+"""
+import re
+import struct
+
+# Supported framing modes
+FRAMING_JSON_STREAM = 'json_stream'
+FRAMING_LENGTH_PREFIX = 'length_prefix'
+FRAMING_DELIMITER = 'delimiter'
+
+# Maximum size of a single frame in bytes (payload only)
+DEFAULT_MAX_FRAME_SIZE = 1024 * 1024
+
+
+class FramingError(Exception):
+    """
+    Class for exceptions related to broken or oversized frames.
+    """
+    def __init__(self, reason):
+        self._reason = reason
+
+    def __str__(self):
+        return 'Framing error: %s' % self._reason
+
+
+class StreamFramer:
+    """
+    Base class for all framers. Accumulates bytes and splits them into frames.
+    """
+    def __init__(self, max_frame_size=DEFAULT_MAX_FRAME_SIZE):
+        """
+        Constructor.
+        @param max_frame_size: maximum size of a single frame in bytes.
+        """
+        self._buffer = bytearray()
+        self._max_frame_size = max_frame_size
+
+    @property
+    def pending_bytes(self):
+        """
+        Getter. Returns amount of bytes which do not form a complete frame yet.
+        @return: amount of buffered bytes.
+        """
+        return len(self._buffer)
+
+    def feed(self, data):
+        """
+        Adds data to the buffer and extracts all complete frames from it.
+        @param data: bytes received from the socket.
+        @return: list of complete frames (bytes).
+        """
+        self._buffer += data
+        return self._extract_frames()
+
+    def reset(self):
+        """
+        Drops all buffered data. Used after framing errors to resynchronize.
+        @return: -
+        """
+        self._buffer.clear()
+
+    def encode(self, payload):
+        """
+        Wraps payload into a frame before sending.
+        @param payload: message bytes.
+        @return: frame bytes.
+        """
+        return b''.join(self.encode_parts(payload))
+
+    def encode_parts(self, payload):
+        """
+        Wraps payload into a frame without copying it: frame is returned as a
+        tuple of buffers, which can be sent with a single vectored write.
+        @param payload: message bytes.
+        @return: tuple of frame parts (bytes).
+        """
+        raise NotImplementedError
+
+    def _extract_frames(self):
+        """
+        Extracts complete frames from the buffer.
+        @return: list of complete frames (bytes).
+        """
+        raise NotImplementedError
+
+    def _check_size(self, size):
+        """
+        Checks that frame does not exceed the maximum size.
+        @param size: frame size in bytes.
+        @return: -
+        """
+        if size > self._max_frame_size:
+            raise FramingError('frame of {} bytes exceeds limit of {} bytes'.format(size, self._max_frame_size))
+
+
+class LengthPrefixFramer(StreamFramer):
+    """
+    Framer for frames which start with a 4-byte big-endian payload length.
+    """
+    _header = struct.Struct('!I')
+
+    def encode_parts(self, payload):
+        """
+        Wraps payload into a frame without copying it.
+        @param payload: message bytes.
+        @return: tuple of frame parts (bytes).
+        """
+        self._check_size(len(payload))
+        return self._header.pack(len(payload)), payload
+
+    def _extract_frames(self):
+        """
+        Extracts complete frames from the buffer.
+        @return: list of complete frames (bytes).
+        """
+        frames = []
+        header_size = self._header.size
+        offset = 0
+        buffer_size = len(self._buffer)
+        while buffer_size - offset >= header_size:
+            (frame_size,) = self._header.unpack_from(self._buffer, offset)
+            self._check_size(frame_size)
+            frame_end = offset + header_size + frame_size
+            if frame_end > buffer_size:
+                break
+            frames.append(bytes(self._buffer[offset + header_size:frame_end]))
+            offset = frame_end
+        del self._buffer[:offset]
+        return frames
+
+
+class DelimiterFramer(StreamFramer):
+    """
+    Framer for frames separated by a delimiter (newline-separated JSON by default).
+    """
+    def __init__(self, max_frame_size=DEFAULT_MAX_FRAME_SIZE, delimiter=b'\n'):
+        """
+        Constructor.
+        @param max_frame_size: maximum size of a single frame in bytes.
+        @param delimiter: bytes which separate frames.
+        """
+        super().__init__(max_frame_size)
+        self._delimiter = delimiter
+        self._search_pos = 0
+
+    def encode_parts(self, payload):
+        """
+        Wraps payload into a frame without copying it.
+        @param payload: message bytes.
+        @return: tuple of frame parts (bytes).
+        """
+        self._check_size(len(payload))
+        return payload, self._delimiter
+
+    def reset(self):
+        """
+        Drops all buffered data. Used after framing errors to resynchronize.
+        @return: -
+        """
+        super().reset()
+        self._search_pos = 0
+
+    def _extract_frames(self):
+        """
+        Extracts complete frames from the buffer.
+        @return: list of complete frames (bytes).
+        """
+        frames = []
+        offset = 0
+        delimiter_size = len(self._delimiter)
+
+        # Bytes which have been already scanned do not contain delimiter,
+        # so search starts from the place where the previous one has stopped
+        search_pos = self._search_pos
+        while True:
+            pos = self._buffer.find(self._delimiter, search_pos)
+            if pos == -1:
+                break
+            self._check_size(pos - offset)
+            if pos > offset:
+                frames.append(bytes(self._buffer[offset:pos]))
+            offset = pos + delimiter_size
+            search_pos = offset
+        del self._buffer[:offset]
+
+        self._check_size(len(self._buffer))
+        self._search_pos = max(0, len(self._buffer) - delimiter_size + 1)
+        return frames
+
+
+class JSONStreamFramer(StreamFramer):
+    """
+    Framer for JSON objects which are sent back-to-back without any separators.
+    This is how NCryptoServer transmits messages. Object boundaries are found by
+    tracking braces outside of string literals; scanner state is kept between
+    calls, so every byte is scanned only once.
+    """
+    # Only these bytes change scanner state, everything else is skipped
+    _re_structural = re.compile(rb'[{}"]')
+    _re_string_end = re.compile(rb'["\\]')
+    _OPEN_BRACE = ord('{')
+    _QUOTE = ord('"')
+
+    def __init__(self, max_frame_size=DEFAULT_MAX_FRAME_SIZE):
+        """
+        Constructor.
+        @param max_frame_size: maximum size of a single frame in bytes.
+        """
+        super().__init__(max_frame_size)
+        self._scan_pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def encode_parts(self, payload):
+        """
+        Wraps payload into a frame without copying it. JSON object is
+        self-delimiting, so payload is sent as it is.
+        @param payload: message bytes.
+        @return: tuple of frame parts (bytes).
+        """
+        self._check_size(len(payload))
+        return (payload,)
+
+    def reset(self):
+        """
+        Drops all buffered data. Used after framing errors to resynchronize.
+        @return: -
+        """
+        super().reset()
+        self._scan_pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def _extract_frames(self):
+        """
+        Extracts complete frames from the buffer.
+        @return: list of complete frames (bytes).
+        """
+        frames = []
+        buffer = self._buffer
+        frame_start = 0
+        pos = self._scan_pos
+        buffer_size = len(buffer)
+
+        while pos < buffer_size:
+            if self._depth == 0:
+                # Skips whitespaces and garbage between objects
+                pos = buffer.find(b'{', pos)
+                if pos == -1:
+                    pos = frame_start = buffer_size
+                    break
+                frame_start = pos
+                self._depth = 1
+                pos += 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                    pos += 1
+                    continue
+                match = self._re_string_end.search(buffer, pos)
+                if match is None:
+                    pos = buffer_size
+                    break
+                pos = match.end()
+                if buffer[match.start()] == self._QUOTE:
+                    self._in_string = False
+                else:
+                    self._escaped = True
+            else:
+                match = self._re_structural.search(buffer, pos)
+                if match is None:
+                    pos = buffer_size
+                    break
+                pos = match.end()
+                byte = buffer[match.start()]
+                if byte == self._QUOTE:
+                    self._in_string = True
+                elif byte == self._OPEN_BRACE:
+                    self._depth += 1
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self._check_size(pos - frame_start)
+                        frames.append(bytes(buffer[frame_start:pos]))
+                        frame_start = pos
+
+        del buffer[:frame_start]
+        self._scan_pos = pos - frame_start
+        self._check_size(len(buffer))
+        return frames
+
+
+_FRAMERS = {
+    FRAMING_JSON_STREAM: JSONStreamFramer,
+    FRAMING_LENGTH_PREFIX: LengthPrefixFramer,
+    FRAMING_DELIMITER: DelimiterFramer
+}
+
+
+def create_framer(framing=FRAMING_JSON_STREAM, max_frame_size=DEFAULT_MAX_FRAME_SIZE):
+    """
+    Creates framer of the needed type.
+    @param framing: framing mode (one of FRAMING_* constants).
+    @param max_frame_size: maximum size of a single frame in bytes.
+    @return: framer instance.
+    """
+    if framing not in _FRAMERS:
+        raise ValueError('Unknown framing mode: {}'.format(framing))
+    return _FRAMERS[framing](max_frame_size)
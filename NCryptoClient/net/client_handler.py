@@ -2,188 +2,401 @@
 """
 Module which handles messages.
 """
-import re
 import time
 import socket
+import threading
 
 from PyQt5.QtCore import *
-from NCryptoTools.tools.utilities import get_formatted_date, get_current_time
 from NCryptoTools.jim.jim_constants import JIMMsgType, HTTPCode
-from NCryptoTools.jim.jim_core import to_dict, type_of, is_valid_msg
 
 from NCryptoClient.client_instance_holder import client_holder
 from NCryptoClient.net.client_receiver import Receiver
 from NCryptoClient.net.client_sender import Sender
-
-
-class MsgHandler(QThread):
+from NCryptoClient.net.client_alerts import parse_alert, ALERT_MESSAGE_DELIVERED, ALERT_ROOM_JOINED, \
+    ALERT_ROOM_LEFT, ALERT_CONTACT_ADDED, ALERT_CONTACT_REMOVED
+from NCryptoClient.net.client_delivery import DeliveryTracker, MSG_ID_KEY
+from NCryptoClient.net.client_dispatch import MsgDispatcher, handles
+from NCryptoClient.net.client_codec import DEFAULT_CODEC, CodecError, create_codec
+from NCryptoClient.net.client_framing import DEFAULT_MAX_FRAME_SIZE, create_framer
+from NCryptoClient.net.client_queue import OVERFLOW_BLOCK, OVERFLOW_SPILL_TO_DISK
+from NCryptoClient.net.client_connection import ConnectionManager, CONNECTION_STATE_CONNECTING, \
+    CONNECTION_STATE_CONNECTED, CONNECTION_STATE_DISCONNECTED, CONNECTION_STATE_RECONNECTING
+from NCryptoClient.utils.client_rich_text import decode_rich_text
+
+# Maximum time in seconds for writing the last messages and finishing threads on exit
+DEFAULT_SHUTDOWN_TIMEOUT = 2.0
+
+
+class BaseMsgHandler(QThread):
     """
-    Thread-class for handling of the input, coming from the server.
-    It reads the data from the buffer, defines its type and performs needed
-    actions depending on the message type. This class was intentionally
-    created to reduce time needed for Receiver thread to handle messages -
-    now it just stores incoming messages in the buffer. All handling work is
-    done by this thread.
+    Base thread-class for handling of the input, coming from the server.
+    It defines type of every message and performs needed actions depending
+    on it. Network transport is implemented by subclasses (see MsgHandler and
+    AsyncMsgHandler), so signals which are used by GUI stay the same for all
+    network backends. Subclasses connect in their own thread, reconnect after
+    connection drops and report connection state to GUI.
+    All messages which are waiting in the buffer are handled in one go (batch),
+    so GUI gets one update per batch instead of one per message.
+    Handlers of message types are marked with @handles decorator and are
+    taken from the dispatch table, subclasses can add or override them.
     """
-    add_contact_signal = pyqtSignal(str)
+    # Batch signals. Each list item is a tuple of arguments of a single update:
+    # contacts - contact_name, messages - (tab_name, sender, plain text, style runs, timestamp),
+    # logs - (sender, message, timestamp). Times are UNIX times, GUI formats them when painting.
+    # Sender is the header part after the time, e.g. '@login>'.
+    add_contacts_signal = pyqtSignal(list)
+    add_messages_signal = pyqtSignal(list)
+    add_logs_signal = pyqtSignal(list)
+
     remove_contact_signal = pyqtSignal(str)
-    add_message_signal = pyqtSignal(str, str, str)
-    add_log_signal = pyqtSignal(str, str)
-    self_add_message_signal = pyqtSignal(str)
     show_message_box_signal = pyqtSignal(str, str)
     open_chat_signal = pyqtSignal()
 
-    def __init__(self, ipv4_address, port_number,
-                 socket_family=socket.AF_INET,
-                 socket_type=socket.SOCK_STREAM,
-                 wait_time=0.05):
+    # Message of the current user which has not been delivered: tab_name, sender, message, timestamp
+    message_failed_signal = pyqtSignal(str, str, str, float)
+
+    # State of the connection (one of CONNECTION_STATE_* constants)
+    connection_state_signal = pyqtSignal(str)
+
+    def __init__(self, connection, batch_size=500, ack_timeout=10.0, codec=DEFAULT_CODEC):
         """
         Constructor.
-        @param ipv4_address: IPv4 address of server.
-        @param port_number: port number.
-        @param socket_family: socket family.
-        @param socket_type: socket type.
-        @param wait_time: wait time in seconds to avoid overheating.
+        @param connection: connection manager.
+        @param batch_size: maximum amount of messages handled in one batch.
+        @param ack_timeout: time in seconds to wait for delivery confirmation of a sent message.
+        @param codec: codec of messages (one of CODEC_* constants), the server must use the same one.
         """
         super().__init__()
         self.daemon = True
-        self._socket = socket.socket(socket_family, socket_type)
-        self._socket.connect((ipv4_address, int(port_number)))
-        self._wait_time = wait_time
+        self._connection = connection
+        self._codec = create_codec(codec)
+        self._batch_size = batch_size
         self._main_window = None
-        self._sender = Sender(self._socket)
-        self._receiver = Receiver(self._socket)
 
-    def __del__(self):
+        # Updates which are collected during the batch and sent to GUI at its end
+        self._batch_contacts = []
+        self._batch_messages = []
+        self._batch_logs = []
+
+        # Login -> sender part of the header ('@login>'), built once per login
+        self._senders = {}
+
+        self._dispatcher = MsgDispatcher(self)
+
+        # Sent messages which wait for delivery confirmation
+        self._delivery = DeliveryTracker(ack_timeout)
+        self._next_delivery_check = 0.0
+
+        # Local history where received and delivered messages are written
+        self._message_store = None
+
+        # Last reported connection state
+        self._state = None
+
+    @property
+    def codec(self):
+        """
+        Getter. Returns codec of messages of the connection.
+        @return: codec (MsgCodec).
+        """
+        return self._codec
+
+    def write_output_bytes(self, msg_bytes):
         """
-        Destructor. Closes the connection with the server.
+        Writes bytes to the output buffer. Can be called from any thread.
+        @param msg_bytes: message serialized by the codec of the connection (bytes).
         @return: None.
         """
-        self._socket.close()
+        raise NotImplementedError
 
-    def run(self):
+    def write_output_msg(self, msg_dict):
         """
-        Runs thread routine.
+        Serializes message by the codec of the connection and writes it to the
+        output buffer. Can be called from any thread.
+        @param msg_dict: JSON-object. (message).
         @return: None.
         """
-        self._main_window = client_holder.get_instance('MainWindow')
+        self.write_output_bytes(self._codec.encode(msg_dict))
 
-        self._sender.start()
-        self._receiver.start()
+    def stop(self):
+        """
+        Asks thread to finish.
+        @return: None.
+        """
+        raise NotImplementedError
 
-        while True:
-            msg_bytes = self._receiver.pop_msg_from_queue()
-            if msg_bytes is not None:
-                self._handle_message(to_dict(msg_bytes))
-            time.sleep(self._wait_time)
+    def shutdown(self, final_msg_dict=None, timeout=DEFAULT_SHUTDOWN_TIMEOUT):
+        """
+        Finishes the connection gracefully: writes the last message, waits until
+        all queued messages have been written to the socket, stops all threads
+        and waits for them. Messages which have been received meanwhile are
+        handled (and stored) by the thread before finishing. Is called from GUI
+        thread; the whole procedure takes no longer than timeout. Without the
+        connection nothing can be written, so messages are not waited for.
+        @param final_msg_dict: message which is sent last (e.g. 'quit'), None - no message.
+        @param timeout: maximum time in seconds.
+        @return: True if all messages have been written and all threads have finished.
+        """
+        deadline = time.monotonic() + timeout
+        drained = False
+        if self.isRunning() and self._state == CONNECTION_STATE_CONNECTED:
+            if final_msg_dict is not None:
+                self.write_output_msg(final_msg_dict)
+            drained = self._wait_for_drain(timeout)
+
+        self.stop()
+        finished = self.wait(max(0, int((deadline - time.monotonic()) * 1000)))
+        finished = self._join_workers(max(0.0, deadline - time.monotonic())) and finished
+        return drained and finished
+
+    def get_sender_stats(self):
+        """
+        Returns statistics of the sent data.
+        @return: dictionary with amount of sent bytes, frames and write calls.
+        """
+        raise NotImplementedError
 
-    def write_output_bytes(self, msg_bytes):
+    def get_dispatch_stats(self):
         """
-        Writes bytes to the output buffer of the Sender thread.
-        @param msg_bytes: serialized JSON-object. (bytes).
+        Returns statistics of the handled messages.
+        @return: dictionary with amount and handling time of messages of every type.
+        """
+        return self._dispatcher.get_stats()
+
+    def set_message_store(self, message_store):
+        """
+        Sets local history where messages are written from now on.
+        @param message_store: message store (MessageStore) or None.
         @return: None.
         """
-        self._sender.add_msg_to_queue(msg_bytes)
+        self._message_store = message_store
 
-    def _handle_message(self, msg_dict):
+    def authenticate(self, login, auth_msg_dict):
         """
-        Handles input messages and performs actions depending on the
-        message type.
+        Sends authentication message. It is remembered to authenticate
+        automatically after reconnection.
+        @param login: user login.
+        @param auth_msg_dict: authentication message (dictionary).
+        @return: None.
+        """
+        auth_msg_bytes = self._codec.encode(auth_msg_dict)
+        self._connection.remember_auth(login, auth_msg_bytes)
+        self.write_output_bytes(auth_msg_bytes)
+
+    def send_message(self, recipient, msg_dict, sender, text):
+        """
+        Sends message of the current user with a new message ID. Message is shown
+        in the tab when the server confirms its delivery. Can be called from any thread.
+        @param recipient: login of the recipient or chatroom name.
         @param msg_dict: JSON-object. (message).
+        @param sender: sender part of the header to be shown in the tab.
+        @param text: message text to be shown in the tab.
         @return: None.
         """
-        jim_msg_type = type_of(msg_dict)
-        if jim_msg_type == JIMMsgType.UNDEFINED_TYPE or is_valid_msg(jim_msg_type, msg_dict) is False:
+        msg_id = self._delivery.new_msg_id()
+        msg_dict[MSG_ID_KEY] = msg_id
+        msg_bytes = self._codec.encode(msg_dict)
+        self._delivery.track(msg_id, recipient, msg_bytes, sender, text, msg_dict['time'])
+        self.write_output_bytes(msg_bytes)
+
+    def _wait_for_drain(self, timeout):
+        """
+        Waits until all queued messages have been written to the socket.
+        @param timeout: maximum wait time in seconds.
+        @return: True if there are no unwritten messages.
+        """
+        raise NotImplementedError
+
+    def _join_workers(self, timeout):
+        """
+        Waits for additional threads of the backend after stop().
+        @param timeout: maximum wait time in seconds.
+        @return: True if all of them have finished.
+        """
+        return True
+
+    def _check_deliveries(self):
+        """
+        Sends again messages which have not been confirmed in time and reports
+        messages which have used all attempts. Checks are made once per second.
+        @return: None.
+        """
+        now = time.monotonic()
+        if now < self._next_delivery_check:
             return
+        self._next_delivery_check = now + 1.0
 
-        if jim_msg_type == JIMMsgType.CTS_PERSONAL_MSG:
-            self._handle_personal_msg(msg_dict)
+        to_retry, failed = self._delivery.collect_expired()
+        for in_flight_msg in to_retry:
+            self.write_output_bytes(in_flight_msg.msg_bytes)
+        for in_flight_msg in failed:
+            self._emit_in_order(self.message_failed_signal, in_flight_msg.recipient,
+                                in_flight_msg.sender, in_flight_msg.text, in_flight_msg.timestamp)
 
-        elif jim_msg_type == JIMMsgType.CTS_CHAT_MSG:
-            self._handle_chat_msg(msg_dict)
+    def _connection_attempt_state(self):
+        """
+        Defines state which is reported before a connection attempt.
+        @return: connection state.
+        """
+        if self._connection.reconnected or self._main_window.get_auth_state():
+            return CONNECTION_STATE_RECONNECTING
+        return CONNECTION_STATE_CONNECTING
 
-        elif jim_msg_type == JIMMsgType.CTS_JOIN_CHAT:
-            self._handle_join_chat_msg(msg_dict)
+    def _set_state(self, state):
+        """
+        Reports new connection state to GUI.
+        @param state: connection state (one of CONNECTION_STATE_* constants).
+        @return: None.
+        """
+        self._state = state
+        self._emit_in_order(self.connection_state_signal, state)
 
-        elif jim_msg_type == JIMMsgType.CTS_LEAVE_CHAT:
-            self._handle_leave_chat_msg(msg_dict)
+    def _log(self, text):
+        """
+        Sends a line from the client itself to the Log tab.
+        @param text: text of the log line.
+        @return: None.
+        """
+        self._batch_logs.append(('@NCryptoChat>', text, time.time()))
+        self._flush_batch()
 
-        elif jim_msg_type == JIMMsgType.STC_QUANTITY:
-            self._handle_quantity_msg(msg_dict)
+    def _get_sender(self, login):
+        """
+        Returns sender part of the header of messages from the login.
+        @param login: login of the sender.
+        @return: sender string.
+        """
+        sender = self._senders.get(login)
+        if sender is None:
+            sender = '@{}>'.format(login)
+            self._senders[login] = sender
+        return sender
 
-        elif jim_msg_type == JIMMsgType.STC_CONTACTS_LIST:
-            self._handle_contacts_list_msg(msg_dict)
+    def _handle_frame(self, msg_bytes):
+        """
+        Handles single message received from the server.
+        @param msg_bytes: message serialized by the codec of the connection (bytes).
+        @return: None.
+        """
+        try:
+            msg_dict = self._codec.decode(msg_bytes)
+        except CodecError:
+            # Not a message: it is counted and skipped
+            self._dispatcher.count_undefined()
+            return
+        self._handle_message(msg_dict)
 
-        elif jim_msg_type == JIMMsgType.STC_ALERT:
-            self._handle_alert_msg(msg_dict)
+    def _flush_batch(self):
+        """
+        Sends all updates collected during the batch to GUI.
+        @return: None.
+        """
+        if self._batch_contacts:
+            self.add_contacts_signal.emit(self._batch_contacts)
+            self._batch_contacts = []
+        if self._batch_messages:
+            # Store writes messages in its own thread, the list is not changed after emitting
+            if self._message_store is not None:
+                self._message_store.add_messages(self._batch_messages)
+            # Style tags are decoded here, so GUI only paints the rows
+            rows = []
+            for tab_name, sender, message, timestamp in self._batch_messages:
+                text, runs = decode_rich_text(message)
+                rows.append((tab_name, sender, text, runs, timestamp))
+            self.add_messages_signal.emit(rows)
+            self._batch_messages = []
+        if self._batch_logs:
+            self.add_logs_signal.emit(self._batch_logs)
+            self._batch_logs = []
+
+    def _emit_in_order(self, signal, *args):
+        """
+        Emits single (non-batch) signal. Collected updates are sent before it,
+        so GUI receives them in the same order as messages have arrived.
+        @param signal: signal to be emitted.
+        @param args: signal arguments.
+        @return: None.
+        """
+        self._flush_batch()
+        signal.emit(*args)
 
-        elif jim_msg_type == JIMMsgType.STC_ERROR:
-            self._handle_error_msg(msg_dict)
+    def _handle_message(self, msg_dict):
+        """
+        Handles input messages and performs actions depending on the
+        message type.
+        @param msg_dict: JSON-object. (message).
+        @return: None.
+        """
+        self._dispatcher.dispatch(msg_dict)
 
     # ========================================================================
     # A group of protected methods, each of which is charge of message handling
     # of a specific type.
     # ========================================================================
+    @handles(JIMMsgType.CTS_PERSONAL_MSG)
     def _handle_personal_msg(self, msg_dict):
         """
         Handles personal message from a client.
         @param msg_dict: JSON-object. (message).
         @return: -
         """
-        time_str = '[{}] @{}>'.format(get_formatted_date(msg_dict['time']),
-                                      msg_dict['from'])
-        self.add_message_signal.emit(msg_dict['from'], time_str, msg_dict['message'])
+        self._batch_messages.append((msg_dict['from'], self._get_sender(msg_dict['from']),
+                                     msg_dict['message'], msg_dict['time']))
 
+    @handles(JIMMsgType.CTS_CHAT_MSG)
     def _handle_chat_msg(self, msg_dict):
         """
         Handles message to the chat from a client.
         @param msg_dict: JSON-object. (message).
         @return: -
         """
-        time_str = '[{}] @{}>'.format(get_formatted_date(msg_dict['time']),
-                                      msg_dict['from'])
-        self.add_message_signal.emit(msg_dict['to'], time_str, msg_dict['message'])
+        self._batch_messages.append((msg_dict['to'], self._get_sender(msg_dict['from']),
+                                     msg_dict['message'], msg_dict['time']))
 
+    @handles(JIMMsgType.CTS_JOIN_CHAT)
     def _handle_join_chat_msg(self, msg_dict):
         """
         Handles message from the server that another client has joined a chatroom.
         @param msg_dict: JSON-object. (message).
         @return: -
         """
-        time_str = '[{}] @Server>'.format(get_formatted_date(msg_dict['time']))
         msg_string = '{} joined {} chatroom.'.format(msg_dict['login'],
                                                      msg_dict['room'])
-        self.add_message_signal.emit(msg_dict['room'], time_str, msg_string)
+        self._batch_messages.append((msg_dict['room'], '@Server>', msg_string, msg_dict['time']))
 
+    @handles(JIMMsgType.CTS_LEAVE_CHAT)
     def _handle_leave_chat_msg(self, msg_dict):
         """
         Handles message from the server that another client has left a chatroom.
         @param msg_dict: JSON-object. (message).
         @return: -
         """
-        time_str = '[{}] @Server>'.format(get_formatted_date(msg_dict['time']))
         msg_string = '{} left {} chatroom.'.format(msg_dict['login'],
                                                    msg_dict['room'])
-        self.add_message_signal.emit(msg_dict['room'], time_str, msg_string)
+        self._batch_messages.append((msg_dict['room'], '@Server>', msg_string, msg_dict['time']))
 
+    @handles(JIMMsgType.STC_QUANTITY)
     def _handle_quantity_msg(self, msg_dict):
         """
         Handles message with amount of contacts of the current client.
         @param msg_dict: JSON-object. (message).
         @return: -
         """
-        time_str = '[{}] @Server>'.format(get_current_time())
         alert_msg = 'Amount of contacts: {}'.format(msg_dict['quantity'])
-        self.add_log_signal.emit(time_str, alert_msg)
+        self._batch_logs.append(('@Server>', alert_msg, time.time()))
 
+    @handles(JIMMsgType.STC_CONTACTS_LIST)
     def _handle_contacts_list_msg(self, msg_dict):
         """
         Handles message with the next login of client's contact.
         @param msg_dict: JSON-object. (message).
         @return: -
         """
-        self.add_contact_signal.emit(msg_dict['login'])
+        if msg_dict['login'].startswith('#'):
+            self._connection.room_joined(msg_dict['login'])
+        self._batch_contacts.append(msg_dict['login'])
 
+    @handles(JIMMsgType.STC_ALERT)
     def _handle_alert_msg(self, msg_dict):
         """
         Handles an ordinary answer from the server (response).
@@ -192,22 +405,28 @@ class MsgHandler(QThread):
         """
         if str(msg_dict['response'])[0] in ['1', '2']:
 
+            # Reply to the authentication which has been sent again after reconnect
+            if self._connection.auth_restored():
+                alert_msg = 'Session has been restored ({}: {})'.format(msg_dict['response'],
+                                                                       msg_dict['alert'])
+                self._batch_logs.append(('@Server>', alert_msg, time.time()))
+
             # Defines where to send the data
-            if self._main_window.get_auth_state():
-                time_str = '[{}] @Server>'.format(get_current_time())
+            elif self._main_window.get_auth_state():
                 alert_msg = 'Alert {}: {}'.format(msg_dict['response'],
                                                   msg_dict['alert'])
 
-                self.add_log_signal.emit(time_str, alert_msg)
+                self._batch_logs.append(('@Server>', alert_msg, time.time()))
 
-                self._handle_alert_message(msg_dict['alert'])
+                self._handle_alert_message(msg_dict['alert'], msg_dict.get(MSG_ID_KEY))
 
             # if user is not logged in, checks the code
             else:
                 if msg_dict['response'] == HTTPCode.OK:
                     self._main_window.set_auth_state(True)
-                    self.open_chat_signal.emit()
+                    self._emit_in_order(self.open_chat_signal)
 
+    @handles(JIMMsgType.STC_ERROR)
     def _handle_error_msg(self, msg_dict):
         """
         Handles error message from the server (response).
@@ -216,59 +435,292 @@ class MsgHandler(QThread):
         """
         if str(msg_dict['response'])[0] in ['4', '5']:
 
+            # Authentication which has been sent again after reconnect is rejected
+            if self._connection.auth_restored():
+                self._connection.forget_auth()
+                error_msg = 'Session has not been restored ({}: {})'.format(msg_dict['response'],
+                                                                           msg_dict['error'])
+                self._batch_logs.append(('@Server>', error_msg, time.time()))
+
             # Defines where to send the data
-            if self._main_window.get_auth_state():
-                time_str = '[{}] @Server>'.format(get_current_time())
+            elif self._main_window.get_auth_state():
                 error_msg = 'Error {}: {}'.format(msg_dict['response'],
                                                   msg_dict['error'])
-                self.add_log_signal.emit(time_str, error_msg)
+                self._batch_logs.append(('@Server>', error_msg, time.time()))
 
             # if user is not logged in, checks the code
             else:
+                self._connection.forget_auth()
                 if msg_dict['response'] == HTTPCode.UNAUTHORIZED:
-                    self.show_message_box_signal.emit('Invalid authentication data!',
-                                                      'Authentication has failed! Try again!')
+                    self._emit_in_order(self.show_message_box_signal,
+                                        'Invalid authentication data!',
+                                        'Authentication has failed! Try again!')
                 else:
-                    self.show_message_box_signal.emit('Unknown error!',
-                                                      'An unknown error has occured! Try again!')
+                    self._emit_in_order(self.show_message_box_signal,
+                                        'Unknown error!',
+                                        'An unknown error has occured! Try again!')
 
-    def _handle_alert_message(self, message_text):
+    def _handle_alert_message(self, message_text, msg_id=None):
         """
         Parses message text to define what kind of operation should be performed.
         @param message_text: message text.
+        @param msg_id: ID of the message which the alert refers to (if the server returns it).
         @return: -
         """
-        re_message = re.compile('^(Message to \'(#[A-Za-z_\d]{3,31}|[A-Za-z_\d]{3,32})\' has been delivered!)$')
-        if re.fullmatch(re_message, message_text) is not None:
-            recipient = message_text.split('\'')[1]
-            self.self_add_message_signal.emit(recipient)
+        alert = parse_alert(message_text)
+        if alert is None:
+            self._emit_in_order(self.show_message_box_signal,
+                                'Incorrect message format!',
+                                'Could not parse message from the server!')
             return
 
-        re_joined = re.compile('^(You have joined \'#[A-Za-z_\d]{3,31}\' chatroom!)$')
-        if re.fullmatch(re_joined, message_text) is not None:
-            contact_name = message_text.split('\'')[1]
-            self.add_contact_signal.emit(contact_name)
-            return
+        kind, contact_name = alert
+        if kind == ALERT_MESSAGE_DELIVERED:
+            in_flight_msg = self._delivery.acknowledge(contact_name, msg_id)
+            if in_flight_msg is not None:
+                self._batch_messages.append((in_flight_msg.recipient, in_flight_msg.sender,
+                                             in_flight_msg.text, in_flight_msg.timestamp))
 
-        re_left = re.compile('^(You have left \'#[A-Za-z_\d]{3,31}\' chatroom!)$')
-        if re.fullmatch(re_left, message_text) is not None:
-            contact_name = message_text.split('\'')[1]
-            self.remove_contact_signal.emit(contact_name)
-            return
+        elif kind == ALERT_ROOM_JOINED:
+            self._connection.room_joined(contact_name)
+            self._batch_contacts.append(contact_name)
 
-        re_added = re.compile(
-            '^(Contact \'((#[A-Za-z_\d]{3,31})|([A-Za-z_\d]{3,32}))\' has been successfully added!)$')
-        if re.fullmatch(re_added, message_text) is not None:
-            contact_name = message_text.split('\'')[1]
-            self.add_contact_signal.emit(contact_name)
-            return
+        elif kind == ALERT_ROOM_LEFT:
+            self._connection.room_left(contact_name)
+            self._emit_in_order(self.remove_contact_signal, contact_name)
 
-        re_removed = re.compile(
-            '^(Contact \'((#[A-Za-z_\d]{3,31})|([A-Za-z_\d]{3,32}))\' has been successfully removed!)$')
-        if re.fullmatch(re_removed, message_text) is not None:
-            contact_name = message_text.split('\'')[1]
-            self.remove_contact_signal.emit(contact_name)
-            return
+        elif kind == ALERT_CONTACT_ADDED:
+            self._batch_contacts.append(contact_name)
+
+        elif kind == ALERT_CONTACT_REMOVED:
+            self._emit_in_order(self.remove_contact_signal, contact_name)
+
+
+class MsgHandler(BaseMsgHandler):
+    """
+    Thread-class for handling of the input, coming from the server.
+    It reads the data from the buffer, defines its type and performs needed
+    actions depending on the message type. This class was intentionally
+    created to reduce time needed for Receiver thread to handle messages -
+    now it just stores incoming messages in the buffer. All handling work is
+    done by this thread.
+    This thread also connects to the server (so GUI never waits for it) and
+    reconnects after connection drops, attaching new sockets to Sender and
+    Receiver threads.
+    """
+    def __init__(self, ipv4_address, port_number,
+                 socket_family=socket.AF_INET,
+                 socket_type=socket.SOCK_STREAM,
+                 wait_time=0.5,
+                 codec=DEFAULT_CODEC,
+                 framing=None,
+                 max_frame_size=DEFAULT_MAX_FRAME_SIZE,
+                 batch_size=500,
+                 connect_timeout=5.0,
+                 input_buffer_size=1000,
+                 input_overflow_policy=OVERFLOW_BLOCK,
+                 output_buffer_size=1000,
+                 output_overflow_policy=OVERFLOW_SPILL_TO_DISK,
+                 put_timeout=None,
+                 ack_timeout=10.0):
+        """
+        Constructor.
+        @param ipv4_address: IPv4 address of server.
+        @param port_number: port number.
+        @param socket_family: socket family.
+        @param socket_type: socket type.
+        @param wait_time: maximum time in seconds to block on the empty input
+        buffer before checking the stop flag. Does not delay incoming messages.
+        @param codec: codec of messages (one of CODEC_* constants), the server must use the same one.
+        @param framing: framing mode of the byte stream (one of FRAMING_* constants),
+        None - the one needed by the codec.
+        @param max_frame_size: maximum size of a single message in bytes.
+        @param batch_size: maximum amount of messages handled in one batch.
+        @param connect_timeout: maximum time in seconds to establish the connection.
+        @param input_buffer_size: capacity of the buffer for incoming messages.
+        @param input_overflow_policy: behaviour of the full incoming buffer (one of OVERFLOW_* constants).
+        @param output_buffer_size: capacity of the buffer for outgoing messages.
+        @param output_overflow_policy: behaviour of the full outgoing buffer (one of OVERFLOW_* constants).
+        @param put_timeout: maximum wait time in seconds for OVERFLOW_BLOCK policy.
+        @param ack_timeout: time in seconds to wait for delivery confirmation of a sent message.
+        """
+        super().__init__(ConnectionManager(ipv4_address, port_number, connect_timeout,
+                                           socket_family=socket_family,
+                                           socket_type=socket_type),
+                         batch_size, ack_timeout, codec)
+        if framing is None:
+            framing = self._codec.framing
+        self._wait_time = wait_time
+        self._stop_event = threading.Event()
+        self._connection_lost_event = threading.Event()
+        self._disconnect_reason = None
+        self._sender = Sender(buffer_size=output_buffer_size,
+                              framer=create_framer(framing, max_frame_size),
+                              on_disconnect=self._on_disconnect,
+                              overflow_policy=output_overflow_policy,
+                              put_timeout=put_timeout,
+                              priority_of=self._codec.priority_of)
+        self._receiver = Receiver(buffer_size=input_buffer_size,
+                                  framer=create_framer(framing, max_frame_size),
+                                  on_disconnect=self._on_disconnect,
+                                  overflow_policy=input_overflow_policy,
+                                  put_timeout=put_timeout,
+                                  priority_of=self._codec.priority_of)
+
+    def run(self):
+        """
+        Runs thread routine.
+        @return: None.
+        """
+        self._main_window = client_holder.get_instance('MainWindow')
+
+        self._sender.start()
+        self._receiver.start()
+
+        while not self._stop_event.is_set():
+            shared_socket = self._connect()
+            if shared_socket is None:
+                break
+
+            self._connection_lost_event.clear()
+            self._sender.attach(shared_socket, self._connection.restore_messages(self._codec))
+            self._receiver.attach(shared_socket)
+            self._set_state(CONNECTION_STATE_CONNECTED)
+
+            self._handle_input()
 
-        self.show_message_box_signal.emit('Incorrect message format!',
-                                          'Could not parse message from the server!')
+            self._sender.detach()
+            self._receiver.detach()
+            self._close_socket(shared_socket)
+            if not self._stop_event.is_set():
+                self._log(self._disconnect_reason)
+                self._set_state(CONNECTION_STATE_DISCONNECTED)
+
+        self._sender.stop()
+        self._receiver.stop()
+
+        # Messages which have been received before stopping are handled (and stored) too
+        msg_bytes = self._receiver.pop_msg_from_queue(0)
+        while msg_bytes is not None:
+            self._handle_batch(msg_bytes)
+            msg_bytes = self._receiver.pop_msg_from_queue(0)
+
+    def stop(self):
+        """
+        Asks thread and its Sender/Receiver threads to finish.
+        @return: None.
+        """
+        self._stop_event.set()
+        self._sender.stop()
+        self._receiver.stop()
+
+    def write_output_bytes(self, msg_bytes):
+        """
+        Writes bytes to the output buffer of the Sender thread.
+        @param msg_bytes: serialized JSON-object. (bytes).
+        @return: None.
+        """
+        self._sender.add_msg_to_queue(msg_bytes)
+
+    def get_sender_stats(self):
+        """
+        Returns statistics of the sent data.
+        @return: dictionary with amount of sent bytes, frames and system calls.
+        """
+        return self._sender.get_stats()
+
+    def _wait_for_drain(self, timeout):
+        """
+        Waits until Sender thread has written all queued messages to the socket.
+        @param timeout: maximum wait time in seconds.
+        @return: True if there are no unwritten messages.
+        """
+        return self._sender.wait_for_drain(timeout)
+
+    def _join_workers(self, timeout):
+        """
+        Waits for Sender and Receiver threads after stop().
+        @param timeout: maximum wait time in seconds.
+        @return: True if both have finished.
+        """
+        deadline = time.monotonic() + timeout
+        for thread in (self._sender, self._receiver):
+            if thread.is_alive():
+                thread.join(max(0.0, deadline - time.monotonic()))
+        return not self._sender.is_alive() and not self._receiver.is_alive()
+
+    def get_queue_stats(self):
+        """
+        Returns statistics of the buffers for incoming and outgoing messages.
+        @return: dictionary {'input': statistics, 'output': statistics}.
+        """
+        return {'input': self._receiver.get_queue_stats(),
+                'output': self._sender.get_queue_stats()}
+
+    def _connect(self):
+        """
+        Connects to the server. Failed attempts are repeated with growing delays.
+        @return: connected socket or None if thread has been stopped.
+        """
+        self._set_state(self._connection_attempt_state())
+        while not self._stop_event.is_set():
+            try:
+                shared_socket = self._connection.open_socket()
+            except OSError as e:
+                delay = self._connection.next_delay()
+                self._log('Could not connect to the server: {}. Next attempt in {:.1f} s.'.format(e, delay))
+                self._stop_event.wait(delay)
+            else:
+                self._connection.connection_established()
+                return shared_socket
+        return None
+
+    def _handle_input(self):
+        """
+        Handles incoming messages until connection drops or thread is stopped.
+        @return: None.
+        """
+        while not self._stop_event.is_set() and not self._connection_lost_event.is_set():
+            self._check_deliveries()
+            msg_bytes = self._receiver.pop_msg_from_queue(self._wait_time)
+            if msg_bytes is not None:
+                self._handle_batch(msg_bytes)
+
+    def _handle_batch(self, msg_bytes):
+        """
+        Handles the message and everything that has been accumulated in the buffer
+        after it, but no more than batch_size messages to keep GUI responsive.
+        @param msg_bytes: first message of the batch.
+        @return: None.
+        """
+        handled = 0
+        while msg_bytes is not None:
+            self._handle_frame(msg_bytes)
+            handled += 1
+            if handled >= self._batch_size:
+                break
+            msg_bytes = self._receiver.pop_msg_from_queue(0)
+        self._flush_batch()
+
+    @staticmethod
+    def _close_socket(shared_socket):
+        """
+        Closes the socket. End of the stream is sent after all written data.
+        @param shared_socket: socket.
+        @return: None.
+        """
+        try:
+            shared_socket.shutdown(socket.SHUT_WR)
+        except OSError:
+            # Connection is already broken
+            pass
+        shared_socket.close()
+
+    def _on_disconnect(self, reason):
+        """
+        Callback of Sender and Receiver threads, called when connection drops.
+        @param reason: description of the failure.
+        @return: None.
+        """
+        self._disconnect_reason = reason
+        self._connection_lost_event.set()
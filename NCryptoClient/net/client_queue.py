@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+Module which defines bounded message queue used between network threads.
+When the queue is full, its behaviour is defined by the overflow policy, so
+a slow consumer never blocks the producer for an unlimited time unless it is
+explicitly asked for.
+"""
+import struct
+import tempfile
+import threading
+from collections import deque
+from queue import Empty
+
+# Overflow policies
+# Waits for the free space no longer than put_timeout, then drops the new message
+OVERFLOW_BLOCK = 'block'
+# Drops the oldest message in the queue
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+# Drops the oldest low-priority message (presence, probes, counters), then the oldest one
+OVERFLOW_DROP_LOW_PRIORITY = 'drop_low_priority'
+# Writes messages to a temporary file and reads them back when the queue has space
+OVERFLOW_SPILL_TO_DISK = 'spill_to_disk'
+
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_LOW_PRIORITY, OVERFLOW_SPILL_TO_DISK)
+
+# Message priorities
+PRIORITY_LOW = 0
+PRIORITY_HIGH = 1
+
+# Actions of messages which can be lost without visible consequences
+LOW_PRIORITY_ACTIONS = ('presence', 'probe')
+# Key of the counter message which can be lost as well
+LOW_PRIORITY_KEY = 'quantity'
+
+# Markers of these messages in JSON with and without spaces after separators.
+# Key and value are matched together: quotes inside string values are escaped,
+# so text of a message can not contain a marker.
+_LOW_PRIORITY_MARKERS = (b'"action": "presence"', b'"action":"presence"',
+                         b'"action": "probe"', b'"action":"probe"',
+                         b'"quantity":')
+
+
+def default_priority(msg_bytes):
+    """
+    Defines priority of the serialized JIM message without its parsing.
+    @param msg_bytes: serialized JSON-object (bytes).
+    @return: message priority (one of PRIORITY_* constants).
+    """
+    for marker in _LOW_PRIORITY_MARKERS:
+        if marker in msg_bytes:
+            return PRIORITY_LOW
+    return PRIORITY_HIGH
+
+
+def message_priority(msg_dict):
+    """
+    Defines priority of the parsed JIM message.
+    @param msg_dict: JSON-object. (message).
+    @return: message priority (one of PRIORITY_* constants).
+    """
+    if msg_dict.get('action') in LOW_PRIORITY_ACTIONS or \
+            (LOW_PRIORITY_KEY in msg_dict and 'response' in msg_dict):
+        return PRIORITY_LOW
+    return PRIORITY_HIGH
+
+
+class BoundedMsgQueue:
+    """
+    Thread-safe FIFO queue of serialized messages with limited capacity.
+    Interface of get() methods is the same as in queue.Queue.
+    """
+    _record_header = struct.Struct('!I')
+
+    def __init__(self, capacity=1000, overflow_policy=OVERFLOW_BLOCK, put_timeout=None,
+                 priority_of=default_priority, on_drop=None):
+        """
+        Constructor.
+        @param capacity: maximum amount of messages kept in memory.
+        @param overflow_policy: what to do when the queue is full (one of OVERFLOW_* constants).
+        @param put_timeout: maximum wait time in seconds for OVERFLOW_BLOCK policy.
+        None - waits until there is free space.
+        @param priority_of: function which defines priority of a message.
+        @param on_drop: callback(msg_bytes) which is called under the lock of the queue
+        when a message which has been queued before is dropped to make room.
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError('Unknown overflow policy: {}'.format(overflow_policy))
+
+        self._capacity = capacity
+        self._overflow_policy = overflow_policy
+        self._put_timeout = put_timeout
+        self._priority_of = priority_of
+        self._on_drop = on_drop
+
+        self._queue = deque()
+        self._mutex = threading.Lock()
+        self._not_empty = threading.Condition(self._mutex)
+        self._not_full = threading.Condition(self._mutex)
+        self._closed = False
+
+        # Messages which did not fit in memory (OVERFLOW_SPILL_TO_DISK)
+        self._spill_file = None
+        self._spill_read_pos = 0
+        self._spill_write_pos = 0
+        self._spilled_count = 0
+
+        # Statistics
+        self._high_watermark = 0
+        self._dropped = 0
+        self._spilled = 0
+        self._put_timeouts = 0
+
+    def put(self, msg_bytes):
+        """
+        Adds message to the end of the queue, applying overflow policy if it is full.
+        @param msg_bytes: serialized JSON-object (bytes).
+        @return: True if message has been queued, False if it has been dropped.
+        """
+        with self._not_full:
+            if self._closed:
+                return False
+
+            # Messages which are already on disk go first to keep the order
+            if self._spilled_count > 0:
+                self._spill(msg_bytes)
+                return True
+
+            if len(self._queue) >= self._capacity:
+                if not self._make_room(msg_bytes):
+                    return False
+                if self._spilled_count > 0:
+                    return True
+
+            self._queue.append(msg_bytes)
+            self._high_watermark = max(self._high_watermark, len(self._queue))
+            self._not_empty.notify()
+            return True
+
+    def get(self, block=True, timeout=None):
+        """
+        Removes and returns the first message of the queue.
+        @param block: whether to wait for a message if the queue is empty.
+        @param timeout: maximum wait time in seconds. None - waits until message arrives.
+        @return: serialized JSON-object (bytes). Raises queue.Empty if there is no message
+        (also at once if the queue is empty and closed).
+        """
+        with self._not_empty:
+            if block:
+                self._not_empty.wait_for(lambda: self._has_messages() or self._closed, timeout)
+            if not self._has_messages():
+                raise Empty
+
+            if not self._queue:
+                self._unspill()
+            msg_bytes = self._queue.popleft()
+            self._not_full.notify()
+            return msg_bytes
+
+    def get_nowait(self):
+        """
+        Removes and returns the first message of the queue without waiting.
+        @return: serialized JSON-object (bytes). Raises queue.Empty if there is no message.
+        """
+        return self.get(block=False)
+
+    def qsize(self):
+        """
+        Returns amount of messages in the queue (including spilled to disk).
+        @return: amount of messages.
+        """
+        with self._mutex:
+            return len(self._queue) + self._spilled_count
+
+    def empty(self):
+        """
+        Checks whether the queue is empty.
+        @return: True if there are no messages.
+        """
+        return self.qsize() == 0
+
+    def close(self):
+        """
+        Closes the queue: waiting producers and consumers are woken up, new messages
+        are dropped. Messages which are already in the queue can still be taken.
+        @return: -
+        """
+        with self._mutex:
+            self._closed = True
+            self._not_full.notify_all()
+            self._not_empty.notify_all()
+
+    def get_stats(self):
+        """
+        Returns statistics of the queue.
+        @return: dictionary with current size, capacity, maximum reached size and
+        amounts of dropped, spilled to disk and timed out messages.
+        """
+        with self._mutex:
+            return {'size': len(self._queue) + self._spilled_count,
+                    'capacity': self._capacity,
+                    'high_watermark': self._high_watermark,
+                    'dropped': self._dropped,
+                    'spilled': self._spilled,
+                    'put_timeouts': self._put_timeouts}
+
+    def _has_messages(self):
+        """
+        Predicate of the not_empty condition.
+        @return: True if there are messages in memory or on disk.
+        """
+        return len(self._queue) > 0 or self._spilled_count > 0
+
+    def _make_room(self, msg_bytes):
+        """
+        Applies overflow policy to the full queue. Is called under the lock.
+        @param msg_bytes: message which is being added.
+        @return: True if message can be added, False if it has been dropped.
+        """
+        if self._overflow_policy == OVERFLOW_BLOCK:
+            if self._not_full.wait_for(lambda: len(self._queue) < self._capacity or self._closed,
+                                       self._put_timeout) and not self._closed:
+                return True
+            self._put_timeouts += 1
+            self._dropped += 1
+            return False
+
+        if self._overflow_policy == OVERFLOW_DROP_LOW_PRIORITY:
+            for i, queued_bytes in enumerate(self._queue):
+                if self._priority_of(queued_bytes) == PRIORITY_LOW:
+                    del self._queue[i]
+                    self._drop_queued(queued_bytes)
+                    return True
+
+            # New low-priority message is dropped rather than an old important one
+            if self._priority_of(msg_bytes) == PRIORITY_LOW:
+                self._dropped += 1
+                return False
+
+        if self._overflow_policy == OVERFLOW_SPILL_TO_DISK:
+            self._spill(msg_bytes)
+            return True
+
+        self._drop_queued(self._queue.popleft())
+        return True
+
+    def _drop_queued(self, msg_bytes):
+        """
+        Counts the dropped queued message and reports about it. Is called under the lock.
+        @param msg_bytes: dropped message.
+        @return: -
+        """
+        self._dropped += 1
+        if self._on_drop is not None:
+            self._on_drop(msg_bytes)
+
+    def _spill(self, msg_bytes):
+        """
+        Writes message to the temporary file. Is called under the lock.
+        @param msg_bytes: serialized JSON-object (bytes).
+        @return: -
+        """
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix='ncrypto_queue_')
+        self._spill_file.seek(self._spill_write_pos)
+        self._spill_file.write(self._record_header.pack(len(msg_bytes)))
+        self._spill_file.write(msg_bytes)
+        self._spill_write_pos = self._spill_file.tell()
+        self._spilled_count += 1
+        self._spilled += 1
+        self._not_empty.notify()
+
+    def _unspill(self):
+        """
+        Moves messages from the temporary file back to memory. Is called under the lock.
+        @return: -
+        """
+        self._spill_file.seek(self._spill_read_pos)
+        while self._spilled_count > 0 and len(self._queue) < self._capacity:
+            (size,) = self._record_header.unpack(self._spill_file.read(self._record_header.size))
+            self._queue.append(self._spill_file.read(size))
+            self._spilled_count -= 1
+        self._spill_read_pos = self._spill_file.tell()
+
+        # File is reused from the beginning when all messages are read
+        if self._spilled_count == 0:
+            self._spill_file.truncate(0)
+            self._spill_read_pos = 0
+            self._spill_write_pos = 0
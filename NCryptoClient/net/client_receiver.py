@@ -2,52 +2,177 @@
 """
 Module which defines Receiver-thread class.
 """
-import time
-from threading import Thread
-from queue import Queue
+import select
+import socket
+from threading import Thread, Event, Lock
+from queue import Empty
 
-from NCryptoTools.tools.utilities import get_current_time
-
-from NCryptoClient.client_instance_holder import client_holder
+from NCryptoClient.net.client_framing import FramingError, create_framer
+from NCryptoClient.net.client_queue import BoundedMsgQueue, default_priority, OVERFLOW_BLOCK
 
 
 class Receiver(Thread):
     """
     Thread-class for controlling the flow of incoming messages, storing them
-    into the buffer for incoming messages.
+    into the buffer for incoming messages. Incoming bytes are passed through
+    the framer, so only complete messages get into the buffer.
+    Thread lives as long as the message handler: sockets are attached to it
+    on every (re)connection and detached after the connection drop. Waiting
+    for data is interrupted by stop() through a separate wakeup socket, so the
+    thread finishes at once.
     """
-    def __init__(self, shared_socket, wait_time=0.1, buffer_size=30):
+    def __init__(self, shared_socket=None, wait_time=0.5, buffer_size=1000, framer=None, recv_size=4096,
+                 on_disconnect=None, overflow_policy=OVERFLOW_BLOCK, put_timeout=None,
+                 priority_of=default_priority):
         """
         Constructor. _input_buffer_queue is implemented as a queue.
-        @param shared_socket: client socket.
-        @param wait_time: wait time in seconds to avoid overheating.
+        @param shared_socket: client socket. Can be attached later with attach().
+        @param wait_time: maximum time in seconds to block on the socket before
+        checking the stop flag. Does not delay incoming data.
         @param buffer_size: buffer size in number of elements.
+        @param framer: framer which splits the byte stream into messages.
+        @param recv_size: maximum amount of bytes to be read at once.
+        @param on_disconnect: callback(reason) which is called when connection drops.
+        @param overflow_policy: behaviour of the full buffer (one of OVERFLOW_* constants).
+        By default thread waits for the free space and stops reading the socket, so
+        the server slows down (TCP backpressure) and no message is lost.
+        @param put_timeout: maximum wait time in seconds for OVERFLOW_BLOCK policy.
+        @param priority_of: function which defines priority of a message (see BoundedMsgQueue).
         """
         super().__init__()
         self.daemon = True
-        self._socket = shared_socket
         self._wait_time = wait_time
-        self._input_buffer_queue = Queue(buffer_size)
-        self._main_window = client_holder.get_instance('MainWindow')
+        self._input_buffer_queue = BoundedMsgQueue(buffer_size, overflow_policy, put_timeout, priority_of)
+        self._framer = framer if framer is not None else create_framer()
+        self._recv_size = recv_size
+        self._on_disconnect = on_disconnect
+        self._stop_event = Event()
+
+        self._lock = Lock()
+        self._attached_event = Event()
+        self._socket = None
+
+        # stop() writes a byte here to wake up select()
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._wakeup_reader.setblocking(False)
+        if shared_socket is not None:
+            self.attach(shared_socket)
 
-    def pop_msg_from_queue(self):
+    def attach(self, shared_socket):
         """
-        Takes first element from the queue.
-        @return: JSON-object. (message).
+        Starts reading from the new socket.
+        @param shared_socket: connected client socket.
+        @return: -
         """
-        return self._input_buffer_queue.get() if self._input_buffer_queue.qsize() > 0 else None
+        with self._lock:
+            self._socket = shared_socket
+            # Data left from the previous connection can not be completed
+            self._framer.reset()
+        self._attached_event.set()
+
+    def detach(self):
+        """
+        Stops reading from the current socket.
+        @return: -
+        """
+        with self._lock:
+            self._socket = None
+        self._attached_event.clear()
+
+    def pop_msg_from_queue(self, timeout=None):
+        """
+        Takes first element from the queue, waiting for it if the queue is empty.
+        @param timeout: maximum wait time in seconds. None - waits until message arrives.
+        @return: JSON-object (message) or None if nothing has arrived in time.
+        """
+        try:
+            return self._input_buffer_queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+    def get_queue_stats(self):
+        """
+        Returns statistics of the buffer for incoming messages.
+        @return: dictionary with statistics (see BoundedMsgQueue.get_stats()).
+        """
+        return self._input_buffer_queue.get_stats()
+
+    def stop(self):
+        """
+        Asks thread to finish. Thread is woken up if it waits for data, for a socket
+        or for the free space in the buffer.
+        @return: -
+        """
+        self._stop_event.set()
+        self._input_buffer_queue.close()
+        self._attached_event.set()
+        try:
+            self._wakeup_writer.send(b'\0')
+        except OSError:
+            # Thread has already finished and closed the wakeup socket
+            pass
 
     def run(self):
         """
         Runs thread routine.
         @return: -
         """
-        while True:
+        try:
+            self._receive()
+        finally:
+            self._wakeup_reader.close()
+            self._wakeup_writer.close()
+
+    def _receive(self):
+        """
+        Reads attached sockets until thread is stopped.
+        @return: -
+        """
+        while not self._stop_event.is_set():
+            if not self._attached_event.wait(self._wait_time):
+                continue
+            shared_socket = self._socket
+            if shared_socket is None:
+                continue
+
             try:
-                msg_bytes = self._socket.recv(1024)
-            except OSError as e:
-                self._main_window.add_data_in_tab('Log', '[{}] @NCryptoChat> {}'.format(get_current_time(), str(e)))
-                return
-            else:
+                # Blocks until data arrives or stop() is called
+                readable, _, _ = select.select([shared_socket, self._wakeup_reader], [], [], self._wait_time)
+                if shared_socket not in readable:
+                    continue
+                data = shared_socket.recv(self._recv_size)
+            except (OSError, ValueError) as e:
+                self._report_disconnect(shared_socket, str(e))
+                continue
+
+            # Empty result means that the server has closed the connection
+            if not data:
+                self._report_disconnect(shared_socket, 'Connection has been closed by the server.')
+                continue
+
+            try:
+                frames = self._framer.feed(data)
+            except FramingError as e:
+                # Stream can not be resynchronized, so the connection is dropped
+                shared_socket.close()
+                self._report_disconnect(shared_socket, str(e))
+                continue
+
+            for msg_bytes in frames:
                 self._input_buffer_queue.put(msg_bytes)
-            time.sleep(self._wait_time)
+
+    def _report_disconnect(self, shared_socket, reason):
+        """
+        Detaches broken socket and reports about the connection drop.
+        Errors of already detached sockets are ignored.
+        @param shared_socket: socket which has failed.
+        @param reason: description of the failure.
+        @return: -
+        """
+        with self._lock:
+            if self._socket is not shared_socket:
+                return
+            self._socket = None
+        self._attached_event.clear()
+        if self._on_disconnect is not None:
+            self._on_disconnect(reason)
@@ -2,52 +2,266 @@
 """
 Module which defines Sender-thread class.
 """
-import time
-from threading import Thread
-from queue import Queue
+import socket
+from collections import deque
+from threading import Thread, Event, Lock, Condition
+from queue import Empty
 
-from NCryptoTools.tools.utilities import get_current_time
-
-from NCryptoClient.client_instance_holder import client_holder
+from NCryptoClient.net.client_framing import create_framer
+from NCryptoClient.net.client_queue import BoundedMsgQueue, default_priority, OVERFLOW_SPILL_TO_DISK
 
 
 class Sender(Thread):
     """
     Thread-class for controlling the flow of outgoing messages, storing them
     into the buffer for outgoing messages.
+    Thread lives as long as the message handler: sockets are attached to it
+    on every (re)connection. While there is no connection, messages wait in
+    the buffer; messages which have failed to be sent are sent again first.
+    All messages which are waiting in the buffer are written with one vectored
+    write (sendmsg), so a burst of messages costs one system call.
+    Messages taken into the buffer and written to the socket are counted, so
+    the handler can wait until everything has been written before closing.
+    Messages dropped from the full buffer are not waited for.
     """
-    def __init__(self, shared_socket, wait_time=0.1, buffer_size=30):
+    # sendmsg() is not available on Windows, frames are joined there instead
+    _has_sendmsg = hasattr(socket.socket, 'sendmsg')
+
+    def __init__(self, shared_socket=None, wait_time=0.5, buffer_size=1000, framer=None, on_disconnect=None,
+                 max_batch_size=256, overflow_policy=OVERFLOW_SPILL_TO_DISK, put_timeout=None,
+                 priority_of=default_priority):
         """
         Constructor. _output_buffer_queue is implemented as a queue.
-        @param shared_socket: client socket.
-        @param wait_time: wait time in seconds to avoid overheating.
+        @param shared_socket: client socket. Can be attached later with attach().
+        @param wait_time: maximum time in seconds to block on the empty queue before
+        checking the stop flag. Does not delay outgoing data.
         @param buffer_size: buffer size in number of elements.
+        @param framer: framer which wraps outgoing messages into frames.
+        @param on_disconnect: callback(reason) which is called when connection drops.
+        @param max_batch_size: maximum amount of messages written with one system call.
+        @param overflow_policy: behaviour of the full buffer (one of OVERFLOW_* constants).
+        By default messages which do not fit are moved to disk, so GUI thread never
+        waits for the slow server and no message is lost.
+        @param put_timeout: maximum wait time in seconds for OVERFLOW_BLOCK policy.
+        @param priority_of: function which defines priority of a message (see BoundedMsgQueue).
         """
         super().__init__()
         self.daemon = True
-        self._socket = shared_socket
         self._wait_time = wait_time
-        self._output_buffer_queue = Queue(buffer_size)
-        self._main_window = client_holder.get_instance('MainWindow')
+        self._output_buffer_queue = BoundedMsgQueue(buffer_size, overflow_policy, put_timeout, priority_of,
+                                                    self._on_queued_msg_dropped)
+        self._framer = framer if framer is not None else create_framer()
+        self._on_disconnect = on_disconnect
+        self._stop_event = Event()
+
+        self._lock = Lock()
+        self._attached_event = Event()
+        self._socket = None
+        self._preamble = deque()
+        self._unsent = []
+        self._max_batch_size = max_batch_size
+
+        # Statistics of the sent data
+        self._stats_lock = Lock()
+        self._sent_bytes = 0
+        self._sent_frames = 0
+        self._syscalls = 0
+
+        # Messages accepted to the buffer and completely written to the socket
+        self._drain_condition = Condition()
+        self._accepted_count = 0
+        self._written_count = 0
+        if shared_socket is not None:
+            self.attach(shared_socket)
+
+    def attach(self, shared_socket, preamble=()):
+        """
+        Starts sending to the new socket.
+        @param shared_socket: connected client socket.
+        @param preamble: messages which should be sent before queued ones.
+        @return: -
+        """
+        with self._lock:
+            self._socket = shared_socket
+            self._preamble = deque(preamble)
+        self._attached_event.set()
+
+    def detach(self):
+        """
+        Stops sending to the current socket.
+        @return: -
+        """
+        with self._lock:
+            self._socket = None
+            self._preamble.clear()
+        self._attached_event.clear()
 
     def add_msg_to_queue(self, msg_bytes):
         """
         Stores new JSON-object in the outgoing queue.
         @param msg_bytes: serialized JSON-object (bytes).
+        @return: True if message has been queued, False if it has been dropped.
+        """
+        # Counted before, so the message can not be dropped from the buffer uncounted
+        with self._drain_condition:
+            self._accepted_count += 1
+        if self._output_buffer_queue.put(msg_bytes):
+            return True
+        self._on_queued_msg_dropped(msg_bytes)
+        return False
+
+    def _on_queued_msg_dropped(self, msg_bytes):
+        """
+        Stops waiting for the message which has been dropped from the buffer.
+        @param msg_bytes: dropped message.
+        @return: -
+        """
+        with self._drain_condition:
+            self._accepted_count -= 1
+            self._drain_condition.notify_all()
+
+    def wait_for_drain(self, timeout=None):
+        """
+        Waits until all queued messages have been written to the socket.
+        @param timeout: maximum wait time in seconds. None - waits until they are written.
+        @return: True if there are no unwritten messages.
+        """
+        with self._drain_condition:
+            return self._drain_condition.wait_for(lambda: self._written_count >= self._accepted_count,
+                                                  timeout)
+
+    def get_queue_stats(self):
+        """
+        Returns statistics of the buffer for outgoing messages.
+        @return: dictionary with statistics (see BoundedMsgQueue.get_stats()).
+        """
+        return self._output_buffer_queue.get_stats()
+
+    def stop(self):
+        """
+        Asks thread to finish. Messages which should not be lost are waited
+        for with wait_for_drain() before.
         @return: -
         """
-        self._output_buffer_queue.put(msg_bytes)
+        self._stop_event.set()
+        self._output_buffer_queue.close()
+
+        # Wakes up the thread if it waits for a socket
+        self._attached_event.set()
+
+    def get_stats(self):
+        """
+        Returns statistics of the sent data.
+        @return: dictionary with amount of sent bytes, frames and used system calls.
+        """
+        with self._stats_lock:
+            return {'bytes': self._sent_bytes,
+                    'frames': self._sent_frames,
+                    'syscalls': self._syscalls}
 
     def run(self):
         """
         Runs thread routine.
         @return: -
         """
-        while True:
-            if self._output_buffer_queue.qsize() > 0:
-                msg_bytes = self._output_buffer_queue.get()
-                try:
-                    self._socket.send(msg_bytes)
-                except OSError as e:
-                    self._main_window.add_data_in_tab('Log', '[{}] @NCryptoChat> {}'.format(get_current_time(), str(e)))
-            time.sleep(self._wait_time)
+        while not self._stop_event.is_set():
+            if not self._attached_event.wait(self._wait_time):
+                continue
+            with self._lock:
+                shared_socket = self._socket
+                if shared_socket is None:
+                    continue
+                # Long preamble (many chatrooms) is written in several batches
+                preamble = [self._preamble.popleft()
+                            for _ in range(min(len(self._preamble), self._max_batch_size))]
+
+            # Session is restored first, then messages which have failed to be sent
+            # are repeated, then everything which is waiting in the buffer
+            if preamble:
+                messages = preamble
+            else:
+                if not self._unsent:
+                    try:
+                        self._unsent.append(self._output_buffer_queue.get(timeout=self._wait_time))
+                    except Empty:
+                        continue
+                while len(self._unsent) < self._max_batch_size:
+                    try:
+                        self._unsent.append(self._output_buffer_queue.get_nowait())
+                    except Empty:
+                        break
+                messages = self._unsent
+
+            batch_size = len(messages)
+            try:
+                self._send_messages(shared_socket, messages)
+            except (OSError, ValueError) as e:
+                self._report_disconnect(shared_socket, str(e))
+
+            # Written messages are deleted from the list (preamble is not counted as queued)
+            if not preamble:
+                with self._drain_condition:
+                    self._written_count += batch_size - len(messages)
+                    self._drain_condition.notify_all()
+
+    def _send_messages(self, shared_socket, messages):
+        """
+        Writes messages to the socket, using as few system calls as possible.
+        Partial writes are continued from the first unsent byte. Messages are
+        deleted from the list as soon as they are completely sent, so in case of
+        an error the list contains only messages which should be sent again.
+        @param shared_socket: connected client socket.
+        @param messages: list of messages (bytes).
+        @return: -
+        """
+        # Each message turns into one or more buffers (e.g. header + payload)
+        buffers = []
+        message_ends = []
+        for msg_bytes in messages:
+            buffers.extend(memoryview(part) for part in self._framer.encode_parts(msg_bytes))
+            message_ends.append(len(buffers))
+
+        first_buffer = 0
+        sent_messages = 0
+        try:
+            while first_buffer < len(buffers):
+                if self._has_sendmsg:
+                    sent = shared_socket.sendmsg(buffers[first_buffer:])
+                else:
+                    sent = shared_socket.send(b''.join(buffers[first_buffer:]))
+
+                with self._stats_lock:
+                    self._syscalls += 1
+                    self._sent_bytes += sent
+
+                # Skips completely sent buffers and cuts the partially sent one
+                while sent > 0:
+                    size = len(buffers[first_buffer])
+                    if sent < size:
+                        buffers[first_buffer] = buffers[first_buffer][sent:]
+                        break
+                    sent -= size
+                    first_buffer += 1
+                    while sent_messages < len(message_ends) and message_ends[sent_messages] <= first_buffer:
+                        sent_messages += 1
+        finally:
+            with self._stats_lock:
+                self._sent_frames += sent_messages
+            del messages[:sent_messages]
+
+    def _report_disconnect(self, shared_socket, reason):
+        """
+        Detaches broken socket and reports about the connection drop.
+        Errors of already detached sockets are ignored.
+        @param shared_socket: socket which has failed.
+        @param reason: description of the failure.
+        @return: -
+        """
+        with self._lock:
+            if self._socket is not shared_socket:
+                return
+            self._socket = None
+            self._preamble.clear()
+        self._attached_event.clear()
+        if self._on_disconnect is not None:
+            self._on_disconnect(reason)
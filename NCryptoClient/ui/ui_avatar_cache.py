@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Module which caches avatars of contacts. Avatar files are found, decoded and
+scaled by worker threads, and only when a contact is painted for the first
+time, so adding a big list of contacts does not touch any image. Decoded
+avatars are kept in the LRU cache limited by memory. Contacts without an
+avatar get a placeholder whose colour is derived from the contact name.
+"""
+import os
+import zlib
+from collections import OrderedDict
+
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+
+# Extensions of avatar files, in order of searching
+AVATAR_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def get_name_color(name):
+    """
+    Derives colour from the name, so a contact has the same colour in every session.
+    @param name: contact name.
+    @return: list [red, green, blue], every component is in range [100, 225).
+    """
+    value = zlib.crc32(name.encode('utf-8'))
+    return [100 + ((value >> shift) & 0xFF) * 125 // 256 for shift in (0, 8, 16)]
+
+
+def load_avatar_image(avatars_dir, contact_name, size):
+    """
+    Searches avatar file of the contact, decodes and scales it.
+    Uses only QImage, so it can be called from any thread.
+    @param avatars_dir: directory with avatar files (named after contacts).
+    @param contact_name: contact name.
+    @param size: size of the square avatar in pixels.
+    @return: image (QImage) or None if there is no readable avatar.
+    """
+    for extension in AVATAR_EXTENSIONS:
+        path = os.path.join(avatars_dir, contact_name + extension)
+        if not os.path.isfile(path):
+            continue
+
+        reader = QImageReader(path)
+        image_size = reader.size()
+        if image_size.isValid():
+            # Decoder scales the image itself (JPEG is decoded in a smaller size)
+            reader.setScaledSize(image_size.scaled(size, size, Qt.KeepAspectRatioByExpanding))
+        image = reader.read()
+        if image.isNull():
+            continue
+
+        image = image.scaled(size, size, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
+        image = image.copy((image.width() - size) // 2, (image.height() - size) // 2, size, size)
+        return image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    return None
+
+
+class _AvatarLoader(QRunnable):
+    """
+    Task which loads avatar of a contact in the thread pool.
+    """
+    def __init__(self, avatars_dir, contact_name, size, loaded_signal):
+        """
+        Constructor.
+        @param avatars_dir: directory with avatar files.
+        @param contact_name: contact name.
+        @param size: size of the square avatar in pixels.
+        @param loaded_signal: signal (contact name, image or None) emitted with the result.
+        """
+        super().__init__()
+        self._avatars_dir = avatars_dir
+        self._contact_name = contact_name
+        self._size = size
+        self._loaded_signal = loaded_signal
+
+    def run(self):
+        """
+        Loads the avatar and sends it to the GUI thread.
+        @return: -
+        """
+        self._loaded_signal.emit(self._contact_name,
+                                 load_avatar_image(self._avatars_dir, self._contact_name, self._size))
+
+
+class AvatarCache(QObject):
+    """
+    Class which gives avatars of contacts to the GUI thread. Must be used
+    from the GUI thread only: QPixmap can not be created in other threads.
+    """
+    # Avatar of the contact has been loaded: contact name
+    avatar_loaded = pyqtSignal(str)
+
+    # Result of a worker thread: contact name, QImage or None
+    _image_loaded = pyqtSignal(str, object)
+
+    def __init__(self, avatars_dir, avatar_size=64, max_bytes=16 * 1024 * 1024, parent=None):
+        """
+        Constructor.
+        @param avatars_dir: directory with avatar files (<contact name>.png, .jpg, ...).
+        @param avatar_size: size of the square avatar in pixels.
+        @param max_bytes: maximum memory used by the cached avatars.
+        @param parent: parent object.
+        """
+        super().__init__(parent)
+        self._avatars_dir = avatars_dir
+        self._avatar_size = avatar_size
+        self._max_bytes = max_bytes
+
+        # Contact name -> QPixmap, from the least recently used one
+        self._pixmaps = OrderedDict()
+        self._used_bytes = 0
+        # Contacts which are being loaded and contacts without avatars
+        self._pending = set()
+        self._missing = set()
+
+        self._thread_pool = QThreadPool(self)
+        self._thread_pool.setMaxThreadCount(2)
+        self._image_loaded.connect(self._on_image_loaded)
+
+    def get(self, contact_name):
+        """
+        Returns avatar of the contact. If it is not loaded yet, starts loading.
+        @param contact_name: contact name.
+        @return: avatar (QPixmap) or None if the contact has no avatar (or it is being loaded).
+        """
+        pixmap = self._pixmaps.get(contact_name)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(contact_name)
+            return pixmap
+
+        if contact_name not in self._pending and contact_name not in self._missing:
+            self._pending.add(contact_name)
+            self._thread_pool.start(_AvatarLoader(self._avatars_dir, contact_name,
+                                                  self._avatar_size, self._image_loaded))
+        return None
+
+    def invalidate(self, contact_name):
+        """
+        Forgets avatar of the contact, so it is loaded again next time (e.g. after its change).
+        @param contact_name: contact name.
+        @return: -
+        """
+        self._missing.discard(contact_name)
+        pixmap = self._pixmaps.pop(contact_name, None)
+        if pixmap is not None:
+            self._used_bytes -= self._get_pixmap_bytes(pixmap)
+
+    def get_used_bytes(self):
+        """
+        Getter. Returns memory used by the cached avatars.
+        @return: amount of bytes.
+        """
+        return self._used_bytes
+
+    def wait_for_done(self, timeout=-1):
+        """
+        Waits until all started loadings are finished.
+        @param timeout: maximum wait time in milliseconds. -1 - waits until they are finished.
+        @return: True if all loadings are finished.
+        """
+        return self._thread_pool.waitForDone(timeout)
+
+    def _on_image_loaded(self, contact_name, image):
+        """
+        Puts loaded avatar in the cache. Is called in the GUI thread.
+        @param contact_name: contact name.
+        @param image: image (QImage) or None if the contact has no avatar.
+        @return: -
+        """
+        self._pending.discard(contact_name)
+        if image is None:
+            self._missing.add(contact_name)
+            return
+
+        pixmap = QPixmap.fromImage(image)
+        self._pixmaps[contact_name] = pixmap
+        self._used_bytes += self._get_pixmap_bytes(pixmap)
+
+        # Least recently used avatars are removed (the new one is kept anyway)
+        while self._used_bytes > self._max_bytes and len(self._pixmaps) > 1:
+            _, evicted_pixmap = self._pixmaps.popitem(last=False)
+            self._used_bytes -= self._get_pixmap_bytes(evicted_pixmap)
+        self.avatar_loaded.emit(contact_name)
+
+    @staticmethod
+    def _get_pixmap_bytes(pixmap):
+        """
+        Calculates memory used by the pixmap.
+        @param pixmap: pixmap.
+        @return: amount of bytes.
+        """
+        return pixmap.width() * pixmap.height() * pixmap.depth() // 8
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Module which implements the transcript of a chat tab as a model/view pair.
+Messages are stored in the model as plain tuples and are painted by the
+delegate directly, so a row costs the same small amount of memory no
+matter how many messages the tab holds, and no widgets are created per row.
+Rows come already decoded (see client_rich_text), the model does not parse them.
+Times are stored as numbers and formatted only for the painted rows.
+"""
+from PyQt5.QtWidgets import *
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+
+from NCryptoClient.utils.client_rich_text import STYLE_BOLD, STYLE_ITALIC, STYLE_UNDERLINE
+from NCryptoClient.utils.client_time_format import timestamp_formatter
+
+# Height of a single row in pixels
+ROW_HEIGHT = 20
+
+
+class ChatTranscriptModel(QAbstractListModel):
+    """
+    Model-class which stores messages of a chat tab. Each row is a tuple
+    (sender, plain text, style runs, timestamp). Header of the message is
+    made of the timestamp and the sender. Timestamp and row id of the history
+    source are used to load older messages from the history. Timestamp can be
+    None, row id is None for messages which have not come from the history.
+    """
+    def __init__(self, parent=None):
+        """
+        Constructor.
+        @param parent: parent object.
+        """
+        super().__init__(parent)
+        self._rows = []
+        self._row_ids = []
+
+    def rowCount(self, parent=QModelIndex()):
+        """
+        Returns amount of messages.
+        @param parent: parent index (the model is flat).
+        @return: amount of rows.
+        """
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        """
+        Returns data of the row for the needed role.
+        @param index: index of the row.
+        @param role: data role.
+        @return: data or None.
+        """
+        if not index.isValid():
+            return None
+        sender, text, _, timestamp = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return '{} {}'.format(timestamp_formatter.format_header(timestamp, sender), text)
+        if role == Qt.ToolTipRole:
+            return text
+        return None
+
+    def row_at(self, row):
+        """
+        Returns stored row without conversion to QVariant. Is used by the delegate.
+        @param row: row number.
+        @return: tuple (sender, plain text, style runs, timestamp).
+        """
+        return self._rows[row]
+
+    def oldest_key(self):
+        """
+        Returns key of the first row in the history source.
+        @return: tuple (timestamp, row id) or None if the transcript is empty.
+        """
+        if not self._rows:
+            return None
+        return self._rows[0][3], self._row_ids[0]
+
+    def append_rows(self, rows):
+        """
+        Adds a batch of messages to the end of the transcript with a single insert.
+        @param rows: list of (sender, plain text, style runs, timestamp) tuples.
+        @return: -
+        """
+        if not rows:
+            return
+        first_row = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first_row, first_row + len(rows) - 1)
+        self._rows.extend(rows)
+        self._row_ids.extend([None] * len(rows))
+        self.endInsertRows()
+
+    def prepend_rows(self, rows, row_ids=None):
+        """
+        Adds a batch of older messages to the beginning of the transcript.
+        @param rows: list of (sender, plain text, style runs, timestamp) tuples,
+        sorted from the oldest one to the newest one.
+        @param row_ids: list of row ids of the messages in the history source.
+        None - messages have no row ids.
+        @return: -
+        """
+        if not rows:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+        self._rows[0:0] = rows
+        self._row_ids[0:0] = row_ids if row_ids is not None else [None] * len(rows)
+        self.endInsertRows()
+
+    def trim_oldest(self, max_rows):
+        """
+        Deletes the oldest rows which do not fit in the limit.
+        @param max_rows: maximum amount of rows.
+        @return: amount of deleted rows.
+        """
+        excess = len(self._rows) - max_rows
+        if excess <= 0:
+            return 0
+        self.remove_rows(0, excess)
+        return excess
+
+    def find_row(self, text):
+        """
+        Searches the first row with the needed message text.
+        @param text: plain message text.
+        @return: row number or None if there is no such row.
+        """
+        for row, (_, row_text, _, _) in enumerate(self._rows):
+            if row_text == text:
+                return row
+        return None
+
+    def remove_rows(self, row, count=1):
+        """
+        Deletes rows from the transcript.
+        @param row: number of the first row.
+        @param count: amount of rows.
+        @return: -
+        """
+        if count <= 0:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row + count - 1)
+        del self._rows[row:row + count]
+        del self._row_ids[row:row + count]
+        self.endRemoveRows()
+
+
+class ChatTranscriptDelegate(QStyledItemDelegate):
+    """
+    Delegate-class which paints a transcript row: header (time and sender) in
+    the default font, followed by the runs of the message text in their styles.
+    """
+    _margin = 4
+
+    def __init__(self, parent=None):
+        """
+        Constructor.
+        @param parent: parent object.
+        """
+        super().__init__(parent)
+        self._base_font = None
+        # Style flags -> (font, font metrics)
+        self._fonts = {}
+
+    def paint(self, painter, option, index):
+        """
+        Paints the row.
+        @param painter: painter of the view.
+        @param option: style options of the row.
+        @param index: index of the row.
+        @return: -
+        """
+        sender, text, runs, timestamp = index.model().row_at(index.row())
+        header = timestamp_formatter.format_header(timestamp, sender) + ' '
+
+        painter.save()
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+            painter.setPen(option.palette.color(QPalette.HighlightedText))
+        else:
+            painter.setPen(option.palette.color(QPalette.Text))
+
+        rect = option.rect.adjusted(self._margin, 0, -self._margin, 0)
+        painter.setFont(option.font)
+        painter.drawText(rect, Qt.AlignLeft | Qt.AlignVCenter, header)
+
+        rect.setLeft(rect.left() + option.fontMetrics.width(header))
+
+        # Runs are painted one after another, the one which does not fit is elided
+        for i, (start, style) in enumerate(runs):
+            end = runs[i + 1][0] if i + 1 < len(runs) else len(text)
+            font, font_metrics = self._styled_font(option.font, style)
+            painter.setFont(font)
+            run_text = text[start:end]
+            run_width = font_metrics.width(run_text)
+            if run_width > rect.width():
+                painter.drawText(rect, Qt.AlignLeft | Qt.AlignVCenter,
+                                 font_metrics.elidedText(text[start:], Qt.ElideRight, rect.width()))
+                break
+            painter.drawText(rect, Qt.AlignLeft | Qt.AlignVCenter, run_text)
+            rect.setLeft(rect.left() + run_width)
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        """
+        Returns size of the row. All rows have the same height.
+        @param option: style options of the row.
+        @param index: index of the row.
+        @return: size of the row.
+        """
+        return QSize(option.rect.width(), ROW_HEIGHT)
+
+    def _styled_font(self, base_font, style):
+        """
+        Returns font of the needed style. Fonts are created once per style.
+        @param base_font: font of the view.
+        @param style: style flags.
+        @return: tuple (font, font metrics).
+        """
+        if base_font != self._base_font:
+            self._base_font = QFont(base_font)
+            self._fonts = {}
+
+        styled_font = self._fonts.get(style)
+        if styled_font is None:
+            font = QFont(base_font)
+            font.setBold(bool(style & STYLE_BOLD))
+            font.setItalic(bool(style & STYLE_ITALIC))
+            font.setUnderline(bool(style & STYLE_UNDERLINE))
+            styled_font = (font, QFontMetrics(font))
+            self._fonts[style] = styled_font
+        return styled_font
@@ -3,30 +3,45 @@
 Module which implements Chat area implemented as a QtabWidget.
 """
 import datetime
-from queue import Queue
 
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 
-from NCryptoTools.tools.utilities import get_formatted_date
 from NCryptoTools.jim.jim_constants import JIMMsgType
 from NCryptoTools.jim.jim_core import JIMMessage
 
-from NCryptoClient.utils.constants import BOLD_IMG_PATH, ITALIC_IMG_PATH, UNDERLINED_IMG_PATH
+from NCryptoClient.ui.ui_chat_model import ChatTranscriptModel, ChatTranscriptDelegate, ROW_HEIGHT
+from NCryptoClient.ui.ui_resources import resource_registry
+from NCryptoClient.utils.client_rich_text import STYLE_PLAIN, STYLE_BOLD, STYLE_ITALIC, STYLE_UNDERLINE, \
+    encode_rich_text, decode_rich_text, prepare_messages
+from NCryptoClient.utils.constants import BOLD_IMG, ITALIC_IMG, UNDERLINED_IMG, \
+    SCROLLBACK_LIMIT, HISTORY_PAGE_SIZE
 
 
 class UiChat(QTabWidget):
     """
     Widget-class which has a set of tabs, each of which is a separate chat.
+    Tabs are indexed by name, so messages are added without searching the tab.
+    Index keeps widgets (not positions), so it stays valid when tabs are moved.
     """
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, history_source=None,
+                 scrollback_limit=SCROLLBACK_LIMIT,
+                 history_page_size=HISTORY_PAGE_SIZE):
         """
         Constructor. Initializes chat, creating an empty window without tabs.
         @param parent: parent window.
+        @param history_source: source of older messages (HistorySource) or None.
+        @param scrollback_limit: maximum amount of messages kept in memory by a tab.
+        @param history_page_size: amount of messages loaded from the history at once.
         """
         super().__init__(parent)
         self.parent = parent
+        self._history_source = history_source
+        self._scrollback_limit = scrollback_limit
+        self._history_page_size = history_page_size
+        # Tab name (chat name) -> tab widget
+        self._tabs = {}
         self.setGeometry(328, 64, 664, 816)
         self.setObjectName('chat_tw')
         self.setTabsClosable(True)
@@ -39,30 +54,21 @@ class UiChat(QTabWidget):
         @param chat_name: chat name.
         @return: -
         """
-        tabs_amount = self.count()
-
         # if there is no tabs, chat widget can possibly be in a closed state,
         # so we should open it first
         if self.count() == 0:
             self.show()
-            chat_widget = UiChatTab(chat_name, self)
-            self.addTab(chat_widget, chat_name)
-            self.setCurrentIndex(0)
-            chat_widget.show()
 
-        # if chat widget already has some tabs, we check that the tab with
-        # needed name is not there
-        else:
-            index = self.find_tab(chat_name)
-            if index is None:
-                chat_widget = UiChatTab(chat_name, self)
-                self.addTab(chat_widget, chat_name)
-                self.setCurrentIndex(tabs_amount)
-                chat_widget.show()
-
-            # if tab already exists, we switch the current selection to it
-            else:
-                self.setCurrentIndex(index)
+        # if tab already exists, we switch the current selection to it
+        chat_widget = self._tabs.get(chat_name)
+        if chat_widget is not None:
+            self.setCurrentWidget(chat_widget)
+            return
+
+        chat_widget = self.create_chat_tab(chat_name)
+        self._tabs[chat_name] = chat_widget
+        self.setCurrentIndex(self.addTab(chat_widget, chat_name))
+        chat_widget.show()
 
     def close_chat_tab_by_name(self, tab_name):
         """
@@ -80,6 +86,7 @@ class UiChat(QTabWidget):
         @return: -
         """
         if index is not None:
+            self._tabs.pop(self.widget(index).tab_name, None)
             self.removeTab(index)
 
         # if user has closed the last tab - shows the inscription
@@ -93,37 +100,68 @@ class UiChat(QTabWidget):
         @param tab_name: tab name (chat name).
         @return: tab index.
         """
-        # Handles one-tab case separately, because range() will give us an error
-        tabs_amount = self.count()
-        if tabs_amount == 1:
-            if self.widget(0).tab_name == tab_name:
-                return 0
+        chat_widget = self._tabs.get(tab_name)
+        if chat_widget is None:
             return None
+        return self.indexOf(chat_widget)
 
-        for i in range(0, tabs_amount):
-            if self.widget(i).tab_name == tab_name:
-                return i
-        return None
+    def get_tab(self, tab_name):
+        """
+        Returns tab widget by its name.
+        @param tab_name: tab name (chat name).
+        @return: tab widget or None if the tab is not opened.
+        """
+        return self._tabs.get(tab_name)
 
-    def add_tab_data(self, tab_index, time, message):
+    def append_to_tab(self, tab_name, sender, message, timestamp=None):
         """
-        Adds new message (data) to the needed tab. This function is used
-        when needs to load messages from history.
-        @param tab_index: tab index.
-        @param time: time/sender string.
-        @param message: new message.
-        @return: -
+        Adds new message to the tab with needed name.
+        @param tab_name: tab name (chat name).
+        @param sender: sender part of the header.
+        @param message: new message (text with style tags).
+        @param timestamp: time of the message.
+        @return: True if the tab is opened.
         """
-        self.widget(tab_index).add_data(time, message)
+        chat_widget = self._tabs.get(tab_name)
+        if chat_widget is None:
+            return False
+        chat_widget.add_data(sender, message, timestamp)
+        return True
 
-    def add_tab_data_from_buffer(self, tab_index):
+    def append_rows_to_tab(self, tab_name, rows):
         """
-        Adds new message (data) to the needed tab from the tab's internal
-        buffer. This function is used when the current user sends messages.
+        Adds a batch of decoded messages to the tab with needed name with a single insert.
+        @param tab_name: tab name (chat name).
+        @param rows: list of (sender, plain text, style runs, timestamp) tuples.
+        @return: True if the tab is opened.
+        """
+        chat_widget = self._tabs.get(tab_name)
+        if chat_widget is None:
+            return False
+        chat_widget.add_rows(rows)
+        return True
+
+    def create_chat_tab(self, chat_name):
+        """
+        Creates tab widget with the settings of the scrollback.
+        @param chat_name: chat name.
+        @return: tab widget.
+        """
+        return UiChatTab(chat_name, self,
+                         history_source=self._history_source,
+                         scrollback_limit=self._scrollback_limit,
+                         history_page_size=self._history_page_size)
+
+    def add_tab_data(self, tab_index, sender, message, timestamp=None):
+        """
+        Adds new message (data) to the needed tab.
         @param tab_index: tab index.
+        @param sender: sender part of the header.
+        @param message: new message.
+        @param timestamp: time of the message.
         @return: -
         """
-        self.widget(tab_index).add_data_from_buffer()
+        self.widget(tab_index).add_data(sender, message, timestamp)
 
     def remove_tab_data(self, tab_index, data):
         """
@@ -142,19 +180,49 @@ class UiChatTab(QWidget):
     Since we use a set of widgets placing them on each tab,
     we need a custom widget to group them. This class groups
     tab widgets in oneself.
+    Tab keeps no more than scrollback_limit messages in memory. Older messages
+    are loaded page by page from the history source when the user scrolls up.
     """
-    def __init__(self, tab_name, parent=None):
+    def __init__(self, tab_name, parent=None,
+                 history_source=None,
+                 scrollback_limit=SCROLLBACK_LIMIT,
+                 history_page_size=HISTORY_PAGE_SIZE):
         super().__init__(parent)
         self.parent = parent
-        self._message_queue = Queue(30)
         self.tab_name = tab_name
 
-        # Chat window (messages display)
-        self._chat_lb = QListWidget(self)
+        self._history_source = history_source
+        self._scrollback_limit = scrollback_limit
+        self._history_page_size = history_page_size
+        self._history_exhausted = history_source is None
+
+        # Chat window (messages display). Rows are painted by the delegate.
+        # Table with rows of fixed height is used, because it does not lay out
+        # all rows again when rows are added or evicted (unlike QListView)
+        self._chat_model = ChatTranscriptModel(self)
+        self._chat_lb = QTableView(self)
         self._chat_lb.setGeometry(QRect(8, 8, 640, 640))
-        self._chat_lb.setResizeMode(QListView.Adjust)
+        self._chat_lb.horizontalHeader().hide()
+        self._chat_lb.horizontalHeader().setStretchLastSection(True)
+        self._chat_lb.verticalHeader().hide()
+        self._chat_lb.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self._chat_lb.verticalHeader().setDefaultSectionSize(ROW_HEIGHT)
+        self._chat_lb.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self._chat_lb.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self._chat_lb.setShowGrid(False)
+        self._chat_lb.setWordWrap(False)
+        self._chat_lb.setModel(self._chat_model)
+        self._chat_lb.setItemDelegate(ChatTranscriptDelegate(self._chat_lb))
         self._chat_lb.setObjectName(tab_name + '_contacts_lb')
 
+        # View follows new messages only while it is scrolled to the bottom
+        self._stick_to_bottom = True
+        scroll_bar = self._chat_lb.verticalScrollBar()
+        scroll_bar.valueChanged.connect(self._on_scroll)
+        scroll_bar.rangeChanged.connect(self._on_scroll_range_changed)
+        # Scroll events caused by changes of the rows themselves are ignored
+        self._updating_rows = False
+
         # Message input box
         self._msg_te = QTextEdit(self)
         self._msg_te.setGeometry(QRect(8, 656, 544, 120))
@@ -166,23 +234,23 @@ class UiChatTab(QWidget):
         self._msg_te.setFont(self._font)
 
         self._buttons = []
-        self._add_bitmap_button(BOLD_IMG_PATH,
+        self._add_bitmap_button(BOLD_IMG,
                                 QRect(560, 656, 24, 24), 'bold_pb', self.set_bold)
-        self._add_bitmap_button(ITALIC_IMG_PATH,
+        self._add_bitmap_button(ITALIC_IMG,
                                 QRect(592, 656, 24, 24), 'italic_pb', self.set_italic)
-        self._add_bitmap_button(UNDERLINED_IMG_PATH,
+        self._add_bitmap_button(UNDERLINED_IMG,
                                 QRect(624, 656, 24, 24), 'underlined_pb', self.set_underlined)
-        self._add_bitmap_button(UNDERLINED_IMG_PATH,
+        self._add_bitmap_button(UNDERLINED_IMG,
                                 QRect(560, 688, 24, 24), 'smile_emoji_pb', self.set_underlined)
-        self._add_bitmap_button(UNDERLINED_IMG_PATH,
+        self._add_bitmap_button(UNDERLINED_IMG,
                                 QRect(592, 688, 24, 24), 'sad_emoji_pb', self.set_underlined)
-        self._add_bitmap_button(UNDERLINED_IMG_PATH,
+        self._add_bitmap_button(UNDERLINED_IMG,
                                 QRect(624, 688, 24, 24), '3_emoji_pb', self.set_underlined)
-        self._add_bitmap_button(UNDERLINED_IMG_PATH,
+        self._add_bitmap_button(UNDERLINED_IMG,
                                 QRect(560, 720, 24, 24), '4_emoji_pb', self.set_underlined)
-        self._add_bitmap_button(UNDERLINED_IMG_PATH,
+        self._add_bitmap_button(UNDERLINED_IMG,
                                 QRect(592, 720, 24, 24), '5_emoji_pb', self.set_underlined)
-        self._add_bitmap_button(UNDERLINED_IMG_PATH,
+        self._add_bitmap_button(UNDERLINED_IMG,
                                 QRect(624, 720, 24, 24), '6_emoji_pb', self.set_underlined)
 
         # "Send" button
@@ -193,11 +261,14 @@ class UiChatTab(QWidget):
 
         self._send_pb.clicked.connect(self._send_msg)
 
-    def _add_bitmap_button(self, bitmap, geometry, object_name, action):
+        # The latest messages are shown right after opening
+        self._update_rows(self._prepend_history_page)
+
+    def _add_bitmap_button(self, image_name, geometry, object_name, action):
         button = QPushButton(self)
         button.setGeometry(geometry)
         button.setObjectName(object_name)
-        button.setIcon(QIcon(bitmap))
+        button.setIcon(resource_registry.get_icon(image_name))
         button.clicked.connect(action)
         self._buttons.append(button)
 
@@ -208,14 +279,14 @@ class UiChatTab(QWidget):
         Sends message to the server when "Send" button is being pressed.
         @return: -
         """
-        msg_text = self._msg_te.toPlainText()
-
+        style = STYLE_PLAIN
         if self._font.bold():
-            msg_text = '<b>{}<b>'.format(msg_text)
+            style |= STYLE_BOLD
         if self._font.italic():
-            msg_text = '<i>{}<i>'.format(msg_text)
+            style |= STYLE_ITALIC
         if self._font.underline():
-            msg_text = '<u>{}<u>'.format(msg_text)
+            style |= STYLE_UNDERLINE
+        msg_text = encode_rich_text(self._msg_te.toPlainText(), style)
 
         login = self.parent.parent.get_login()
         current_time = datetime.datetime.now().timestamp()
@@ -228,10 +299,9 @@ class UiChatTab(QWidget):
                                                              'to': self.tab_name, 'from': login,
                                                              'encoding': 'utf-8', 'message': msg_text})
 
-        self.parent.parent.msg_handler.write_output_bytes(msg.serialize())
-
-        time = '[{}] @{}> '.format(get_formatted_date(current_time), login)
-        self._message_queue.put((time, msg_text))
+        # Message is shown in the tab when the server confirms its delivery
+        self.parent.parent.msg_handler.send_message(self.tab_name, msg.to_dict(), '@{}>'.format(login), msg_text)
+        self._msg_te.clear()
 
     def set_bold(self):
         self._font.setBold(not self._font.bold())
@@ -245,63 +315,136 @@ class UiChatTab(QWidget):
         self._font.setUnderline(not self._font.underline())
         self._msg_te.setFont(self._font)
 
-    def parse_rich_text(self, rich_text):
-        font = QFont()
-        if rich_text.startswith('<u>'):
-            font.setUnderline(True)
-            rich_text = rich_text[3:-3]
-        if rich_text.startswith('<i>'):
-            font.setItalic(True)
-            rich_text = rich_text[3:-3]
-        if rich_text.startswith('<b>'):
-            font.setBold(True)
-            rich_text = rich_text[3:-3]
-        return rich_text, font
-
-    def add_data_from_buffer(self):
-        """
-        Adds new data from the internal buffer. This function is being called
-        only after receiving server answer that out message has been successfully
-        received by user.
+    def add_data(self, sender, message, timestamp=None):
+        """
+        Adds new data from the external buffer.
+        @param sender: sender part of the header.
+        @param message: new data (message with style tags).
+        @param timestamp: time of the message.
         @return: -
         """
-        # Clears message input text
-        self._msg_te.clear()
+        text, runs = decode_rich_text(message)
+        self.add_rows([(sender, text, runs, timestamp)])
 
-        # Takes the first message from the queue
-        (time, message) = self._message_queue.get()
-        self.add_data(time, message)
+    def add_rows(self, rows):
+        """
+        Adds a batch of decoded messages with a single model update. The oldest
+        ones are evicted if the tab exceeds its scrollback limit.
+        @param rows: list of (sender, plain text, style runs, timestamp) tuples.
+        @return: -
+        """
+        self._update_rows(self._append_rows, rows)
 
-    def add_data(self, time, message):
+    def find_row(self, data):
         """
-        Adds new data from the external buffer.
-        @param time: time and sender.
-        @param message: new data (message).
+        Searches the row with the needed message text.
+        @param data: message text.
+        @return: row number or None.
+        """
+        return self._chat_model.find_row(data)
+
+    def remove_data(self, row):
+        """
+        Deletes the row from the chat.
+        @param row: row number.
+        @return: -
+        """
+        if row is not None:
+            self._chat_model.remove_rows(row)
+
+    def _update_rows(self, change, *args):
+        """
+        Changes rows of the transcript keeping the view in place: at the newest
+        messages if it has been at the bottom, otherwise at the same messages.
+        @param change: method which changes rows and returns the amount of rows
+        added above the visible ones (negative if rows have been removed).
+        @param args: arguments of the method.
         @return: -
         """
-        (plain_text, font) = self.parse_rich_text(message)
+        scroll_bar = self._chat_lb.verticalScrollBar()
+        value = scroll_bar.value()
+        self._updating_rows = True
+        try:
+            shift = change(*args)
+            # Range of the scroll bar is updated lazily, but it is needed right now.
+            # View scrolls per item, so the value is shifted by the amount of rows
+            self._chat_lb.updateGeometries()
+            if self._stick_to_bottom:
+                scroll_bar.setValue(scroll_bar.maximum())
+            else:
+                scroll_bar.setValue(value + shift)
+        finally:
+            self._updating_rows = False
 
-        # QLabel for the time/sender
-        time_st = QLabel(time)
-        time_st.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-        time_st.adjustSize()
+    def _append_rows(self, rows):
+        """
+        Adds messages to the end and evicts the oldest ones. While the user reads
+        older messages they are not evicted, but the tab still can not grow more
+        than twice of the limit.
+        @param rows: list of (sender, plain text, style runs, timestamp) tuples.
+        @return: shift of the rows above the visible ones.
+        """
+        self._chat_model.append_rows(rows)
+        if self._stick_to_bottom:
+            return -self._evict_oldest(self._scrollback_limit)
+        return -self._evict_oldest(self._scrollback_limit * 2)
 
-        # QLabel for the message
-        message_st = QLabel(plain_text)
-        message_st.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-        message_st.setFont(font)
-        message_st.adjustSize()
+    def _evict_oldest(self, max_rows):
+        """
+        Deletes the oldest messages which do not fit in the limit. They can be
+        loaded again from the history source.
+        @param max_rows: maximum amount of messages.
+        @return: amount of deleted messages.
+        """
+        evicted = self._chat_model.trim_oldest(max_rows)
+        if evicted > 0 and self._history_source is not None:
+            self._history_exhausted = False
+        return evicted
 
-        # Layout: time + message
-        container = QFormLayout()
-        container.setContentsMargins(0, 0, 0, 0)
-        container.addRow(time_st, message_st)
+    def _prepend_history_page(self):
+        """
+        Loads the next page of older messages from the history source.
+        @return: amount of loaded messages.
+        """
+        if self._history_exhausted:
+            return 0
+
+        messages = self._history_source.load_before(self.tab_name,
+                                                    self._chat_model.oldest_key(),
+                                                    self._history_page_size)
+        if len(messages) < self._history_page_size:
+            self._history_exhausted = True
+        # History is decoded here: it is loaded by pages only when the user scrolls up
+        self._chat_model.prepend_rows(prepare_messages([message[:3] for message in messages]),
+                                      [message[3] for message in messages])
+        return len(messages)
+
+    def _on_scroll(self, value):
+        """
+        Remembers whether the user has scrolled away from the newest messages,
+        loads older messages when the top is reached and evicts them when the
+        user returns to the bottom.
+        @param value: position of the scroll bar.
+        @return: -
+        """
+        if self._updating_rows:
+            return
 
-        complete_line = QWidget()
-        complete_line.setLayout(container)
+        scroll_bar = self._chat_lb.verticalScrollBar()
+        was_at_bottom = self._stick_to_bottom
+        self._stick_to_bottom = value == scroll_bar.maximum()
 
-        item = QListWidgetItem()
-        item.setSizeHint(QSize(item.sizeHint().width(), 20))
+        if self._stick_to_bottom and not was_at_bottom:
+            self._update_rows(lambda: -self._evict_oldest(self._scrollback_limit))
+        elif value == scroll_bar.minimum() and not self._stick_to_bottom and not self._history_exhausted:
+            self._update_rows(self._prepend_history_page)
 
-        self._chat_lb.addItem(item)
-        self._chat_lb.setItemWidget(item, complete_line)
+    def _on_scroll_range_changed(self, minimum, maximum):
+        """
+        Keeps view at the newest messages when its size changes.
+        @param minimum: minimum position of the scroll bar.
+        @param maximum: maximum position of the scroll bar.
+        @return: -
+        """
+        if self._stick_to_bottom and not self._updating_rows:
+            self._chat_lb.verticalScrollBar().setValue(maximum)
@@ -1,15 +1,23 @@
 """
 Module for the list of contacts (Widget).
 """
-import random
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 
+from NCryptoClient.ui.ui_avatar_cache import AvatarCache
+from NCryptoClient.ui.ui_contacts_model import ContactsModel, ContactsFilterModel, ContactsDelegate, \
+    CONTACT_HEIGHT, AVATAR_SIZE
+from NCryptoClient.utils.constants import CONTACTS_FILTER_DELAY, AVATARS_DIR, AVATAR_CACHE_LIMIT
 
-class UiContactsList(QListWidget):
+
+class UiContactsList(QTableView):
     """
-    UI-class which contains a list of buttons, each of which is a user contact.
+    UI-class which shows the list of user contacts. Contacts are stored in
+    the model and painted by the delegate. The list can be filtered: filter is
+    applied when the user stops typing for a while.
+    Table view with the fixed row height is used, since it does not lay out
+    all rows again when the filter changes (unlike QListView).
     """
     def __init__(self, main_window, parent=None):
         """
@@ -20,12 +28,43 @@ class UiContactsList(QListWidget):
         super().__init__(parent)
         self._main_window = main_window
 
-        self.setResizeMode(QListView.Adjust)
+        self._contacts_model = ContactsModel(self)
+        self._filter_model = ContactsFilterModel(self._contacts_model, self)
+        self.setModel(self._filter_model)
+        # Avatars are loaded when contacts are painted, the list is repainted when they are ready
+        self._avatar_cache = AvatarCache(AVATARS_DIR, AVATAR_SIZE, AVATAR_CACHE_LIMIT, self)
+        self._avatar_cache.avatar_loaded.connect(lambda _: self.viewport().update())
+        self.setItemDelegate(ContactsDelegate(self, self._avatar_cache))
+        self.horizontalHeader().hide()
+        self.horizontalHeader().setStretchLastSection(True)
+        self.verticalHeader().hide()
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.verticalHeader().setDefaultSectionSize(CONTACT_HEIGHT)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.verticalScrollBar().setSingleStep(CONTACT_HEIGHT // 4)
+        self.setShowGrid(False)
+        self.setWordWrap(False)
         self.setObjectName('contacts_lb')
 
         self._last_keyboard_event = None
         self._last_mouse_event = None
 
+        # Text is filtered only after the last keystroke
+        self._filter_text = ''
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(CONTACTS_FILTER_DELAY)
+        self._filter_timer.timeout.connect(self.apply_filter)
+
+        # Opens chat tab when mouse left button is being pressed
+        self.clicked.connect(lambda index: self._main_window.open_tab(self.get_contact_name(index.row())))
+
+        # Opens context menu when mouse right button is being pressed
+        self.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.customContextMenuRequested.connect(self._on_context_menu_requested)
+
         # Log tab should be automatically created
         self.add_contact('Log')
 
@@ -46,6 +85,8 @@ class UiContactsList(QListWidget):
         @return: -
         """
         self._last_mouse_event = args[0]
+        # Base class emits clicked() for the contact under the cursor
+        super().mousePressEvent(*args, **kwargs)
 
     def add_contact(self, chat_name):
         """
@@ -54,26 +95,15 @@ class UiContactsList(QListWidget):
         @param chat_name: contact name.
         @return: -
         """
-        # Ignores if contact already exists
-        index = self.find_contact_widget(chat_name)
-        if index:
-            return
+        self.add_contacts([chat_name])
 
-        item = QListWidgetItem()
-        item.setSizeHint(QSize(item.sizeHint().width(), 80))
-
-        contact = UiContact(chat_name, self)
-
-        # Opens context menu when mouse right button is being pressed
-        contact.setContextMenuPolicy(Qt.CustomContextMenu)
-        contact.customContextMenuRequested.connect(lambda _, local_contact_name=chat_name:
-                                                   self.show_context_menu(local_contact_name))
-
-        # Opens chat tab when mouse left button is being pressed
-        contact.clicked.connect(lambda _, local_contact_name=chat_name:
-                                self._main_window.open_tab(local_contact_name))
-        self.addItem(item)
-        self.setItemWidget(item, contact)
+    def add_contacts(self, chat_names):
+        """
+        Adds a batch of contacts with a single insert. Existing contacts are ignored.
+        @param chat_names: list of contact names.
+        @return: -
+        """
+        self._contacts_model.add_contacts(chat_names)
 
     def delete_contact(self, chat_name):
         """
@@ -84,64 +114,62 @@ class UiContactsList(QListWidget):
         # Closes chat tab with needed name
         self._main_window.close_tab(chat_name)
 
-        # Deletes contact button from the list of contacts
-        index = self.find_contact_widget(chat_name)
-        if index is not None:
-            self.takeItem(index)
+        # Deletes contact from the list of contacts
+        self._contacts_model.remove_contact(chat_name)
 
-    def find_contact_widget(self, chat_name):
+    def find_contact(self, chat_name):
         """
-        Searches for contact widget in the list of contacts.
+        Searches for contact in the list of contacts.
         @param chat_name: contact name.
-        @return: index of contact widget.
-        """
-        contacts_amount = self.count()
-        if contacts_amount == 1:
-            if self.itemWidget(self.item(0)).contact_name.text() == chat_name:
-                return 0
-        else:
-            for i in range(0, contacts_amount):
-                widget = self.itemWidget(self.item(i))
-                if widget.contact_name.text() == chat_name:
-                    return i
-        return None
-
-    def show_context_menu(self, chat_name):
-        """
-        Shows context menu on the mouse left button clicking.
+        @return: row of the contact or None if there is no such contact.
+        """
+        return self._contacts_model.find_contact(chat_name)
+
+    def get_contact_name(self, row):
+        """
+        Returns name of the shown contact.
+        @param row: row of the contact in the (filtered) list.
+        @return: contact name.
+        """
+        return self._filter_model.row_at(row)[0]
+
+    def set_filter_text(self, text):
+        """
+        Sets new filter text. Filter is applied after the delay, so it is
+        not applied on every keystroke.
+        @param text: part of the contact name.
+        @return: -
+        """
+        self._filter_text = text
+        self._filter_timer.start()
+
+    def apply_filter(self):
+        """
+        Shows only contacts which contain the filter text.
+        @return: -
+        """
+        self._filter_timer.stop()
+        self._filter_model.set_filter_text(self._filter_text)
+
+    def _on_context_menu_requested(self, position):
+        """
+        Shows context menu of the contact under the cursor.
+        @param position: position of the cursor in the list.
+        @return: -
+        """
+        index = self.indexAt(position)
+        if index.isValid():
+            self.show_context_menu(self.get_contact_name(index.row()), position)
+
+    def show_context_menu(self, chat_name, position):
+        """
+        Shows context menu on the mouse right button clicking.
         @param chat_name: contact name.
+        @param position: position of the cursor in the list.
         @return: -
         """
         menu = QMenu(self)
         remove_action = menu.addAction('Remove')
         remove_action.triggered.connect(lambda _, local_chat_name=chat_name:
                                         self._main_window.remove_contact_by_login(local_chat_name))
-        menu.exec_(self.mapToGlobal(QPoint(self._last_mouse_event.x(),
-                                           self._last_mouse_event.y())))
-
-
-class UiContact(QPushButton):
-    def __init__(self, contact_name, parent):
-        super().__init__(parent)
-
-        rgb_color = get_random_rgb_color()
-        self.setStyleSheet('background-color: rgb({}, {}, {})'.format(*rgb_color))
-
-        self.bitmap = QPixmap('D:\\dev\\PyCharm Projects\\TestRelativePath\\test-1.jpg')
-        self.img = QLabel(self)
-        self.img.setPixmap(self.bitmap)
-        self.img.setGeometry(QRect(8, 8, 64, 64))
-
-        contact_name_font = QFont()
-        contact_name_font.setBold(True)
-        contact_name_font.setWeight(75)
-        contact_name_font.setPointSize(10)
-
-        self.contact_name = QLabel(self)
-        self.contact_name.setText(contact_name)
-        self.contact_name.setFont(contact_name_font)
-        self.contact_name.setGeometry(QRect(80, 8, 208, 64))
-
-
-def get_random_rgb_color():
-    return random.sample(range(100, 225), 3)
+        menu.exec_(self.viewport().mapToGlobal(position))
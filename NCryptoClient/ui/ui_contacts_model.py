@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+Module which implements the list of contacts as a model/view pair. Contacts
+are stored in the model with the name -> row index, so checks and updates
+of a contact do not walk the whole list, and contacts are painted by the
+delegate instead of creating a button with labels per contact. The list
+can be filtered by a part of the contact name.
+"""
+import bisect
+
+from PyQt5.QtWidgets import *
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+
+from NCryptoClient.ui.ui_avatar_cache import get_name_color
+
+# Height of a single contact in pixels
+CONTACT_HEIGHT = 80
+# Size of the avatar in pixels
+AVATAR_SIZE = 64
+
+
+class ContactsModel(QAbstractListModel):
+    """
+    Model-class which stores contacts. Each row is a tuple (contact name,
+    background color). Color is derived from the name.
+    """
+    def __init__(self, parent=None):
+        """
+        Constructor.
+        @param parent: parent object.
+        """
+        super().__init__(parent)
+        self._rows = []
+        # Contact name -> row number
+        self._index = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        """
+        Returns amount of contacts.
+        @param parent: parent index (the model is flat).
+        @return: amount of rows.
+        """
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        """
+        Returns data of the row for the needed role.
+        @param index: index of the row.
+        @param role: data role.
+        @return: data or None.
+        """
+        if not index.isValid():
+            return None
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self._rows[index.row()][0]
+        return None
+
+    def row_at(self, row):
+        """
+        Returns stored row without conversion to QVariant. Is used by the delegate.
+        @param row: row number.
+        @return: tuple (contact name, background color).
+        """
+        return self._rows[row]
+
+    def find_contact(self, contact_name):
+        """
+        Searches contact by its name.
+        @param contact_name: contact name.
+        @return: row number or None if there is no such contact.
+        """
+        return self._index.get(contact_name)
+
+    def add_contacts(self, contact_names):
+        """
+        Adds contacts to the end of the list with a single insert. Contacts
+        which are already in the list are ignored.
+        @param contact_names: list of contact names.
+        @return: amount of added contacts.
+        """
+        new_names = []
+        for contact_name in contact_names:
+            if contact_name not in self._index:
+                # Row number is reserved, so duplicates inside the batch are ignored too
+                self._index[contact_name] = len(self._rows) + len(new_names)
+                new_names.append(contact_name)
+        if not new_names:
+            return 0
+
+        first_row = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first_row, first_row + len(new_names) - 1)
+        self._rows.extend((contact_name, get_name_color(contact_name)) for contact_name in new_names)
+        self.endInsertRows()
+        return len(new_names)
+
+    def remove_contact(self, contact_name):
+        """
+        Deletes contact from the list.
+        @param contact_name: contact name.
+        @return: True if the contact has been deleted.
+        """
+        row = self._index.pop(contact_name, None)
+        if row is None:
+            return False
+
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        # Contacts after the deleted one are shifted up
+        for shifted_row in range(row, len(self._rows)):
+            self._index[self._rows[shifted_row][0]] = shifted_row
+        self.endRemoveRows()
+        return True
+
+
+class ContactsFilterModel(QAbstractListModel):
+    """
+    Model-class which shows contacts of the source model whose names contain
+    the filter text (case-insensitive). Contacts whose names start with the
+    text go first. They are found by the prefix index (names sorted in lower
+    case), the rest - by a scan of the names. When the text gets longer, only
+    the previous result is scanned.
+    """
+    def __init__(self, source_model, parent=None):
+        """
+        Constructor.
+        @param source_model: model with all contacts (ContactsModel).
+        @param parent: parent object.
+        """
+        super().__init__(parent)
+        self._source_model = source_model
+        self._filter_text = ''
+        # Names of the source rows in lower case
+        self._lower_names = []
+        # Prefix index: sorted list of (name in lower case, name)
+        self._prefix_index = []
+        # Source rows which are shown, in the order of showing
+        self._rows = []
+
+        source_model.rowsInserted.connect(self._on_source_rows_inserted)
+        source_model.rowsAboutToBeRemoved.connect(self._on_source_rows_about_to_be_removed)
+        self._on_source_rows_inserted(QModelIndex(), 0, source_model.rowCount() - 1)
+
+    def rowCount(self, parent=QModelIndex()):
+        """
+        Returns amount of shown contacts.
+        @param parent: parent index (the model is flat).
+        @return: amount of rows.
+        """
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        """
+        Returns data of the row for the needed role.
+        @param index: index of the row.
+        @param role: data role.
+        @return: data or None.
+        """
+        if not index.isValid():
+            return None
+        return self._source_model.data(self._source_model.index(self._rows[index.row()]), role)
+
+    def row_at(self, row):
+        """
+        Returns stored row of the source model. Is used by the delegate.
+        @param row: row number.
+        @return: tuple (contact name, background color).
+        """
+        return self._source_model.row_at(self._rows[row])
+
+    def get_filter_text(self):
+        """
+        Getter. Returns current filter text.
+        @return: filter text.
+        """
+        return self._filter_text
+
+    def set_filter_text(self, text):
+        """
+        Setter. Filters contacts by the new text.
+        @param text: part of the contact name. Empty string shows all contacts.
+        @return: -
+        """
+        text = text.strip().lower()
+        if text == self._filter_text:
+            return
+
+        if not text:
+            rows = list(range(len(self._lower_names)))
+        elif self._filter_text and text.startswith(self._filter_text):
+            # Longer text matches only a part of the previous result
+            rows = self._match(text, self._rows)
+        else:
+            rows = self._match(text, None)
+
+        self.beginResetModel()
+        self._filter_text = text
+        self._rows = rows
+        self.endResetModel()
+
+    def _match(self, text, candidate_rows):
+        """
+        Searches source rows whose names contain the text.
+        @param text: filter text in lower case.
+        @param candidate_rows: rows to be checked. None - all rows.
+        @return: list of source rows: names starting with the text, then the others.
+        """
+        lower_names = self._lower_names
+        if candidate_rows is not None:
+            prefix_rows = [row for row in candidate_rows if lower_names[row].startswith(text)]
+            other_rows = [row for row in candidate_rows
+                          if text in lower_names[row] and not lower_names[row].startswith(text)]
+            return prefix_rows + other_rows
+
+        first, last = self._prefix_range(text)
+        find_contact = self._source_model.find_contact
+        prefix_rows = sorted(find_contact(name) for _, name in self._prefix_index[first:last])
+
+        other_rows = [row for row, lower_name in enumerate(lower_names)
+                      if text in lower_name and not lower_name.startswith(text)]
+        return prefix_rows + other_rows
+
+    def _prefix_range(self, text):
+        """
+        Searches names starting with the text: they form a continuous range in the sorted index.
+        @param text: filter text in lower case.
+        @return: tuple (first, last) - range of the prefix index.
+        """
+        first = bisect.bisect_left(self._prefix_index, (text,))
+        return first, bisect.bisect_left(self._prefix_index, (text + '\uffff',), first)
+
+    def _on_source_rows_inserted(self, parent, first, last):
+        """
+        Adds new contacts to the index and shows the ones which match the filter.
+        @param parent: parent index (the model is flat).
+        @param first: first inserted row.
+        @param last: last inserted row.
+        @return: -
+        """
+        if last < first:
+            return
+        new_names = [self._source_model.row_at(row)[0] for row in range(first, last + 1)]
+        new_lower_names = [name.lower() for name in new_names]
+        self._lower_names[first:first] = new_lower_names
+
+        new_entries = list(zip(new_lower_names, new_names))
+        if len(new_entries) > 16:
+            self._prefix_index.extend(new_entries)
+            self._prefix_index.sort()
+        else:
+            for entry in new_entries:
+                bisect.insort(self._prefix_index, entry)
+
+        # Contacts are added only to the end of the source model, so new names with the
+        # prefix go to the end of the prefix block and the other matches to the end of the view
+        text = self._filter_text
+        new_prefix_rows = [row for row, lower_name in enumerate(new_lower_names, first)
+                           if lower_name.startswith(text)]
+        new_other_rows = [row for row, lower_name in enumerate(new_lower_names, first)
+                          if text in lower_name and not lower_name.startswith(text)]
+        if new_prefix_rows:
+            prefix_first, prefix_last = self._prefix_range(text)
+            position = prefix_last - prefix_first - len(new_prefix_rows)
+            self.beginInsertRows(QModelIndex(), position, position + len(new_prefix_rows) - 1)
+            self._rows[position:position] = new_prefix_rows
+            self.endInsertRows()
+        if new_other_rows:
+            self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(new_other_rows) - 1)
+            self._rows.extend(new_other_rows)
+            self.endInsertRows()
+
+    def _on_source_rows_about_to_be_removed(self, parent, first, last):
+        """
+        Deletes contacts from the index and from the shown ones.
+        @param parent: parent index (the model is flat).
+        @param first: first removed row.
+        @param last: last removed row.
+        @return: -
+        """
+        for row in range(first, last + 1):
+            entry = (self._lower_names[row], self._source_model.row_at(row)[0])
+            del self._prefix_index[bisect.bisect_left(self._prefix_index, entry)]
+        del self._lower_names[first:last + 1]
+
+        # Removes shown rows one by one (usually it is a single contact)
+        count = last - first + 1
+        for position in reversed([position for position, row in enumerate(self._rows) if first <= row <= last]):
+            self.beginRemoveRows(QModelIndex(), position, position)
+            del self._rows[position]
+            self.endRemoveRows()
+        self._rows = [row - count if row > last else row for row in self._rows]
+
+
+class ContactsDelegate(QStyledItemDelegate):
+    """
+    Delegate-class which paints a contact: colored background, avatar (or
+    placeholder with the first letter of the name) and the contact name in
+    bold font.
+    """
+    _margin = 8
+
+    def __init__(self, parent=None, avatar_cache=None):
+        """
+        Constructor.
+        @param parent: parent object.
+        @param avatar_cache: cache of avatars (AvatarCache). None - only placeholders are painted.
+        """
+        super().__init__(parent)
+        self._avatar_cache = avatar_cache
+
+        self._placeholder_font = QFont()
+        self._placeholder_font.setBold(True)
+        self._placeholder_font.setPointSize(24)
+
+        self._font = QFont()
+        self._font.setBold(True)
+        self._font.setWeight(75)
+        self._font.setPointSize(10)
+
+    def paint(self, painter, option, index):
+        """
+        Paints the contact.
+        @param painter: painter of the view.
+        @param option: style options of the row.
+        @param index: index of the row.
+        @return: -
+        """
+        contact_name, rgb_color = index.model().row_at(index.row())
+
+        background_color = QColor(*rgb_color)
+        if option.state & QStyle.State_MouseOver:
+            background_color = background_color.lighter(110)
+
+        painter.save()
+        painter.fillRect(option.rect, background_color)
+
+        avatar_rect = QRect(option.rect.left() + self._margin, option.rect.top() + self._margin,
+                            AVATAR_SIZE, AVATAR_SIZE)
+        avatar = self._avatar_cache.get(contact_name) if self._avatar_cache is not None else None
+        if avatar is not None:
+            painter.drawPixmap(avatar_rect, avatar)
+        else:
+            self._paint_placeholder(painter, avatar_rect, contact_name, background_color)
+
+        painter.setPen(option.palette.color(QPalette.ButtonText))
+        painter.setFont(self._font)
+        text_rect = option.rect.adjusted(2 * self._margin + AVATAR_SIZE, self._margin,
+                                         -self._margin, -self._margin)
+        painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignVCenter, contact_name)
+        painter.restore()
+
+    def _paint_placeholder(self, painter, rect, contact_name, background_color):
+        """
+        Paints placeholder of the avatar: circle with the first letter of the name.
+        @param painter: painter of the view.
+        @param rect: rectangle of the avatar.
+        @param contact_name: contact name.
+        @param background_color: background color of the contact.
+        @return: -
+        """
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(background_color.darker(140))
+        painter.drawEllipse(rect)
+
+        letter = contact_name.lstrip('#@')[:1].upper()
+        painter.setPen(Qt.white)
+        painter.setFont(self._placeholder_font)
+        painter.drawText(rect, Qt.AlignCenter, letter)
+
+    def sizeHint(self, option, index):
+        """
+        Returns size of the contact. All contacts have the same height.
+        @param option: style options of the row.
+        @param index: index of the row.
+        @return: size of the row.
+        """
+        return QSize(option.rect.width(), CONTACT_HEIGHT)
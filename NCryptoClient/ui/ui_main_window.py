@@ -6,9 +6,8 @@ from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 
-from NCryptoClient.ui.ui_contacts_list import UiContactsList
-from NCryptoClient.utils.client_file_manager import ClientFileManager
-from NCryptoClient.utils.constants import NCRYPTOLOGO_IMG_PATH, ADD_CONTACT_IMG_PATH, REMOVE_CONTACT_IMG_PATH
+from NCryptoClient.ui.ui_resources import resource_registry
+from NCryptoClient.utils.constants import NCRYPTOLOGO_IMG, ADD_CONTACT_IMG, REMOVE_CONTACT_IMG
 
 
 class UiMainWindow(QMainWindow):
@@ -22,8 +21,6 @@ class UiMainWindow(QMainWindow):
         """
         super(UiMainWindow, self).__init__(parent)
 
-        # self._file_manager = ClientFileManager()
-
         self.setObjectName('NCryptoClient')
 
         self.size_policy = QSizePolicy(QSizePolicy.Preferred,
@@ -87,7 +84,7 @@ class UiMainWindow(QMainWindow):
         self.setFixedSize(QSize(782, 382))
 
         self.logo_l = QLabel(self.background_panel)
-        self.logo_l.setPixmap(QPixmap(NCRYPTOLOGO_IMG_PATH))
+        self.logo_l.setPixmap(resource_registry.get_pixmap(NCRYPTOLOGO_IMG))
         self.logo_l.setGeometry(16, 16, 750, 206)
 
         # Static text "Login"
@@ -191,17 +188,18 @@ class UiMainWindow(QMainWindow):
         self.add_contact_pb = QPushButton(self.background_panel)
         self.add_contact_pb.setGeometry(QRect(264, 40, 24, 24))
         self.add_contact_pb.setObjectName('add_contact_pb')
-        self.add_contact_pb.setIcon(QIcon(ADD_CONTACT_IMG_PATH))
+        self.add_contact_pb.setIcon(resource_registry.get_icon(ADD_CONTACT_IMG))
         self.add_contact_pb.show()
 
         # "Delete" button
         self.remove_contact_pb = QPushButton(self.background_panel)
         self.remove_contact_pb.setGeometry(QRect(296, 40, 24, 24))
         self.remove_contact_pb.setObjectName('remove_contact_pb')
-        self.remove_contact_pb.setIcon(QIcon(REMOVE_CONTACT_IMG_PATH))
+        self.remove_contact_pb.setIcon(resource_registry.get_icon(REMOVE_CONTACT_IMG))
         self.remove_contact_pb.show()
 
-        # Contacts list widget
+        # Contacts list widget (its module is loaded only for the chat window)
+        from NCryptoClient.ui.ui_contacts_list import UiContactsList
         self.contacts_widget = UiContactsList(self, self.background_panel)
         self.contacts_widget.setGeometry(QRect(8, 72, 312, 784))
         self.contacts_widget.show()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Module which loads images of the client (logo, icons of buttons). Images are
+found through importlib.resources, so they are also read when the package is
+installed as a zip archive, and every image is decoded only once: pixmaps and
+icons are shared by all widgets. If the compiled Qt resource module exists
+(see README), images are taken from it without touching the file system.
+"""
+import pkgutil
+import importlib
+
+try:
+    from importlib.resources import files as _get_package_files
+except ImportError:
+    _get_package_files = None
+
+from PyQt5.QtGui import *
+
+from NCryptoClient.utils.constants import NCRYPTOLOGO_IMG, ADD_CONTACT_IMG, REMOVE_CONTACT_IMG, \
+    BOLD_IMG, ITALIC_IMG, UNDERLINED_IMG
+
+# Package and its directory which contain images
+IMAGES_PACKAGE = 'NCryptoClient'
+IMAGES_DIR = 'img'
+
+# Compiled Qt resource module (pyrcc5 -o NCryptoClient/ui/ui_images_rc.py NCryptoClient/img/images.qrc)
+# and the prefix of images in it
+COMPILED_IMAGES_MODULE = 'NCryptoClient.ui.ui_images_rc'
+COMPILED_IMAGES_PREFIX = ':/img/'
+
+# All images of the client
+ALL_IMAGES = (NCRYPTOLOGO_IMG, ADD_CONTACT_IMG, REMOVE_CONTACT_IMG, BOLD_IMG, ITALIC_IMG, UNDERLINED_IMG)
+
+
+def read_image_data(image_name):
+    """
+    Reads file of the image from the package.
+    @param image_name: file name of the image (one of *_IMG constants).
+    @return: contents of the file (bytes).
+    @raise OSError: if there is no such file.
+    """
+    if _get_package_files is not None:
+        return _get_package_files(IMAGES_PACKAGE).joinpath(IMAGES_DIR).joinpath(image_name).read_bytes()
+
+    data = pkgutil.get_data(IMAGES_PACKAGE, IMAGES_DIR + '/' + image_name)
+    if data is None:
+        raise FileNotFoundError(image_name)
+    return data
+
+
+class ResourceRegistry:
+    """
+    Class which decodes images once and gives the same pixmaps and icons to
+    all widgets. Must be used from the GUI thread after QApplication is created.
+    """
+    def __init__(self, compiled_module=COMPILED_IMAGES_MODULE):
+        """
+        Constructor. Does not load anything.
+        @param compiled_module: name of the compiled Qt resource module. None - files only.
+        """
+        self._compiled_module = compiled_module
+        # True if images are taken from the compiled module, None - not checked yet
+        self._compiled = None if compiled_module is not None else False
+        # Image name -> QPixmap / QIcon
+        self._pixmaps = {}
+        self._icons = {}
+
+    def is_compiled(self):
+        """
+        Checks whether images are taken from the compiled Qt resource module.
+        Module registers its data in Qt when it is imported.
+        @return: True if the compiled module is used.
+        """
+        if self._compiled is None:
+            try:
+                importlib.import_module(self._compiled_module)
+                self._compiled = True
+            except ImportError:
+                self._compiled = False
+        return self._compiled
+
+    def get_pixmap(self, image_name):
+        """
+        Returns decoded image. Image is decoded at the first call.
+        @param image_name: file name of the image (one of *_IMG constants).
+        @return: pixmap (QPixmap). Null pixmap if the image can not be loaded.
+        """
+        pixmap = self._pixmaps.get(image_name)
+        if pixmap is None:
+            pixmap = self._load_pixmap(image_name)
+            self._pixmaps[image_name] = pixmap
+        return pixmap
+
+    def get_icon(self, image_name):
+        """
+        Returns icon made of the image.
+        @param image_name: file name of the image (one of *_IMG constants).
+        @return: icon (QIcon).
+        """
+        icon = self._icons.get(image_name)
+        if icon is None:
+            icon = QIcon(self.get_pixmap(image_name))
+            self._icons[image_name] = icon
+        return icon
+
+    def preload(self, image_names=ALL_IMAGES):
+        """
+        Decodes images in advance.
+        @param image_names: file names of the images.
+        @return: -
+        """
+        for image_name in image_names:
+            self.get_pixmap(image_name)
+
+    def clear(self):
+        """
+        Forgets all decoded images.
+        @return: -
+        """
+        self._pixmaps.clear()
+        self._icons.clear()
+
+    def _load_pixmap(self, image_name):
+        """
+        Decodes image from the compiled module or from the package.
+        @param image_name: file name of the image.
+        @return: pixmap (QPixmap). Null pixmap if the image can not be loaded.
+        """
+        if self.is_compiled():
+            pixmap = QPixmap(COMPILED_IMAGES_PREFIX + image_name)
+            if not pixmap.isNull():
+                return pixmap
+
+        pixmap = QPixmap()
+        try:
+            pixmap.loadFromData(read_image_data(image_name))
+        except OSError:
+            pass
+        return pixmap
+
+
+# Images shared by all widgets
+resource_registry = ResourceRegistry()
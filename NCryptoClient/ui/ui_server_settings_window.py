@@ -6,7 +6,9 @@ Module for the window which appears when user chooses:
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
-# from Solution.NCryptoClient.Utils.client_file_manager import ClientFileManager
+
+from NCryptoClient.utils.client_config import client_config, DEFAULT_SETTINGS, SERVER_SECTION, \
+    SERVER_IP_KEY, SERVER_PORT_KEY
 
 
 class UiServerSettingsWindow(QDialog):
@@ -20,8 +22,6 @@ class UiServerSettingsWindow(QDialog):
         """
         super(UiServerSettingsWindow, self).__init__(parent)
 
-        # self._file_manager = ClientFileManager()
-
         self.setObjectName('server_settings_window')
         self.resize(256, 136)
 
@@ -69,8 +69,6 @@ class UiServerSettingsWindow(QDialog):
         self.ok_pb = QPushButton(self)
         self.ok_pb.setGeometry(QRect(176, 96, 64, 24))
         self.ok_pb.setObjectName('ok_pb')
-        # TODO:
-        self.ok_pb.setDisabled(True)
 
         # "Cancel" button
         self.cancel_pb = QPushButton(self)
@@ -97,15 +95,22 @@ class UiServerSettingsWindow(QDialog):
     def _ok_clicked(self):
         """
         Accepts all changes which have been done by user, saving them
-        in the file controlling by the file manager.
+        in the settings file. The file is written only if the address has been changed.
+        New address is used for the next connection to the server.
         @return: -
         """
-        ip = self.ip_le.text()
-        port = self.port_le.text()
-        self._file_manager.instance.set_item(self._file_manager.autoexec_copy_path,
-                                             '[Server_information]', 'ip', ip)
-        self._file_manager.instance.set_item(self._file_manager.autoexec_copy_path,
-                                             '[Server_information]', 'port', port)
+        if not self.ip_le.hasAcceptableInput() or not self.port_le.hasAcceptableInput():
+            QMessageBox.warning(self, 'Warning: invalid data', 'Enter a valid IPv4 address and port number.')
+            return
+
+        client_config.set(SERVER_SECTION, SERVER_IP_KEY, self.ip_le.text())
+        client_config.set(SERVER_SECTION, SERVER_PORT_KEY, self.port_le.text())
+        try:
+            client_config.save()
+        except OSError as e:
+            QMessageBox.warning(self, 'Warning: settings are not saved',
+                                'Could not write {}: {}'.format(client_config.path, e))
+            return
         self.close()
 
     def _cancel_clicked(self):
@@ -120,8 +125,8 @@ class UiServerSettingsWindow(QDialog):
         Sets IPv4 and port default values.
         @return: -
         """
-        self.ip_le.setText("127.0.0.1")
-        self.port_le.setText("7777")
+        self.ip_le.setText(DEFAULT_SETTINGS[SERVER_SECTION][SERVER_IP_KEY])
+        self.port_le.setText(DEFAULT_SETTINGS[SERVER_SECTION][SERVER_PORT_KEY])
 
     def _retranslate_ui(self):
         """
@@ -135,13 +140,8 @@ class UiServerSettingsWindow(QDialog):
         self.ok_pb.setText(_translate('server_settings_window', 'OK'))
         self.cancel_pb.setText(_translate('server_settings_window', 'Cancel'))
         self.default_pb.setText(_translate('server_settings_window', 'Default'))
-        self.ip_le.setText('127.0.0.1')
-        self.port_le.setText('7777')
-        # TODO:
-        # self.ip_le.setText(self._file_manager.instance.get_item(self._file_manager.autoexec_copy_path,
-        #                                                         '[Server_information]', 'ip'))
-        # self.port_le.setText(self._file_manager.instance.get_item(self._file_manager.autoexec_copy_path,
-        #                                                           '[Server_information]', 'port'))
+        self.ip_le.setText(client_config.get(SERVER_SECTION, SERVER_IP_KEY))
+        self.port_le.setText(client_config.get(SERVER_SECTION, SERVER_PORT_KEY))
 
 
 
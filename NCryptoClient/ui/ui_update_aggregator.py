@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Module which coalesces updates of GUI. Updates coming from the network
+thread are buffered and applied once per frame (by timer), so a burst of
+incoming messages costs one insert per tab instead of one per message.
+"""
+from PyQt5.QtCore import *
+
+# Interval between flushes in milliseconds (one frame at 60 FPS)
+DEFAULT_FLUSH_INTERVAL = 16
+
+
+class UiUpdateAggregator(QObject):
+    """
+    Class which buffers updates of several kinds (channels) and applies every
+    kind with a single call of its handler per flush. Lives in the GUI thread.
+    """
+    def __init__(self, flush_interval=DEFAULT_FLUSH_INTERVAL, parent=None):
+        """
+        Constructor.
+        @param flush_interval: interval between flushes in milliseconds.
+        @param parent: parent object.
+        """
+        super().__init__(parent)
+        # Channel name -> (handler, buffered items). Channels are flushed in the order of adding
+        self._channels = {}
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(flush_interval)
+        self._timer.timeout.connect(self.flush)
+
+        # Statistics
+        self._posts = 0
+        self._items = 0
+        self._flushes = 0
+
+    def add_channel(self, name, handler):
+        """
+        Registers kind of updates.
+        @param name: channel name.
+        @param handler: function which applies the list of all buffered items.
+        @return: -
+        """
+        self._channels[name] = (handler, [])
+
+    def post(self, name, items):
+        """
+        Buffers updates. Flush is scheduled when the first updates come.
+        @param name: channel name.
+        @param items: list of updates.
+        @return: -
+        """
+        self._channels[name][1].extend(items)
+        self._posts += 1
+        self._items += len(items)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def slot(self, name):
+        """
+        Creates function which buffers updates of the channel. It can be connected
+        to signals of other threads.
+        @param name: channel name.
+        @return: function(items).
+        """
+        return lambda items: self.post(name, items)
+
+    def flush(self):
+        """
+        Applies all buffered updates. Is called by timer, but should also be
+        called before any update which is not buffered to keep their order.
+        @return: -
+        """
+        self._timer.stop()
+        flushed = False
+        for handler, items in self._channels.values():
+            if items:
+                buffered = items[:]
+                items.clear()
+                handler(buffered)
+                flushed = True
+        if flushed:
+            self._flushes += 1
+
+    def get_stats(self):
+        """
+        Returns statistics of coalescing.
+        @return: dictionary with amount of received updates (posts), items,
+        flushes and updates which have been coalesced with others.
+        """
+        return {'posts': self._posts,
+                'items': self._items,
+                'flushes': self._flushes,
+                'coalesced': self._posts - self._flushes}
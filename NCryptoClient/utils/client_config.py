@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Module which stores settings of the client in an INI file in the user data
+directory. The file is read only when a setting is needed for the first
+time, parsed values are cached, and the file is written only when a setting
+has been changed. Writing goes to a temporary file which then replaces the
+original one, so a crash during saving does not leave a half-written file.
+"""
+import os
+import tempfile
+import threading
+import configparser
+
+from NCryptoClient.utils.constants import CONFIG_PATH
+
+# Sections and keys of the settings
+SERVER_SECTION = 'Server_information'
+SERVER_IP_KEY = 'ip'
+SERVER_PORT_KEY = 'port'
+
+# Default values, used when the file or a setting is missing
+DEFAULT_SETTINGS = {
+    SERVER_SECTION: {
+        SERVER_IP_KEY: '127.0.0.1',
+        SERVER_PORT_KEY: '7777'
+    }
+}
+
+
+class ClientConfig:
+    """
+    Class which reads and writes settings. Can be used from any thread.
+    """
+    def __init__(self, path, defaults=None):
+        """
+        Constructor. Does not touch the file.
+        @param path: path to the INI file.
+        @param defaults: dictionary {section: {key: value}} with default values.
+        """
+        self._path = path
+        self._defaults = defaults if defaults is not None else {}
+        self._lock = threading.Lock()
+        # Parser with the file contents, None - the file has not been read yet
+        self._parser = None
+        # True if there are changes which have not been saved
+        self._changed = False
+
+    @property
+    def path(self):
+        """
+        Getter. Returns path to the INI file.
+        @return: path to the INI file.
+        """
+        return self._path
+
+    def get(self, section, key):
+        """
+        Returns the setting. Reads the file if it has not been read yet.
+        @param section: section name.
+        @param key: key name.
+        @return: value (string) or None if there is no setting and no default value.
+        """
+        with self._lock:
+            parser = self._get_parser()
+            if parser.has_option(section, key):
+                return parser.get(section, key)
+            return self._defaults.get(section, {}).get(key)
+
+    def get_int(self, section, key):
+        """
+        Returns the setting as an integer. Invalid value is replaced by the default one.
+        @param section: section name.
+        @param key: key name.
+        @return: integer value or None if there is no valid setting.
+        """
+        value = self.get(section, key)
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            default_value = self._defaults.get(section, {}).get(key)
+            return int(default_value) if default_value is not None else None
+
+    def set(self, section, key, value):
+        """
+        Changes the setting. Is written to the file by save().
+        @param section: section name.
+        @param key: key name.
+        @param value: new value (converted to string).
+        @return: True if the value has been changed.
+        """
+        value = str(value)
+        with self._lock:
+            parser = self._get_parser()
+            if parser.has_option(section, key):
+                if parser.get(section, key) == value:
+                    return False
+            elif self._defaults.get(section, {}).get(key) == value:
+                # Default value is not written to the file
+                return False
+
+            if not parser.has_section(section):
+                parser.add_section(section)
+            parser.set(section, key, value)
+            self._changed = True
+            return True
+
+    def reset(self, section, key):
+        """
+        Removes the setting from the file, so the default value is used.
+        @param section: section name.
+        @param key: key name.
+        @return: True if the setting has been removed.
+        """
+        with self._lock:
+            parser = self._get_parser()
+            if not parser.has_option(section, key):
+                return False
+            parser.remove_option(section, key)
+            self._changed = True
+            return True
+
+    def save(self):
+        """
+        Writes settings to the file if they have been changed.
+        @return: True if the file has been written.
+        @raise OSError: if the file can not be written (changes are kept).
+        """
+        with self._lock:
+            if not self._changed:
+                return False
+
+            directory = os.path.dirname(self._path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            file_descriptor, temp_path = tempfile.mkstemp(prefix='.config-', suffix='.tmp', dir=directory)
+            try:
+                with open(file_descriptor, 'w', encoding='utf-8') as file:
+                    self._parser.write(file)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(temp_path, self._path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+            self._changed = False
+            return True
+
+    def _get_parser(self):
+        """
+        Returns parser with the file contents, reading the file at the first call.
+        Missing or broken file is treated as an empty one. Must be called under the lock.
+        @return: parser (ConfigParser).
+        """
+        if self._parser is None:
+            parser = configparser.ConfigParser(interpolation=None)
+            try:
+                with open(self._path, encoding='utf-8') as file:
+                    parser.read_file(file)
+            except (OSError, configparser.Error):
+                parser = configparser.ConfigParser(interpolation=None)
+            self._parser = parser
+        return self._parser
+
+
+# Settings of the client application
+client_config = ClientConfig(CONFIG_PATH, DEFAULT_SETTINGS)
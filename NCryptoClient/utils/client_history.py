@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+Module which defines the interface of history sources. Chat tabs keep only
+the latest messages in memory and ask the history source for older ones when
+the user scrolls up, so any storage (local database, server request) can be
+plugged in without changes in GUI.
+"""
+
+
+class HistorySource:
+    """
+    Base class of history sources. Messages are tuples
+    (time/sender string, message, timestamp, row id). Row id orders messages
+    with the same timestamp, so pages neither skip nor repeat them.
+    """
+    def load_before(self, chat_name, before_key=None, limit=200):
+        """
+        Loads messages of the chat which are older than the given one.
+        @param chat_name: chat name.
+        @param before_key: tuple (timestamp, row id) of the oldest message in the tab.
+        Row id is None if the message has not been loaded from the history.
+        None - loads the latest messages.
+        @param limit: maximum amount of messages.
+        @return: list of messages, sorted from the oldest one to the newest one.
+        """
+        raise NotImplementedError
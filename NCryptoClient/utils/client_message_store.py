@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Module which stores messages of all chats in a local SQLite database, so
+history survives restarts and can be searched. Messages are written by a
+background thread in batches (one transaction per batch) and the database
+works in WAL mode, so GUI reads history while messages are being written.
+"""
+import os
+import time
+import queue
+import sqlite3
+import threading
+
+from NCryptoClient.utils.client_history import HistorySource
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS messages (
+           id INTEGER PRIMARY KEY,
+           chat TEXT NOT NULL,
+           time REAL NOT NULL,
+           sender TEXT NOT NULL,
+           message TEXT NOT NULL)""",
+    'CREATE INDEX IF NOT EXISTS messages_chat_time ON messages (chat, time)'
+)
+
+# Full-text index is kept in sync with the table by the trigger
+_FTS_SCHEMA = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts
+           USING fts5(message, content='messages', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+           INSERT INTO messages_fts (rowid, message) VALUES (new.id, new.message);
+       END"""
+)
+
+
+class MessageStore(HistorySource):
+    """
+    Class which writes messages to the database and reads history of chats.
+    Messages can be added from any thread.
+    """
+    def __init__(self, db_path, batch_size=500, flush_interval=0.2):
+        """
+        Constructor. Creates database (if needed) and starts the writer thread.
+        @param db_path: path to the database file.
+        @param batch_size: maximum amount of messages written in one transaction.
+        @param flush_interval: maximum time in seconds a message waits to be written.
+        """
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._db_path = db_path
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+
+        self._write_queue = queue.Queue()
+        self._reader_lock = threading.Lock()
+        self._reader = self._connect()
+        self._reader.execute('PRAGMA journal_mode=WAL')
+        for statement in _SCHEMA:
+            self._reader.execute(statement)
+
+        # Without FTS5 extension search works with LIKE (slow on big history)
+        try:
+            for statement in _FTS_SCHEMA:
+                self._reader.execute(statement)
+            self._fts = True
+        except sqlite3.OperationalError:
+            self._fts = False
+        self._reader.commit()
+
+        self._writer = threading.Thread(target=self._write_messages, name='MessageStoreWriter', daemon=True)
+        self._writer.start()
+
+    @property
+    def full_text_search(self):
+        """
+        Getter. Tells whether the full-text index is used for search.
+        @return: True if FTS5 is available.
+        """
+        return self._fts
+
+    def add_messages(self, messages):
+        """
+        Queues messages to be written. Can be called from any thread.
+        @param messages: list of (chat name, sender, message, timestamp) tuples.
+        @return: -
+        """
+        if messages:
+            self._write_queue.put(messages)
+
+    def flush(self, timeout=None):
+        """
+        Waits until all queued messages are written.
+        @param timeout: maximum wait time in seconds. None - waits until they are written.
+        @return: True if all messages have been written.
+        """
+        written_event = threading.Event()
+        self._write_queue.put(written_event)
+        return written_event.wait(timeout)
+
+    def close(self, timeout=None):
+        """
+        Writes queued messages, stops the writer thread and closes the database.
+        @param timeout: maximum wait time in seconds for the writer thread.
+        @return: -
+        """
+        self._write_queue.put(None)
+        self._writer.join(timeout)
+        with self._reader_lock:
+            self._reader.close()
+
+    def load_before(self, chat_name, before_key=None, limit=200):
+        """
+        Loads messages of the chat which are older than the given one.
+        Messages with the same timestamp are ordered by their row id.
+        @param chat_name: chat name.
+        @param before_key: tuple (timestamp, row id) of the oldest message in the tab.
+        Row id is None if the message has not been loaded from the history.
+        None - loads the latest messages.
+        @param limit: maximum amount of messages.
+        @return: list of (sender, message, timestamp, row id) tuples,
+        sorted from the oldest one to the newest one.
+        """
+        query = 'SELECT sender, message, time, id FROM messages WHERE chat = ?'
+        params = [chat_name]
+        if before_key is not None and before_key[0] is not None:
+            before_timestamp, before_id = before_key
+            if before_id is None:
+                query += ' AND time < ?'
+                params.append(before_timestamp)
+            else:
+                # Range on time keeps the search in the index
+                query += ' AND time <= ? AND (time < ? OR id < ?)'
+                params.extend((before_timestamp, before_timestamp, before_id))
+        query += ' ORDER BY time DESC, id DESC LIMIT ?'
+        params.append(limit)
+
+        with self._reader_lock:
+            rows = self._reader.execute(query, params).fetchall()
+        rows.reverse()
+        return rows
+
+    def load_last(self, chat_name, limit=200):
+        """
+        Loads the latest messages of the chat.
+        @param chat_name: chat name.
+        @param limit: maximum amount of messages.
+        @return: list of (sender, message, timestamp, row id) tuples,
+        sorted from the oldest one to the newest one.
+        """
+        return self.load_before(chat_name, None, limit)
+
+    def search(self, text, chat_name=None, limit=100):
+        """
+        Searches messages which contain all words of the text, in all chats
+        or in the needed one. The most recently stored messages go first.
+        @param text: words to be searched.
+        @param chat_name: chat name. None - searches in all chats.
+        @param limit: maximum amount of messages.
+        @return: list of (chat name, sender, message, timestamp) tuples.
+        """
+        words = text.split()
+        if not words:
+            return []
+
+        if self._fts:
+            # Every word is quoted, so the text is never parsed as FTS query syntax.
+            # Index is walked from the newest rows, so the search stops at the limit
+            query = 'SELECT m.chat, m.sender, m.message, m.time FROM messages_fts ' \
+                    'JOIN messages AS m ON m.id = messages_fts.rowid WHERE messages_fts MATCH ?'
+            params = [' '.join('"{}"'.format(word.replace('"', '""')) for word in words)]
+        else:
+            query = 'SELECT m.chat, m.sender, m.message, m.time FROM messages AS m WHERE ' + \
+                    ' AND '.join(['m.message LIKE ?'] * len(words))
+            params = ['%{}%'.format(word) for word in words]
+
+        if chat_name is not None:
+            query += ' AND m.chat = ?'
+            params.append(chat_name)
+        # Ordering by rowid of the full-text index does not need sorting of all matches
+        query += ' ORDER BY {}.rowid DESC LIMIT ?'.format('messages_fts' if self._fts else 'm')
+        params.append(limit)
+
+        with self._reader_lock:
+            return self._reader.execute(query, params).fetchall()
+
+    def _connect(self):
+        """
+        Opens new connection with the database.
+        @return: database connection.
+        """
+        connection = sqlite3.connect(self._db_path, check_same_thread=False)
+        # WAL keeps the database consistent with less syncs to disk
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _write_messages(self):
+        """
+        Thread routine: takes queued messages and writes them in batches.
+        @return: -
+        """
+        connection = self._connect()
+        running = True
+        while running:
+            item = self._write_queue.get()
+            batch = []
+            events = []
+            deadline = time.monotonic() + self._flush_interval
+
+            # Collects messages which come during the flush interval
+            while True:
+                if item is None:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    events.append(item)
+                else:
+                    batch.extend(item)
+
+                if not running or events or len(batch) >= self._batch_size:
+                    break
+                try:
+                    item = self._write_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+
+            if batch:
+                with connection:
+                    connection.executemany(
+                        'INSERT INTO messages (chat, time, sender, message) VALUES (?, ?, ?, ?)',
+                        [(chat_name, timestamp if timestamp is not None else time.time(), sender, message)
+                         for chat_name, sender, message, timestamp in batch])
+            for event in events:
+                event.set()
+        connection.close()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Module which converts messages between the markup sent over the network
+(text with <b>, <i>, <u> tags) and the form which is painted by chat tabs:
+plain text and style runs. Runs are a tuple of (start, style flags) pairs,
+each run lasts until the start of the next one. Decoding is done in the
+message handler thread, so GUI only paints ready rows.
+"""
+import re
+
+# Text styles (bit flags)
+STYLE_PLAIN = 0
+STYLE_BOLD = 1
+STYLE_ITALIC = 2
+STYLE_UNDERLINE = 4
+
+# Runs of a text without styles (shared by all plain messages)
+PLAIN_RUNS = ((0, STYLE_PLAIN),)
+
+_TAG_STYLES = {'b': STYLE_BOLD, 'i': STYLE_ITALIC, 'u': STYLE_UNDERLINE}
+_re_tag = re.compile('<(/?)([biu])>')
+
+
+def encode_rich_text(text, style):
+    """
+    Wraps the whole text in tags of the style.
+    @param text: plain text.
+    @param style: style flags.
+    @return: text with tags.
+    """
+    if style & STYLE_BOLD:
+        text = '<b>{}</b>'.format(text)
+    if style & STYLE_ITALIC:
+        text = '<i>{}</i>'.format(text)
+    if style & STYLE_UNDERLINE:
+        text = '<u>{}</u>'.format(text)
+    return text
+
+
+def decode_rich_text(rich_text):
+    """
+    Splits text with tags into plain text and style runs. Tags can be nested
+    and mixed. Older clients close a span with the opening tag (<b>...<b>),
+    so the opening tag of an active style closes it. Unknown tags are kept as text.
+    @param rich_text: text with <b>, <i>, <u> tags.
+    @return: tuple (plain text, style runs).
+    """
+    if '<' not in rich_text:
+        return rich_text, PLAIN_RUNS
+
+    parts = []
+    runs = []
+    style = STYLE_PLAIN
+    length = 0
+    position = 0
+    for match in _re_tag.finditer(rich_text):
+        if match.start() > position:
+            length = _add_part(parts, runs, rich_text[position:match.start()], style, length)
+        tag_style = _TAG_STYLES[match.group(2)]
+        if match.group(1) or style & tag_style:
+            style &= ~tag_style
+        else:
+            style |= tag_style
+        position = match.end()
+    if position < len(rich_text):
+        _add_part(parts, runs, rich_text[position:], style, length)
+
+    if not runs or runs == [PLAIN_RUNS[0]]:
+        return ''.join(parts), PLAIN_RUNS
+    return ''.join(parts), tuple(runs)
+
+
+def prepare_messages(messages):
+    """
+    Converts messages to rows of chat tabs.
+    @param messages: list of (sender, text with tags, timestamp) tuples.
+    @return: list of (sender, plain text, style runs, timestamp) tuples.
+    """
+    rows = []
+    for sender, message, timestamp in messages:
+        text, runs = decode_rich_text(message)
+        rows.append((sender, text, runs, timestamp))
+    return rows
+
+
+def _add_part(parts, runs, part, style, length):
+    """
+    Adds a part of the text. New run is started only when the style changes.
+    @param parts: list of parts of the plain text.
+    @param runs: list of style runs.
+    @param part: part of the text.
+    @param style: style flags of the part.
+    @param length: length of the text before the part.
+    @return: length of the text with the part.
+    """
+    if not runs or runs[-1][1] != style:
+        runs.append((length, style))
+    parts.append(part)
+    return length + len(part)
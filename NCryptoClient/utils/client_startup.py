@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Module which records the startup timeline of the client: how much time has
+passed since the start of the launcher until the modules are imported, the
+first window is painted, the connection is established and the user is
+authenticated. Only the first occurrence of every mark is recorded, so
+reconnections do not change the timeline.
+"""
+import time
+
+# Marks of the startup timeline, in the expected order
+STARTUP_IMPORTS = 'imports'
+STARTUP_FIRST_PAINT = 'first paint'
+STARTUP_CONNECTED = 'connected'
+STARTUP_AUTHENTICATED = 'authenticated'
+
+
+class StartupTimeline:
+    """
+    Class which stores times of the startup marks. Can be used from any thread.
+    """
+    def __init__(self):
+        """
+        Constructor. Time of the creation is the start of the timeline.
+        """
+        self._start_time = time.perf_counter()
+        # Mark -> seconds since the start, in order of recording
+        self._marks = {}
+        # Stream where the timeline is written after the authentication, None - nowhere
+        self._output = None
+
+    def restart(self):
+        """
+        Starts the timeline again and forgets all marks.
+        @return: -
+        """
+        self._start_time = time.perf_counter()
+        self._marks = {}
+
+    def set_output(self, output):
+        """
+        Setter. Sets stream where the timeline is written after the authentication.
+        @param output: text stream (e.g. sys.stderr) or None.
+        @return: -
+        """
+        self._output = output
+
+    def mark(self, name):
+        """
+        Records the mark. Repeated marks are ignored.
+        @param name: name of the mark (one of STARTUP_* constants).
+        @return: True if the mark has been recorded.
+        """
+        if name in self._marks:
+            return False
+        self._marks[name] = time.perf_counter() - self._start_time
+
+        if name == STARTUP_AUTHENTICATED and self._output is not None:
+            print(self.get_report(), file=self._output)
+        return True
+
+    def get_marks(self):
+        """
+        Getter. Returns recorded marks.
+        @return: list of (name, seconds since the start) tuples, in order of recording.
+        """
+        return list(self._marks.items())
+
+    def get_report(self):
+        """
+        Builds a single line with the timeline.
+        @return: string like 'Startup: imports 0.120 s, first paint 0.210 s, ...'.
+        """
+        return 'Startup: ' + ', '.join('{} {:.3f} s'.format(name, seconds)
+                                       for name, seconds in self._marks.items())
+
+
+# Timeline of the current process (started when this module is imported)
+startup_timeline = StartupTimeline()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Module which formats times of messages. Messages keep their times as
+numbers (UNIX time) and are formatted only when they are painted. All
+messages of the same second share one formatted string, so a burst of
+messages costs one strftime() call instead of one per message.
+"""
+import time
+
+# Format of the message time in headers of messages
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class TimestampFormatter:
+    """
+    Class which formats UNIX time with the cache of formatted seconds.
+    Can be used from any thread.
+    """
+    def __init__(self, time_format=TIME_FORMAT, max_size=4096):
+        """
+        Constructor.
+        @param time_format: format of time.strftime().
+        @param max_size: maximum amount of cached seconds. Cache is cleared when it is full.
+        """
+        self._time_format = time_format
+        self._max_size = max_size
+        # Second (int) -> formatted string
+        self._cache = {}
+
+    def format(self, timestamp):
+        """
+        Formats the time. Fractions of a second are ignored.
+        @param timestamp: UNIX time.
+        @return: formatted string.
+        """
+        second = int(timestamp)
+        formatted = self._cache.get(second)
+        if formatted is None:
+            if len(self._cache) >= self._max_size:
+                self._cache.clear()
+            formatted = time.strftime(self._time_format, time.localtime(second))
+            self._cache[second] = formatted
+        return formatted
+
+    def format_header(self, timestamp, sender):
+        """
+        Builds header of a message: time and sender.
+        @param timestamp: UNIX time or None if the message has no time.
+        @param sender: sender part of the header (e.g. '@login>').
+        @return: header string.
+        """
+        if timestamp is None:
+            return sender
+        return '[{}] {}'.format(self.format(timestamp), sender)
+
+
+# Formatter shared by the message handler and GUI
+timestamp_formatter = TimestampFormatter()
@@ -2,29 +2,30 @@
 """
 Module for client application constants.
 """
-from pathlib import Path
+import os
 
-DEBUG = True
-if DEBUG:
-    shift = 2
-else:
-    shift = 1
+# Images (files in the NCryptoClient/img directory, loaded by ui/ui_resources.py)
+NCRYPTOLOGO_IMG = 'NCryptoLogo_750x206.png'
+ADD_CONTACT_IMG = 'add_24x24.png'
+REMOVE_CONTACT_IMG = 'remove_24x24.png'
 
-path_tokens = Path(__file__).parts
-project_pos = path_tokens.index('NCryptoClient')
-project_path = path_tokens[0:(project_pos + shift)]
+BOLD_IMG = 'bold.jpg'
+ITALIC_IMG = 'italic.jpg'
+UNDERLINED_IMG = 'underlined.jpg'
 
-logo_rel_path = '\\Img\\NCryptoLogo_750x206.png'
-add_rel_path = '\\Img\\add_24x24.png'
-remove_rel_path = '\\Img\\remove_24x24.png'
-bold_rel_path = '\\Img\\bold.jpg'
-italic_rel_path = '\\Img\\italic.jpg'
-underlined_rel_path = '\\Img\\underlined.jpg'
+# Maximum amount of messages kept in memory by a chat tab
+SCROLLBACK_LIMIT = 5000
+# Amount of older messages loaded at once when the user scrolls up
+HISTORY_PAGE_SIZE = 200
 
-NCRYPTOLOGO_IMG_PATH = '\\'.join(project_path) + logo_rel_path
-ADD_CONTACT_IMG_PATH = '\\'.join(project_path) + add_rel_path
-REMOVE_CONTACT_IMG_PATH = '\\'.join(project_path) + remove_rel_path
+# Delay in milliseconds between the last keystroke and filtering of contacts
+CONTACTS_FILTER_DELAY = 150
 
-BOLD_IMG_PATH = '\\'.join(project_path) + bold_rel_path
-ITALIC_IMG_PATH = '\\'.join(project_path) + italic_rel_path
-UNDERLINED_IMG_PATH = '\\'.join(project_path) + underlined_rel_path
+# Directory where data of users is stored (local history of messages)
+USER_DATA_DIR = os.path.join(os.path.expanduser('~'), '.NCryptoClient')
+# File with settings of the client (server address, etc.)
+CONFIG_PATH = os.path.join(USER_DATA_DIR, 'autoexec.ini')
+# Directory with avatars of contacts: <contact name>.png (.jpg, .jpeg, .bmp)
+AVATARS_DIR = os.path.join(USER_DATA_DIR, 'avatars')
+# Maximum memory in bytes used by the decoded avatars
+AVATAR_CACHE_LIMIT = 16 * 1024 * 1024
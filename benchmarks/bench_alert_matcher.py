@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Module which compares parsing of server alerts by the old cascade of regular
+expressions (compiled on every call) with the combined precompiled matcher.
+Run from the root directory of the project:
+python -m benchmarks.bench_alert_matcher [amount of alerts]
+"""
+import re
+import sys
+import time
+import random
+
+from NCryptoClient.net.client_alerts import parse_alert
+
+
+def parse_alert_cascade(message_text):
+    """
+    Old way of parsing: five patterns are compiled and tried one by one.
+    @param message_text: text of the alert.
+    @return: tuple (kind, target name) or None if the text has unknown format.
+    """
+    re_message = re.compile('^(Message to \'(#[A-Za-z_\\d]{3,31}|[A-Za-z_\\d]{3,32})\' has been delivered!)$')
+    if re.fullmatch(re_message, message_text) is not None:
+        return 'message_delivered', message_text.split('\'')[1]
+
+    re_joined = re.compile('^(You have joined \'#[A-Za-z_\\d]{3,31}\' chatroom!)$')
+    if re.fullmatch(re_joined, message_text) is not None:
+        return 'room_joined', message_text.split('\'')[1]
+
+    re_left = re.compile('^(You have left \'#[A-Za-z_\\d]{3,31}\' chatroom!)$')
+    if re.fullmatch(re_left, message_text) is not None:
+        return 'room_left', message_text.split('\'')[1]
+
+    re_added = re.compile(
+        '^(Contact \'((#[A-Za-z_\\d]{3,31})|([A-Za-z_\\d]{3,32}))\' has been successfully added!)$')
+    if re.fullmatch(re_added, message_text) is not None:
+        return 'contact_added', message_text.split('\'')[1]
+
+    re_removed = re.compile(
+        '^(Contact \'((#[A-Za-z_\\d]{3,31})|([A-Za-z_\\d]{3,32}))\' has been successfully removed!)$')
+    if re.fullmatch(re_removed, message_text) is not None:
+        return 'contact_removed', message_text.split('\'')[1]
+    return None
+
+
+def make_alerts(amount, seed=0):
+    """
+    Generates alerts. Most of them are delivery confirmations, as in a real chat.
+    @param amount: amount of alerts.
+    @param seed: seed of the random generator.
+    @return: list of alert texts.
+    """
+    rnd = random.Random(seed)
+    templates = ["Message to '{}' has been delivered!"] * 16 + \
+                ["You have joined '#{}' chatroom!",
+                 "You have left '#{}' chatroom!",
+                 "Contact '{}' has been successfully added!",
+                 "Contact '{}' has been successfully removed!"]
+    alerts = []
+    for i in range(amount):
+        alerts.append(rnd.choice(templates).format('user_{}'.format(rnd.randrange(10000))))
+    return alerts
+
+
+def measure(parse, alerts):
+    """
+    Parses all alerts.
+    @param parse: parsing function.
+    @param alerts: list of alert texts.
+    @return: tuple (elapsed time in seconds, list of results).
+    """
+    start_time = time.perf_counter()
+    results = [parse(alert) for alert in alerts]
+    return time.perf_counter() - start_time, results
+
+
+def main():
+    amount = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    alerts = make_alerts(amount)
+
+    cascade_time, cascade_results = measure(parse_alert_cascade, alerts)
+    matcher_time, matcher_results = measure(parse_alert, alerts)
+    if cascade_results != matcher_results:
+        raise AssertionError('Results of the parsers differ!')
+
+    print('Alerts:            {}'.format(amount))
+    print('Cascade:           {:.3f} s ({:.2f} us/alert)'.format(cascade_time, cascade_time / amount * 1e6))
+    print('Combined matcher:  {:.3f} s ({:.2f} us/alert)'.format(matcher_time, matcher_time / amount * 1e6))
+    print('Speedup:           {:.1f}x'.format(cascade_time / matcher_time))
+
+
+if __name__ == '__main__':
+    main()
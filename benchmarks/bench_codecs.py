@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Module which compares codecs of messages on the JIM messages sent and
+received by the client: encoding and decoding time of every message type,
+size on the wire (with framing) and the whole receive path (splitting of the
+byte stream into frames and decoding) on a mixed stream. For JSON codecs the
+receive path is also measured with the length prefix framing, which is used
+by binary codecs. Codecs whose module is not installed are skipped. Run from
+the root directory of the project:
+python -m benchmarks.bench_codecs [amount of messages]
+"""
+import sys
+import time
+import random
+
+from NCryptoTools.jim.jim_constants import JIMMsgType
+from NCryptoTools.jim.jim_core import JIMMessage
+
+from NCryptoClient.net.client_codec import CODECS, create_codec, is_codec_available
+from NCryptoClient.net.client_framing import FRAMING_LENGTH_PREFIX, create_framer
+
+_WORDS = ('hello', 'world', 'python', 'server', 'client', 'message', 'chat', 'room', 'today',
+          'tomorrow', 'meeting', 'release', 'bug', 'fix', 'coffee', 'lunch', 'deploy', 'review')
+
+
+def make_messages(seed=0):
+    """
+    Creates messages of every type which is sent or received by the client.
+    @param seed: seed of the random generator.
+    @return: list of (message type name, share in the mixed stream, message dictionary) tuples.
+    """
+    rnd = random.Random(seed)
+    text = ' '.join(rnd.choice(_WORDS) for _ in range(10))
+    now = time.time()
+    messages = (
+        ('chat msg', 40, JIMMessage(JIMMsgType.CTS_CHAT_MSG, action='msg', time=now, to='#python',
+                                    message=text, id=12345, **{'from': 'alice'})),
+        ('personal msg', 30, JIMMessage(JIMMsgType.CTS_PERSONAL_MSG, action='msg', time=now, to='bob',
+                                        encoding='utf-8', message=text, id=12346, **{'from': 'alice'})),
+        ('alert', 15, JIMMessage(JIMMsgType.STC_ALERT, response=200, id=12345,
+                                 alert="Message to 'bob' has been delivered!")),
+        ('contacts_list', 8, JIMMessage(JIMMsgType.STC_CONTACTS_LIST, action='contacts_list', login='bob')),
+        ('quantity', 2, JIMMessage(JIMMsgType.STC_QUANTITY, response=202, quantity=25)),
+        ('probe', 2, JIMMessage(JIMMsgType.STC_PROBE, action='probe', time=now)),
+        ('join', 2, JIMMessage(JIMMsgType.CTS_JOIN_CHAT, action='join', time=now, login='alice', room='#python')),
+        ('authenticate', 1, JIMMessage(JIMMsgType.CTS_AUTHENTICATE, action='authenticate', time=now,
+                                       login='alice', password='secret_password'))
+    )
+    return [(name, share, jim_msg.to_dict()) for name, share, jim_msg in messages]
+
+
+def measure(function, argument, repeats):
+    """
+    Measures average time of the function call.
+    @param function: function with one argument.
+    @param argument: argument of the function.
+    @param repeats: amount of calls.
+    @return: average time in microseconds.
+    """
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        function(argument)
+    return (time.perf_counter() - start_time) / repeats * 1000000
+
+
+def measure_receive(codec, framing, payloads, chunk_size=4096):
+    """
+    Splits the byte stream into frames and decodes them, as the receive path does.
+    @param codec: codec.
+    @param framing: framing mode of the byte stream.
+    @param payloads: list of serialized messages.
+    @param chunk_size: amount of bytes received at once.
+    @return: tuple (elapsed time in seconds, size of the stream in bytes).
+    """
+    framer = create_framer(framing)
+    stream = b''.join(framer.encode(msg_bytes) for msg_bytes in payloads)
+    decoded = 0
+    start_time = time.perf_counter()
+    for i in range(0, len(stream), chunk_size):
+        for frame in framer.feed(stream[i:i + chunk_size]):
+            codec.decode(frame)
+            decoded += 1
+    if decoded != len(payloads):
+        raise AssertionError('{} messages of {} are decoded!'.format(decoded, len(payloads)))
+    return time.perf_counter() - start_time, len(stream)
+
+
+def main():
+    amount = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    messages = make_messages()
+    rnd = random.Random(1)
+    mixed = rnd.choices([msg_dict for _, _, msg_dict in messages],
+                        weights=[share for _, share, _ in messages], k=amount)
+
+    print('Messages in the mixed stream: {}'.format(amount))
+    results = {}
+    for codec_name in CODECS:
+        print()
+        if not is_codec_available(codec_name):
+            print('{}: not installed'.format(codec_name))
+            continue
+        codec = create_codec(codec_name)
+        framer = create_framer(codec.framing)
+        print('{} ({} framing)'.format(codec_name, codec.framing))
+        print('  {:<14} {:>12} {:>12} {:>8}'.format('message', 'encode, us', 'decode, us', 'bytes'))
+        for name, _, msg_dict in messages:
+            msg_bytes = codec.encode(msg_dict)
+            if codec.decode(msg_bytes) != msg_dict:
+                raise AssertionError('{} changes {} message!'.format(codec_name, name))
+            encode_time = measure(codec.encode, msg_dict, 20000)
+            decode_time = measure(codec.decode, msg_bytes, 20000)
+            print('  {:<14} {:>12.2f} {:>12.2f} {:>8}'.format(name, encode_time, decode_time,
+                                                              len(framer.encode(msg_bytes))))
+
+        start_time = time.perf_counter()
+        payloads = [codec.encode(msg_dict) for msg_dict in mixed]
+        encode_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        for msg_bytes in payloads:
+            codec.decode(msg_bytes)
+        decode_time = time.perf_counter() - start_time
+        receive_time, stream_size = measure_receive(codec, codec.framing, payloads)
+        results[codec_name] = receive_time
+        print('  Encoding:             {:.0f} messages/s'.format(amount / encode_time))
+        print('  Decoding:             {:.0f} messages/s'.format(amount / decode_time))
+        print('  Receive path:         {:.0f} messages/s'.format(amount / receive_time))
+        if codec.framing != FRAMING_LENGTH_PREFIX:
+            prefixed_time, _ = measure_receive(codec, FRAMING_LENGTH_PREFIX, payloads)
+            print('  With length prefix:   {:.0f} messages/s'.format(amount / prefixed_time))
+        print('  Bytes on wire:        {} ({:.1f} per message)'.format(stream_size, stream_size / amount))
+
+    print()
+    for codec_name, receive_time in results.items():
+        print('Receiving, {:<8} {:.1f}x of json'.format(codec_name + ':', results[CODECS[0]] / receive_time))
+
+
+if __name__ == '__main__':
+    main()
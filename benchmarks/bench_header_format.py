@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Module which measures formatting of message headers ('[time] @login>') for
+a burst of messages: the old way (every message formats its time when it is
+received) and the cached formatter (all messages of a second share one
+formatted string). Run from the root directory of the project:
+python -m benchmarks.bench_header_format [amount of messages] [burst length in seconds]
+"""
+import sys
+import time
+import random
+
+from NCryptoTools.tools.utilities import get_formatted_date
+
+from NCryptoClient.utils.client_time_format import TimestampFormatter
+
+
+def make_messages(amount, seconds, seed=0):
+    """
+    Generates times and senders of a burst of messages.
+    @param amount: amount of messages.
+    @param seconds: length of the burst in seconds.
+    @param seed: seed of the random generator.
+    @return: list of (timestamp, login) tuples, sorted by time.
+    """
+    rnd = random.Random(seed)
+    start_time = time.time()
+    messages = [(start_time + rnd.random() * seconds, 'user_{}'.format(rnd.randrange(100)))
+                for _ in range(amount)]
+    messages.sort()
+    return messages
+
+
+def format_old(messages):
+    """
+    Old way: every message formats its time with datetime.strftime().
+    @param messages: list of (timestamp, login) tuples.
+    @return: list of headers.
+    """
+    return ['[{}] @{}>'.format(get_formatted_date(timestamp), login) for timestamp, login in messages]
+
+
+def format_cached(messages):
+    """
+    New way: times are formatted by the formatter with the per-second cache.
+    @param messages: list of (timestamp, login) tuples.
+    @return: list of headers.
+    """
+    formatter = TimestampFormatter()
+    senders = {}
+    headers = []
+    for timestamp, login in messages:
+        sender = senders.get(login)
+        if sender is None:
+            sender = senders[login] = '@{}>'.format(login)
+        headers.append(formatter.format_header(timestamp, sender))
+    return headers
+
+
+def measure(function, messages):
+    """
+    Formats headers of all messages.
+    @param function: formatting function.
+    @param messages: list of (timestamp, login) tuples.
+    @return: tuple (elapsed time in seconds, list of headers).
+    """
+    start_time = time.perf_counter()
+    headers = function(messages)
+    return time.perf_counter() - start_time, headers
+
+
+def main():
+    amount = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    messages = make_messages(amount, seconds)
+
+    old_time, old_headers = measure(format_old, messages)
+    cached_time, cached_headers = measure(format_cached, messages)
+    if old_headers != cached_headers:
+        raise AssertionError('Headers differ!')
+
+    print('Messages:           {} in {} s'.format(amount, seconds))
+    print('Format per message: {:.3f} s ({:.2f} us/message)'.format(old_time, old_time / amount * 1e6))
+    print('Cached formatter:   {:.3f} s ({:.2f} us/message)'.format(cached_time, cached_time / amount * 1e6))
+    print('Speedup:            {:.1f}x'.format(old_time / cached_time))
+
+
+if __name__ == '__main__':
+    main()
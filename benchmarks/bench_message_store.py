@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Module which measures the local message store on a big history: speed of
+writing, opening of a chat (the latest messages, older pages) and search.
+Run from the root directory of the project:
+python -m benchmarks.bench_message_store [amount of messages]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+from NCryptoClient.utils.client_message_store import MessageStore
+
+_WORDS = ('hello', 'world', 'python', 'server', 'client', 'message', 'chat', 'room', 'today',
+          'tomorrow', 'meeting', 'release', 'bug', 'fix', 'coffee', 'lunch', 'deploy', 'review')
+
+
+def make_messages(amount, chats_amount=50, seed=0):
+    """
+    Generates messages of several chats.
+    @param amount: amount of messages.
+    @param chats_amount: amount of chats.
+    @param seed: seed of the random generator.
+    @return: list of (chat name, sender, message, timestamp) tuples.
+    """
+    rnd = random.Random(seed)
+    start_time = time.time() - amount
+    messages = []
+    for i in range(amount):
+        chat_name = '#room_{}'.format(rnd.randrange(chats_amount))
+        text = ' '.join(rnd.choice(_WORDS) for _ in range(rnd.randint(3, 12)))
+        if i % 10000 == 0:
+            text += ' needle'
+        messages.append((chat_name, '@user_{}>'.format(rnd.randrange(1000)), text, start_time + i))
+    return messages
+
+
+def measure(function, repeats=20):
+    """
+    Measures average time of the function call.
+    @param function: function without arguments.
+    @param repeats: amount of calls.
+    @return: tuple (average time in milliseconds, result of the last call).
+    """
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        result = function()
+    return (time.perf_counter() - start_time) / repeats * 1000, result
+
+
+def main():
+    amount = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    messages = make_messages(amount)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = MessageStore(os.path.join(directory, 'messages.db'), batch_size=5000)
+
+        start_time = time.perf_counter()
+        for i in range(0, amount, 500):
+            store.add_messages(messages[i:i + 500])
+        store.flush()
+        write_time = time.perf_counter() - start_time
+
+        last_time, last_page = measure(lambda: store.load_last('#room_7', 200))
+        before_time, _ = measure(lambda: store.load_before('#room_7', last_page[0][2:], 200))
+        rare_time, rare = measure(lambda: store.search('needle'))
+        common_time, _ = measure(lambda: store.search('coffee lunch'))
+        chat_time, _ = measure(lambda: store.search('deploy review', '#room_7'))
+        store.close()
+
+    print('Messages:                 {}'.format(amount))
+    print('Full-text index:          {}'.format(store.full_text_search))
+    print('Writing:                  {:.1f} s ({:.0f} messages/s)'.format(write_time, amount / write_time))
+    print('Last 200 of a chat:       {:.2f} ms'.format(last_time))
+    print('Previous 200 of a chat:   {:.2f} ms'.format(before_time))
+    print('Search, rare word:        {:.2f} ms ({} found)'.format(rare_time, len(rare)))
+    print('Search, common words:     {:.2f} ms'.format(common_time))
+    print('Search in a chat:         {:.2f} ms'.format(chat_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Module which measures creation of icons for the buttons of chat tabs: the
+old way (every button reads and decodes its image file) and the shared
+registry (every image is decoded once). Run from the root directory of the
+project (QT_QPA_PLATFORM=offscreen can be used without a display):
+python -m benchmarks.bench_resources [amount of tabs]
+"""
+import os
+import sys
+import time
+
+from PyQt5.QtGui import QGuiApplication, QIcon, QPixmap
+
+from NCryptoClient.ui.ui_resources import ResourceRegistry, IMAGES_DIR
+from NCryptoClient.utils.constants import BOLD_IMG, ITALIC_IMG, UNDERLINED_IMG
+
+# Images of the bitmap buttons of a single chat tab
+TAB_IMAGES = (BOLD_IMG, ITALIC_IMG) + (UNDERLINED_IMG,) * 7
+
+_IMAGES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            'NCryptoClient', IMAGES_DIR)
+
+
+def load_from_files(tabs):
+    """
+    Old way: every button decodes its image file.
+    @param tabs: amount of chat tabs.
+    @return: list of icons.
+    """
+    return [QIcon(QPixmap(os.path.join(_IMAGES_PATH, image_name)))
+            for _ in range(tabs) for image_name in TAB_IMAGES]
+
+
+def load_from_registry(tabs):
+    """
+    New way: icons are taken from the registry.
+    @param tabs: amount of chat tabs.
+    @return: list of icons.
+    """
+    registry = ResourceRegistry(compiled_module=None)
+    return [registry.get_icon(image_name) for _ in range(tabs) for image_name in TAB_IMAGES]
+
+
+def measure(function, tabs):
+    """
+    Creates icons of all tabs.
+    @param function: loading function.
+    @param tabs: amount of chat tabs.
+    @return: elapsed time in seconds.
+    """
+    start_time = time.perf_counter()
+    icons = function(tabs)
+    elapsed_time = time.perf_counter() - start_time
+    if any(icon.isNull() for icon in icons):
+        raise AssertionError('Icon is not loaded!')
+    return elapsed_time
+
+
+def main():
+    tabs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    # Application object is needed for pixmaps, it is kept until the end of the measurement
+    app = QGuiApplication(sys.argv)
+
+    # Image format plugins and importlib.resources are loaded before the measurement
+    load_from_files(1)
+    load_from_registry(1)
+    files_time = measure(load_from_files, tabs)
+    registry_time = measure(load_from_registry, tabs)
+
+    print('Tabs:             {} ({} icons)'.format(tabs, tabs * len(TAB_IMAGES)))
+    print('Decode per icon:  {:.2f} ms'.format(files_time * 1000))
+    print('Shared registry:  {:.2f} ms'.format(registry_time * 1000))
+    print('Speedup:          {:.1f}x'.format(files_time / registry_time))
+    app.quit()
+
+
+if __name__ == '__main__':
+    main()
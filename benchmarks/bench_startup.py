@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Module which measures cold import of the modules needed to show the
+authentication window. Every run is done in a new interpreter, so nothing is
+cached in sys.modules. Also checks that modules of the chat window and the
+network backend are not loaded before the window is shown. Run from the root
+directory of the project:
+python -m benchmarks.bench_startup [amount of runs]
+"""
+import sys
+import json
+import statistics
+import subprocess
+
+# Modules which must be imported lazily (after the authentication window is shown)
+DEFERRED_MODULES = ('NCryptoClient.ui.ui_chat_tab',
+                    'NCryptoClient.ui.ui_contacts_list',
+                    'NCryptoClient.ui.ui_server_settings_window',
+                    'NCryptoClient.utils.client_message_store',
+                    'NCryptoClient.net.client_handler',
+                    'NCryptoClient.net.client_async_handler',
+                    'NCryptoClient.net.client_codec',
+                    'sqlite3',
+                    'socket')
+
+_IMPORT_SCRIPT = '''
+import sys, json, time
+start_time = time.perf_counter()
+import PyQt5.QtWidgets
+import NCryptoClient.main_window
+elapsed_time = time.perf_counter() - start_time
+print(json.dumps([elapsed_time, sorted(sys.modules)]))
+'''
+
+
+def measure_import():
+    """
+    Imports the main window in a new interpreter.
+    @return: tuple (import time in seconds, list of loaded modules).
+    """
+    output = subprocess.check_output([sys.executable, '-c', _IMPORT_SCRIPT])
+    elapsed_time, modules = json.loads(output.decode('utf-8'))
+    return elapsed_time, modules
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    times = []
+    modules = []
+    for _ in range(runs):
+        elapsed_time, modules = measure_import()
+        times.append(elapsed_time)
+
+    loaded_modules = [module for module in DEFERRED_MODULES if module in modules]
+    print('Runs:            {}'.format(runs))
+    print('Import (median): {:.1f} ms'.format(statistics.median(times) * 1000))
+    print('Import (min):    {:.1f} ms'.format(min(times) * 1000))
+    print('Loaded modules:  {}'.format(len(modules)))
+    print('Loaded too soon: {}'.format(', '.join(loaded_modules) if loaded_modules else '-'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Module which compares the old linear search of a chat tab by name with the
+name index of the chat widget, for different amounts of opened tabs.
+Run from the root directory of the project (without display set
+QT_QPA_PLATFORM=offscreen):
+python -m benchmarks.bench_tab_lookup [amount of lookups]
+"""
+import sys
+import time
+import random
+
+from PyQt5.QtWidgets import QApplication
+
+from NCryptoClient.ui.ui_chat_tab import UiChat
+
+
+def find_tab_linear(chat_widget, tab_name):
+    """
+    Old way of searching: names of all tabs are compared one by one.
+    @param chat_widget: chat widget (UiChat).
+    @param tab_name: tab name (chat name).
+    @return: tab index or None if there is no such tab.
+    """
+    for i in range(0, chat_widget.count()):
+        if chat_widget.widget(i).tab_name == tab_name:
+            return i
+    return None
+
+
+def measure(find, chat_widget, names):
+    """
+    Searches all names.
+    @param find: search function.
+    @param chat_widget: chat widget (UiChat).
+    @param names: list of tab names.
+    @return: tuple (elapsed time in seconds, list of results).
+    """
+    start_time = time.perf_counter()
+    results = [find(chat_widget, name) for name in names]
+    return time.perf_counter() - start_time, results
+
+
+def main():
+    amount = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    app = QApplication(sys.argv)
+    rnd = random.Random(0)
+
+    print('Lookups: {}'.format(amount))
+    print('{:>6} {:>14} {:>14} {:>9}'.format('Tabs', 'Linear, us', 'Index, us', 'Speedup'))
+    for tabs_amount in (1, 10, 50, 200):
+        chat_widget = UiChat()
+        tab_names = ['#room_{}'.format(i) for i in range(tabs_amount)]
+        for tab_name in tab_names:
+            chat_widget.add_chat_tab(tab_name)
+
+        # Messages mostly come to the opened tabs, some of them to the closed ones
+        names = [rnd.choice(tab_names) if rnd.random() < 0.9 else '@unknown' for _ in range(amount)]
+        linear_time, linear_results = measure(find_tab_linear, chat_widget, names)
+        index_time, index_results = measure(UiChat.find_tab, chat_widget, names)
+        if linear_results != index_results:
+            raise AssertionError('Results of the searches differ!')
+
+        print('{:>6} {:>14.2f} {:>14.2f} {:>8.1f}x'.format(tabs_amount,
+                                                           linear_time / amount * 1e6,
+                                                           index_time / amount * 1e6,
+                                                           linear_time / index_time))
+        chat_widget.deleteLater()
+    app.processEvents()
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,11 @@ setup(
         'PyQt5>=5.10.1',
         'NCryptoTools>=0.5.2'
     ],
+    extras_require={
+        'orjson': ['orjson'],
+        'msgpack': ['msgpack'],
+        'cbor': ['cbor2']
+    },
     description='A client-side application of the NCryptoChat',
     author='Andrew Krylov',
     author_email='AndrewKrylovNegovsky@gmail.com',
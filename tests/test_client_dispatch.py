@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Module which tests definition of the type of JIM messages received from the network.
+Run from the root directory of the project:
+python -m unittest discover tests
+"""
+import unittest
+
+from NCryptoTools.jim.jim_constants import JIMMsgType
+
+from NCryptoClient.net.client_dispatch import classify
+
+
+class ClassifyTest(unittest.TestCase):
+    """
+    Test-class for classify() on invalid messages.
+    """
+    def test_action_of_wrong_type(self):
+        for action in ([], {}, ['probe'], 1, 1.5, True):
+            with self.subTest(action=action):
+                self.assertEqual(classify({'action': action, 'time': 1.0}), JIMMsgType.UNDEFINED_TYPE)
+
+    def test_valid_action(self):
+        self.assertEqual(classify({'action': 'probe', 'time': 1.0}), JIMMsgType.STC_PROBE)
+
+
+if __name__ == '__main__':
+    unittest.main()
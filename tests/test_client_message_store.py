@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Module which tests loading of the chat history by pages.
+Run from the root directory of the project:
+python -m unittest discover tests
+"""
+import os
+import tempfile
+import unittest
+
+from NCryptoClient.utils.client_message_store import MessageStore
+
+
+class LoadBeforeTest(unittest.TestCase):
+    """
+    Test-class for paging of messages with the same timestamp.
+    """
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._store = MessageStore(os.path.join(self._directory.name, 'messages.db'))
+        # Three messages per timestamp
+        self._store.add_messages([('#r', 'alice', 'm{}'.format(i), 100.0 + i // 3) for i in range(9)])
+        self._store.add_messages([('#other', 'bob', 'other', 101.0)])
+        self.assertTrue(self._store.flush(5))
+
+    def tearDown(self):
+        self._store.close(5)
+        self._directory.cleanup()
+
+    def test_pages_with_tied_timestamps(self):
+        pages = []
+        before_key = None
+        while True:
+            page = self._store.load_before('#r', before_key, 4)
+            if not page:
+                break
+            pages.append([message for _, message, _, _ in page])
+            before_key = page[0][2:]
+
+        self.assertEqual(pages, [['m5', 'm6', 'm7', 'm8'], ['m1', 'm2', 'm3', 'm4'], ['m0']])
+
+    def test_before_message_without_row_id(self):
+        page = self._store.load_before('#r', (101.0, None), 4)
+        self.assertEqual([message for _, message, _, _ in page], ['m0', 'm1', 'm2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Module which tests waiting of the Sender-thread for written messages.
+Run from the root directory of the project:
+python -m unittest discover tests
+"""
+import time
+import socket
+import unittest
+
+from NCryptoClient.net.client_sender import Sender
+from NCryptoClient.net.client_queue import OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_LOW_PRIORITY
+
+
+class SenderDrainTest(unittest.TestCase):
+    """
+    Test-class for wait_for_drain() when messages are dropped from the full buffer.
+    """
+    def setUp(self):
+        self._client_socket, self._server_socket = socket.socketpair()
+        self._server_socket.settimeout(2)
+        self._sender = None
+
+    def tearDown(self):
+        if self._sender is not None:
+            self._sender.stop()
+            self._sender.join(2)
+        self._client_socket.close()
+        self._server_socket.close()
+
+    def _start_sender(self, overflow_policy, messages):
+        """
+        Queues messages while there is no connection, then attaches the socket.
+        @param overflow_policy: behaviour of the full buffer.
+        @param messages: list of messages (bytes).
+        @return: -
+        """
+        self._sender = Sender(wait_time=0.05, buffer_size=1, overflow_policy=overflow_policy)
+        for msg_bytes in messages:
+            self._sender.add_msg_to_queue(msg_bytes)
+        self._sender.start()
+        self._sender.attach(self._client_socket)
+
+    def _assert_drained(self, expected_bytes):
+        start_time = time.perf_counter()
+        self.assertTrue(self._sender.wait_for_drain(2))
+        self.assertLess(time.perf_counter() - start_time, 1)
+        self.assertEqual(self._server_socket.recv(65536), expected_bytes)
+
+    def test_drop_oldest(self):
+        self._start_sender(OVERFLOW_DROP_OLDEST, [b'{"n": 1}', b'{"n": 2}', b'{"n": 3}'])
+        self._assert_drained(b'{"n": 3}')
+
+    def test_drop_low_priority(self):
+        self._start_sender(OVERFLOW_DROP_LOW_PRIORITY, [b'{"action": "presence"}', b'{"n": 1}',
+                                                        b'{"action": "probe"}'])
+        self._assert_drained(b'{"n": 1}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Module which tests loading of images when the package is imported from a zip
+archive. Run from the root directory of the project:
+python -m unittest discover tests
+"""
+import os
+import sys
+import zipfile
+import tempfile
+import unittest
+import subprocess
+from unittest import mock
+
+from NCryptoClient.ui import ui_resources
+from NCryptoClient.utils.constants import NCRYPTOLOGO_IMG, BOLD_IMG
+
+_ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_PACKAGE_PATH = os.path.join(_ROOT_PATH, 'NCryptoClient')
+
+# Reads images in a new interpreter, where the package is imported from the archive only
+_READ_SCRIPT = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+from NCryptoClient.ui import ui_resources
+assert ui_resources.__file__.startswith(sys.argv[1]), ui_resources.__file__
+for image_name in sys.argv[2:]:
+    sys.stdout.write('{} {}\\n'.format(image_name, len(ui_resources.read_image_data(image_name))))
+'''
+
+
+def make_package_zip(zip_path):
+    """
+    Packs sources and images of the package into a zip archive.
+    @param zip_path: path to the archive.
+    @return: -
+    """
+    with zipfile.ZipFile(zip_path, 'w') as archive:
+        for directory, _, file_names in os.walk(_PACKAGE_PATH):
+            if '__pycache__' in directory:
+                continue
+            for file_name in file_names:
+                file_path = os.path.join(directory, file_name)
+                archive.write(file_path, os.path.relpath(file_path, _ROOT_PATH))
+
+
+class SinglePartZipPath:
+    """
+    Class which behaves as zipfile.Path of Python 3.9: joinpath() accepts a single part.
+    """
+    def __init__(self, zip_path):
+        """
+        Constructor.
+        @param zip_path: wrapped path (zipfile.Path).
+        """
+        self._zip_path = zip_path
+
+    def joinpath(self, part):
+        """
+        Returns path of the child.
+        @param part: name of the child.
+        @return: path of the child.
+        """
+        return SinglePartZipPath(self._zip_path.joinpath(part))
+
+    def read_bytes(self):
+        """
+        Reads the file.
+        @return: contents of the file (bytes).
+        """
+        return self._zip_path.read_bytes()
+
+
+class ZipImportTest(unittest.TestCase):
+    """
+    Test-class for reading images from the package imported from a zip archive.
+    """
+    def test_read_image_data(self):
+        image_names = (NCRYPTOLOGO_IMG, BOLD_IMG)
+        with tempfile.TemporaryDirectory() as directory:
+            zip_path = os.path.join(directory, 'NCryptoClient.zip')
+            make_package_zip(zip_path)
+            environment = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+            output = subprocess.check_output([sys.executable, '-c', _READ_SCRIPT, zip_path] + list(image_names),
+                                             cwd=directory, env=environment)
+
+        expected = ''.join('{} {}\n'.format(image_name,
+                                            os.path.getsize(os.path.join(_PACKAGE_PATH, 'img', image_name)))
+                           for image_name in image_names)
+        self.assertEqual(output.decode('utf-8'), expected)
+
+    def test_read_image_data_single_part_joinpath(self):
+        with tempfile.TemporaryDirectory() as directory:
+            zip_path = os.path.join(directory, 'NCryptoClient.zip')
+            make_package_zip(zip_path)
+            with zipfile.ZipFile(zip_path) as archive:
+                package_files = SinglePartZipPath(zipfile.Path(archive, 'NCryptoClient/'))
+                with mock.patch.object(ui_resources, '_get_package_files', lambda package: package_files):
+                    image_data = ui_resources.read_image_data(BOLD_IMG)
+
+        with open(os.path.join(_PACKAGE_PATH, 'img', BOLD_IMG), 'rb') as file:
+            self.assertEqual(image_data, file.read())
+
+
+if __name__ == '__main__':
+    unittest.main()